@@ -17,13 +17,34 @@
 # under the License.
 
 import abc
+import hashlib
 import itertools
 
+import eventlet
+from oslo.config import cfg
+
 from ceilometer.openstack.common import context
+from ceilometer.openstack.common.gettextutils import _
 from ceilometer.openstack.common import log
 from ceilometer import pipeline
 from ceilometer import transformer
 
+OPTS = [
+    cfg.BoolOpt('polling_stagger',
+                default=True,
+                help='Delay the first run of each polling task by an offset '
+                'derived from the host name, so that agents sharing the '
+                'same pipeline intervals do not all poll at once'),
+    cfg.FloatOpt('polling_max_runtime_ratio',
+                 default=0.0,
+                 help='Maximum run time of a polling cycle, as a fraction '
+                 'of its interval, after which the cycle is cancelled '
+                 '(0 means no limit)'),
+]
+
+cfg.CONF.register_opts(OPTS)
+cfg.CONF.import_opt('host', 'ceilometer.service')
+
 LOG = log.getLogger(__name__)
 
 
@@ -61,6 +82,8 @@ class AgentManager(object):
 
         self.context = context.RequestContext('admin', 'admin', is_admin=True)
 
+        self.running_tasks = set()
+
     @abc.abstractmethod
     def create_polling_task(self):
         """Create an empty polling task."""
@@ -79,13 +102,56 @@ class AgentManager(object):
 
         return polling_tasks
 
+    @staticmethod
+    def polling_offset(interval):
+        """Return the delay before the first run of a polling task.
+
+        The offset is taken from a hash of the host name and the interval,
+        so it is stable across restarts of a given agent while spreading
+        the agents of a deployment over the whole interval.
+        """
+        if not cfg.CONF.polling_stagger:
+            return None
+        digest = hashlib.md5('%s-%d' % (cfg.CONF.host, interval)).hexdigest()
+        return (int(digest, 16) % (interval * 1000)) / 1000.0
+
     def initialize_service_hook(self, service):
         self.service = service
         for interval, task in self.setup_polling_tasks().iteritems():
             self.service.tg.add_timer(interval,
-                                      self.interval_task,
+                                      self.scheduled_task,
+                                      self.polling_offset(interval),
+                                      interval=interval,
                                       task=task)
 
+    def scheduled_task(self, interval, task):
+        """Start a polling cycle unless the previous one is still running.
+
+        The cycle is run in its own thread so that a slow cycle makes the
+        following one be skipped rather than queued behind it.
+        """
+        if task in self.running_tasks:
+            LOG.warning(_('Skipping polling cycle of %ds interval task, '
+                          'previous cycle still running') % interval)
+            return
+        self.running_tasks.add(task)
+        self.service.tg.add_thread(self.run_task, interval, task)
+
+    def run_task(self, interval, task):
+        budget = interval * cfg.CONF.polling_max_runtime_ratio
+        timeout = eventlet.Timeout(budget or None)
+        try:
+            self.interval_task(task)
+        except eventlet.Timeout as t:
+            if t is not timeout:
+                raise
+            LOG.warning(_('Polling cycle of %(interval)ds interval task '
+                          'cancelled after %(budget).1fs') %
+                        {'interval': interval, 'budget': budget})
+        finally:
+            timeout.cancel()
+            self.running_tasks.discard(task)
+
     @staticmethod
     def interval_task(task):
         task.poll_and_publish()
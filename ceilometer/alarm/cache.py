@@ -0,0 +1,116 @@
+# -*- encoding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""In-memory cache of the alarms to evaluate, refreshed incrementally.
+"""
+
+import datetime
+import time
+
+from oslo.config import cfg
+
+from ceilometer.openstack.common.gettextutils import _
+from ceilometer.openstack.common import log
+from ceilometer.openstack.common import timeutils
+
+OPTS = [
+    cfg.IntOpt('alarm_cache_resync_interval',
+               default=600,
+               help='Number of seconds between two complete reloads of the '
+               'alarms evaluated, which only fetch the alarms updated '
+               'since their previous fetch in between; the deleted alarms '
+               'are only noticed on these reloads (0 means reloading them '
+               'on every cycle)'),
+]
+
+cfg.CONF.register_opts(OPTS, group='alarm')
+
+LOG = log.getLogger(__name__)
+
+
+class AlarmCache(object):
+    """Enabled alarms indexed by meter name.
+
+    Only the alarms updated since the previous fetch are requested on
+    refresh, the disabled ones being dropped from the cache, so that the
+    evaluation cycles neither reload nor iterate over unchanged or
+    disabled alarms.
+    """
+
+    # margin applied to the time of the previous fetch, allowing for
+    # clock differences between the hosts updating the alarms
+    clock_skew = 60
+
+    def __init__(self, list_alarms):
+        """Create the cache.
+
+        :param list_alarms: Function returning the enabled alarms, or all
+                            the alarms updated at or after the datetime
+                            given as updated_since keyword argument.
+        """
+        self.list_alarms = list_alarms
+        self.index = {}
+        # alarm id -> meter name
+        self.meters = {}
+        self.fetched_at = None
+        self.resynced_at = None
+
+    def _resync_due(self):
+        interval = cfg.CONF.alarm.alarm_cache_resync_interval
+        return (self.resynced_at is None or
+                time.time() - self.resynced_at >= interval)
+
+    def _store(self, alarm):
+        self.discard(alarm.alarm_id)
+        if alarm.enabled:
+            self.index.setdefault(alarm.counter_name,
+                                  {})[alarm.alarm_id] = alarm
+            self.meters[alarm.alarm_id] = alarm.counter_name
+
+    def discard(self, alarm_id):
+        """Remove an alarm from the cache."""
+        meter = self.meters.pop(alarm_id, None)
+        if meter is None:
+            return
+        alarms = self.index[meter]
+        del alarms[alarm_id]
+        if not alarms:
+            del self.index[meter]
+
+    def refresh(self):
+        """Fetch the alarms updated since the previous refresh."""
+        fetched_at = timeutils.utcnow()
+        if self._resync_due():
+            alarms = self.list_alarms()
+            self.index = {}
+            self.meters = {}
+            self.resynced_at = time.time()
+        else:
+            since = self.fetched_at - datetime.timedelta(
+                seconds=self.clock_skew)
+            alarms = self.list_alarms(updated_since=since)
+        count = 0
+        for alarm in alarms:
+            self._store(alarm)
+            count += 1
+        self.fetched_at = fetched_at
+        LOG.debug(_('alarm cache refreshed with %d alarms') % count)
+
+    def alarms(self, meter=None):
+        """Return the enabled alarms, of the given meter or of all meters.
+        """
+        if meter is not None:
+            return self.index.get(meter, {}).values()
+        return [alarm
+                for alarms in self.index.itervalues()
+                for alarm in alarms.itervalues()]
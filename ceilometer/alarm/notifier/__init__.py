@@ -34,3 +34,13 @@ class AlarmNotifier(object):
         :param current: The current state of the alarm.
         :param reason: The reason the alarm changed its state.
         """
+
+    def notify_batch(self, action, notifications):
+        """Notify that several alarms have been triggered.
+
+        :param action: The action that is being attended, as a parsed URL.
+        :param notifications: A list of (alarm_id, previous, current,
+                              reason) tuples, as given to notify().
+        """
+        for notification in notifications:
+            self.notify(action, *notification)
@@ -17,13 +17,17 @@
 # under the License.
 """Rest alarm notifier."""
 
+import collections
+import urlparse
+
 import eventlet
 import requests
-import urlparse
+from requests import adapters
 
 from oslo.config import cfg
 
 from ceilometer.alarm import notifier
+from ceilometer.openstack.common.gettextutils import _
 from ceilometer.openstack.common import jsonutils
 from ceilometer.openstack.common import log
 
@@ -43,22 +47,82 @@ REST_NOTIFIER_OPTS = [
                 help='Verify the SSL Server certificate when \
                 calling alarm action'
                 ),
-
+    cfg.IntOpt('rest_notifier_workers',
+               default=16,
+               help='Maximum number of notifications sent at the same time '
+               'by each of the http and https notifiers'),
+    cfg.IntOpt('rest_notifier_queue_size',
+               default=1000,
+               help='Maximum number of notifications waiting for a worker, '
+               'beyond which new notifications are dropped'),
+    cfg.IntOpt('rest_notifier_pool_maxsize',
+               default=10,
+               help='Maximum number of connections kept open to each host '
+               'notified'),
+    cfg.FloatOpt('rest_notifier_timeout',
+                 default=10.0,
+                 help='Number of seconds to wait for the response to a '
+                 'notification (0 means no limit)'),
+    cfg.IntOpt('rest_notifier_max_retries',
+               default=3,
+               help='Number of times a notification is retried on a '
+               'connection error, timeout or server error'),
+    cfg.FloatOpt('rest_notifier_retry_backoff',
+                 default=1.0,
+                 help='Number of seconds before the first retry of a '
+                 'notification, doubled on each following retry'),
 ]
 
 cfg.CONF.register_opts(REST_NOTIFIER_OPTS, group="alarm")
 
 
 class RestAlarmNotifier(notifier.AlarmNotifier):
-    """Rest alarm notifier."""
+    """Rest alarm notifier.
 
-    @staticmethod
-    def notify(action, alarm_id, previous, current, reason):
+    The notifications are posted by a bounded pool of green threads, over
+    a session keeping the connections to each host open. Notifications
+    exceeding the pool wait in a bounded queue, and are dropped once the
+    queue is full.
+
+    The in_flight, succeeded, failed and dropped attributes count the
+    notifications being sent, sent, given up after the retries and not
+    sent for lack of room in the queue.
+    """
+
+    def __init__(self):
+        self.session = requests.Session()
+        adapter_args = {
+            'pool_maxsize': cfg.CONF.alarm.rest_notifier_pool_maxsize,
+        }
+        self.session.mount('http://', adapters.HTTPAdapter(**adapter_args))
+        self.session.mount('https://', adapters.HTTPAdapter(**adapter_args))
+        self.pool = eventlet.GreenPool(cfg.CONF.alarm.rest_notifier_workers)
+        self.pending = collections.deque()
+        self.in_flight = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def notify(self, action, alarm_id, previous, current, reason):
         LOG.info("Notifying alarm %s from %s to %s with action %s because %s",
                  alarm_id, previous, current, action, reason)
         body = {'alarm_id': alarm_id, 'previous': previous,
                 'current': current, 'reason': reason}
-        kwargs = {'data': jsonutils.dumps(body)}
+        self._submit(action.geturl(), self._request_args(action, body))
+
+    def notify_batch(self, action, notifications):
+        LOG.info("Notifying %d alarms with action %s",
+                 len(notifications), action)
+        body = {'alarms': [{'alarm_id': alarm_id, 'previous': previous,
+                            'current': current, 'reason': reason}
+                           for alarm_id, previous, current, reason
+                           in notifications]}
+        self._submit(action.geturl(), self._request_args(action, body))
+
+    @staticmethod
+    def _request_args(action, body):
+        kwargs = {'data': jsonutils.dumps(body),
+                  'timeout': cfg.CONF.alarm.rest_notifier_timeout or None}
 
         if action.scheme == 'https':
             default_verify = int(cfg.CONF.alarm.rest_notifier_ssl_verify)
@@ -71,5 +135,46 @@ class RestAlarmNotifier(notifier.AlarmNotifier):
             key = cfg.CONF.alarm.rest_notifier_certificate_key
             if cert:
                 kwargs['cert'] = (cert, key) if key else cert
+        return kwargs
+
+    def _submit(self, url, kwargs):
+        if (not self.pool.free() and
+                len(self.pending) >= cfg.CONF.alarm.rest_notifier_queue_size):
+            self.dropped += 1
+            LOG.warning(_('Too many notifications pending, dropping the '
+                          'notification to %s'), url)
+            return
+        # the notifications are sent in order, by any worker available
+        self.pending.append((url, kwargs))
+        if self.pool.free():
+            self.pool.spawn_n(self._worker)
+
+    def _worker(self):
+        while self.pending:
+            self._post(*self.pending.popleft())
 
-        eventlet.spawn_n(requests.post, action.geturl(), **kwargs)
+    def _post(self, url, kwargs):
+        self.in_flight += 1
+        try:
+            retries = cfg.CONF.alarm.rest_notifier_max_retries
+            for attempt in range(retries + 1):
+                if attempt:
+                    eventlet.sleep(cfg.CONF.alarm.rest_notifier_retry_backoff
+                                   * 2 ** (attempt - 1))
+                try:
+                    response = self.session.post(url, **kwargs)
+                except requests.exceptions.RequestException as e:
+                    error = e
+                    continue
+                if response.status_code < 400:
+                    self.succeeded += 1
+                    return
+                error = _('HTTP status %d') % response.status_code
+                # the client errors would not go away on a retry
+                if response.status_code < 500:
+                    break
+            self.failed += 1
+            LOG.error(_('Unable to notify %(url)s: %(error)s') %
+                      {'url': url, 'error': error})
+        finally:
+            self.in_flight -= 1
@@ -0,0 +1,122 @@
+# -*- encoding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Alarm partitioning between several alarm evaluators.
+
+The evaluators announce their presence to each other over RPC, and each
+one evaluates the alarms that the consistent hash ring built from the
+live evaluators assigns to it.
+"""
+
+import time
+
+from oslo.config import cfg
+
+from ceilometer.alarm import rpc as rpc_alarm
+from ceilometer.central import partition
+from ceilometer.openstack.common import log
+
+LOG = log.getLogger(__name__)
+
+OPTS = [
+    cfg.IntOpt('partition_heartbeat',
+               default=10,
+               help='Number of seconds between two presence announcements '
+               'of a partitioned alarm evaluator'),
+    cfg.IntOpt('partition_member_timeout',
+               default=30,
+               help='Number of seconds without presence announcement after '
+               'which a partitioned alarm evaluator is considered gone'),
+]
+
+cfg.CONF.register_opts(OPTS, group='alarm')
+
+
+class RPCMembership(partition.MembershipBase):
+    """Group membership built from the presence messages of the members.
+
+    Each member fans its presence out to all the others on each heartbeat,
+    and the last time a presence was received from a member is recorded
+    locally, so that no shared store is needed.
+    """
+
+    def __init__(self, url=None):
+        super(RPCMembership, self).__init__(url)
+        self.rpc = rpc_alarm.RPCAlarmPartitionCoordination()
+        self.last_seen = {}
+
+    def heartbeat(self, member_id):
+        self.record_presence(member_id)
+        self.rpc.presence(member_id)
+
+    def record_presence(self, member_id, leaving=False):
+        if leaving:
+            self.last_seen.pop(member_id, None)
+        else:
+            self.last_seen[member_id] = time.time()
+
+    def get_members(self, timeout):
+        deadline = time.time() - timeout
+        return [member_id for member_id, seen in self.last_seen.items()
+                if seen >= deadline]
+
+    def leave(self, member_id):
+        self.record_presence(member_id, leaving=True)
+        self.rpc.presence(member_id, leaving=True)
+
+
+class AlarmPartitionCoordinator(partition.PartitionCoordinator):
+    """Tell which alarms belong to this evaluator, handing them off safely.
+
+    The members do not all see a membership change at the same time, so
+    right after a rebalance two of them could both consider an alarm
+    theirs and notify its state transitions twice. During a grace period
+    following a change, an alarm is only evaluated by a member owning it
+    both before and after the change: alarms moving between members are
+    left aside until all of them agree on the new ring. A new member owns
+    nothing until its own grace period is over.
+    """
+
+    def __init__(self, backend, member_id, timeout, grace):
+        super(AlarmPartitionCoordinator, self).__init__(backend, member_id,
+                                                        timeout)
+        self.grace = grace
+        self.previous_ring = None
+        self.rebalanced_at = time.time()
+
+    @property
+    def rebalancing(self):
+        return time.time() - self.rebalanced_at < self.grace
+
+    def heartbeat(self):
+        ring = self.ring
+        super(AlarmPartitionCoordinator, self).heartbeat()
+        if self.ring is not ring:
+            # on successive changes, the alarms are handed off from the
+            # ring in use before the first of them
+            if not self.rebalancing:
+                self.previous_ring = ring
+            self.rebalanced_at = time.time()
+
+    def belongs(self, resource_id):
+        if not super(AlarmPartitionCoordinator, self).belongs(resource_id):
+            return False
+        if self.rebalancing:
+            return (self.previous_ring is not None and
+                    self.previous_ring.get_node(resource_id) ==
+                    self.member_id)
+        return True
+
+    def assigned_alarms(self, alarms):
+        """Return the alarms to be evaluated by this member."""
+        return self.extract_my_subset(alarms, key=lambda a: a.alarm_id)
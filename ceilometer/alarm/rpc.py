@@ -26,6 +26,16 @@ OPTS = [
     cfg.StrOpt('notifier_rpc_topic',
                default='alarm_notifier',
                help='the topic ceilometer uses for alarm notifier messages'),
+    cfg.StrOpt('partition_rpc_topic',
+               default='alarm_partition_coordination',
+               help='the topic ceilometer uses for alarm partition '
+                    'coordination messages'),
+    cfg.BoolOpt('notification_batching',
+                default=False,
+                help='Send the alarm notifications of an evaluation cycle '
+                     'in a single message, and post the notifications of '
+                     'the cycle sharing an action URL together, as a list '
+                     'of alarms'),
 ]
 
 cfg.CONF.register_opts(OPTS, group='alarm')
@@ -36,13 +46,40 @@ class RPCAlarmNotifier(rpc_proxy.RpcProxy):
         super(RPCAlarmNotifier, self).__init__(
             default_version='1.0',
             topic=cfg.CONF.alarm.notifier_rpc_topic)
+        self.pending = []
 
     def notify(self, alarm, previous, reason):
         actions = getattr(alarm, Alarm.ALARM_ACTIONS_MAP[alarm.state])
-        msg = self.make_msg('notify_alarm', data={
+        data = {
             'actions': actions,
             'alarm_id': alarm.alarm_id,
             'previous': previous,
             'current': alarm.state,
-            'reason': reason})
+            'reason': reason}
+        if cfg.CONF.alarm.notification_batching:
+            # sent on flush
+            self.pending.append(data)
+            return
+        msg = self.make_msg('notify_alarm', data=data)
         self.cast(context.get_admin_context(), msg)
+
+    def flush(self):
+        """Send the notifications accumulated in batching mode."""
+        if not self.pending:
+            return
+        alarms, self.pending = self.pending, []
+        msg = self.make_msg('notify_alarms', data={'alarms': alarms})
+        self.cast(context.get_admin_context(), msg)
+
+
+class RPCAlarmPartitionCoordination(rpc_proxy.RpcProxy):
+    def __init__(self):
+        super(RPCAlarmPartitionCoordination, self).__init__(
+            default_version='1.0',
+            topic=cfg.CONF.alarm.partition_rpc_topic)
+
+    def presence(self, member_id, leaving=False):
+        msg = self.make_msg('presence', data={
+            'member_id': member_id,
+            'leaving': leaving})
+        self.fanout_cast(context.get_admin_context(), msg)
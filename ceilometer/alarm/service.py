@@ -18,9 +18,14 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import os
+import time
+
 from oslo.config import cfg
 from stevedore import extension
 
+from ceilometer.alarm import cache
+from ceilometer.alarm import partition
 from ceilometer.alarm import rpc as rpc_alarm
 from ceilometer.service import prepare_service
 from ceilometer.openstack.common import log
@@ -29,7 +34,6 @@ from ceilometer.openstack.common import service as os_service
 from ceilometer.openstack.common.gettextutils import _
 from ceilometer.openstack.common.rpc import service as rpc_service
 from ceilometer.openstack.common.rpc import dispatcher as rpc_dispatcher
-from ceilometerclient import client as ceiloclient
 
 
 OPTS = [
@@ -38,64 +42,108 @@ OPTS = [
                help='Period of threshold evaluation cycle, should'
                     ' be >= than configured pipeline interval for'
                     ' collection of underlying metrics.'),
+    cfg.StrOpt('evaluation_backend',
+               default='api',
+               help='Where the threshold evaluator reads alarms and '
+                    'statistics and records alarm states, either through '
+                    'the API (api) or directly in the metering database '
+                    '(storage).'),
 ]
 
 cfg.CONF.register_opts(OPTS, group='alarm')
 cfg.CONF.import_opt('notifier_rpc_topic', 'ceilometer.alarm.rpc',
                     group='alarm')
+cfg.CONF.import_opt('partition_rpc_topic', 'ceilometer.alarm.rpc',
+                    group='alarm')
+cfg.CONF.import_opt('host', 'ceilometer.service')
 
 LOG = log.getLogger(__name__)
 
 
-class SingletonAlarmService(os_service.Service):
+class AlarmService(object):
+    """Threshold alarm evaluation cycles shared by the alarm services."""
 
     ALARM_NAMESPACE = 'ceilometer.alarm'
 
-    def __init__(self):
-        super(SingletonAlarmService, self).__init__()
+    # threshold evaluator extension of each evaluation backend
+    EVALUATORS = {
+        'api': 'threshold_eval',
+        'storage': 'threshold_eval_storage',
+    }
+
+    def __init__(self, *args, **kwargs):
+        super(AlarmService, self).__init__(*args, **kwargs)
         self.extension_manager = extension.ExtensionManager(
             namespace=self.ALARM_NAMESPACE,
             invoke_on_load=True,
             invoke_args=(rpc_alarm.RPCAlarmNotifier(),)
         )
+        self.evaluating = False
+        self.alarm_cache = None
+        # metrics of the evaluation cycles
+        self.cycle_duration = None
+        self.cycle_lag = 0.0
+        self.skipped_cycles = 0
 
     def start(self):
-        super(SingletonAlarmService, self).start()
+        super(AlarmService, self).start()
+        backend = cfg.CONF.alarm.evaluation_backend
         for ext in self.extension_manager.extensions:
-            if ext.name == 'threshold_eval':
+            if ext.name == self.EVALUATORS.get(backend):
                 self.threshold_eval = ext.obj
                 interval = cfg.CONF.alarm.threshold_evaluation_interval
-                args = [ext.obj, self._client()]
                 self.tg.add_timer(
                     interval,
                     self._evaluate_all_alarms,
                     0,
-                    *args)
+                    ext.obj)
                 break
         # Add a dummy thread to have wait() working
         self.tg.add_timer(604800, lambda: None)
 
-    @staticmethod
-    def _client():
-        auth_config = cfg.CONF.service_credentials
-        creds = dict(
-            os_auth_url=auth_config.os_auth_url,
-            os_tenant_name=auth_config.os_tenant_name,
-            os_password=auth_config.os_password,
-            os_username=auth_config.os_username,
-            cacert=auth_config.os_cacert,
-            endpoint_type=auth_config.os_endpoint_type,
-        )
-        return ceiloclient.get_client(2, **creds)
+    def _assigned_alarms(self, alarms):
+        """Return the alarms this service is in charge of evaluating."""
+        return alarms
+
+    def _evaluate_all_alarms(self, threshold_eval):
+        """Start an evaluation cycle unless the previous one is running.
 
-    @staticmethod
-    def _evaluate_all_alarms(threshold_eval, api_client):
+        The cycle is run in its own thread so that a slow cycle makes the
+        following one be skipped rather than queued behind it.
+        """
+        if self.evaluating:
+            self.skipped_cycles += 1
+            LOG.warning(_('Skipping threshold evaluation cycle, previous '
+                          'cycle still running'))
+            return
+        self.evaluating = True
+        self.tg.add_thread(self._evaluation_cycle, threshold_eval)
+
+    def _evaluation_cycle(self, threshold_eval):
+        start = time.time()
+        if self.alarm_cache is None:
+            self.alarm_cache = cache.AlarmCache(threshold_eval.list_alarms)
         try:
-            alarms = api_client.alarms.list()
-            threshold_eval.assign_alarms(alarms)
+            self.alarm_cache.refresh()
+            alarms = self.alarm_cache.alarms()
+            threshold_eval.assign_alarms(self._assigned_alarms(alarms))
             threshold_eval.evaluate()
         except Exception:
             LOG.exception(_('threshold evaluation cycle failed'))
+        finally:
+            self.evaluating = False
+            interval = cfg.CONF.alarm.threshold_evaluation_interval
+            self.cycle_duration = time.time() - start
+            # how late the alarms evaluated last are, compared to an
+            # evaluation completing within its interval
+            self.cycle_lag = max(0.0, self.cycle_duration - interval)
+            LOG.info(_('threshold evaluation cycle took %(duration).3fs, '
+                       'lagging by %(lag).3fs') %
+                     {'duration': self.cycle_duration, 'lag': self.cycle_lag})
+
+
+class SingletonAlarmService(AlarmService, os_service.Service):
+    pass
 
 
 def singleton_alarm():
@@ -103,7 +151,59 @@ def singleton_alarm():
     os_service.launch(SingletonAlarmService()).wait()
 
 
-cfg.CONF.import_opt('host', 'ceilometer.service')
+class PartitionedAlarmService(AlarmService, rpc_service.Service):
+    """Alarm service evaluating its share of the alarms.
+
+    Several instances can run side by side: they announce their presence
+    to each other over RPC and split the alarms by consistent hashing,
+    rebalancing them whenever an instance joins or leaves.
+    """
+
+    def __init__(self):
+        super(PartitionedAlarmService, self).__init__(
+            cfg.CONF.host, cfg.CONF.alarm.partition_rpc_topic)
+        self.membership = partition.RPCMembership()
+        heartbeat = cfg.CONF.alarm.partition_heartbeat
+        self.coordinator = partition.AlarmPartitionCoordinator(
+            self.membership,
+            '%s.%d' % (cfg.CONF.host, os.getpid()),
+            cfg.CONF.alarm.partition_member_timeout,
+            # time for the presence messages of a heartbeat to reach
+            # every member
+            2 * heartbeat)
+
+    def start(self):
+        super(PartitionedAlarmService, self).start()
+        self.tg.add_timer(cfg.CONF.alarm.partition_heartbeat,
+                          self.coordinator.heartbeat)
+
+    def stop(self):
+        try:
+            self.coordinator.leave()
+        except Exception:
+            LOG.exception(_('Unable to leave the alarm partitioning group'))
+        super(PartitionedAlarmService, self).stop()
+
+    def presence(self, context, data):
+        """Record the presence of a member of the partitioning group.
+
+        data should be a dict with the following keys:
+        - member_id, the id of the member
+        - leaving, whether the member is leaving the group
+
+        :param context: Request context.
+        :param data: A dict as described above.
+        """
+        self.membership.record_presence(data.get('member_id'),
+                                        data.get('leaving', False))
+
+    def _assigned_alarms(self, alarms):
+        return self.coordinator.assigned_alarms(alarms)
+
+
+def partitioned_alarm():
+    prepare_service()
+    os_service.launch(PartitionedAlarmService()).wait()
 
 
 class AlarmNotifierService(rpc_service.Service):
@@ -128,14 +228,16 @@ class AlarmNotifierService(rpc_service.Service):
             'ceilometer.alarm.' + cfg.CONF.alarm.notifier_rpc_topic,
         )
 
-    def _handle_action(self, action, alarm_id, previous, current, reason):
+    def _notifier(self, action, alarm_id):
+        """Return the parsed action and its notifier, or None if unusable.
+        """
         try:
             action = network_utils.urlsplit(action)
         except Exception:
             LOG.error(
                 _("Unable to parse action %(action)s for alarm %(alarm_id)s"),
                 locals())
-            return
+            return None, None
 
         try:
             notifier = self.notifiers[action.scheme].obj
@@ -145,6 +247,12 @@ class AlarmNotifierService(rpc_service.Service):
                 _("Action %(scheme)s for alarm %(alarm_id)s is unknown, "
                   "cannot notify"),
                 locals())
+            return None, None
+        return action, notifier
+
+    def _handle_action(self, action, alarm_id, previous, current, reason):
+        action, notifier = self._notifier(action, alarm_id)
+        if not notifier:
             return
 
         try:
@@ -155,6 +263,19 @@ class AlarmNotifierService(rpc_service.Service):
             LOG.exception(_("Unable to notify alarm %s"), alarm_id)
             return
 
+    def _handle_batch(self, action, notifications):
+        alarm_ids = ', '.join(str(n[0]) for n in notifications)
+        action, notifier = self._notifier(action, alarm_ids)
+        if not notifier:
+            return
+
+        try:
+            LOG.debug("Notifying alarms %s with action %s",
+                      alarm_ids, action)
+            notifier.notify_batch(action, notifications)
+        except Exception:
+            LOG.exception(_("Unable to notify alarms %s"), alarm_ids)
+
     def notify_alarm(self, context, data):
         """Notify that alarm has been triggered.
 
@@ -181,6 +302,34 @@ class AlarmNotifierService(rpc_service.Service):
                                 data.get('current'),
                                 data.get('reason'))
 
+    def notify_alarms(self, context, data):
+        """Notify that several alarms have been triggered.
+
+        The notifications sharing an action are handed over to its notifier
+        together.
+
+        data should be a dict with the following key:
+        - alarms, a list of dicts with the keys described in notify_alarm
+
+        :param context: Request context.
+        :param data: A dict as described above.
+        """
+        batches = {}
+        # the actions in the order they are first met
+        actions = []
+        for alarm in data.get('alarms', []):
+            notification = (alarm.get('alarm_id'),
+                            alarm.get('previous'),
+                            alarm.get('current'),
+                            alarm.get('reason'))
+            for action in alarm.get('actions') or []:
+                if action not in batches:
+                    batches[action] = []
+                    actions.append(action)
+                batches[action].append(notification)
+        for action in actions:
+            self._handle_batch(action, batches[action])
+
 
 def alarm_notifier():
     prepare_service()
@@ -0,0 +1,109 @@
+# -*- encoding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Threshold alarm evaluation working directly on the storage.
+"""
+
+from oslo.config import cfg
+
+from ceilometer.alarm import threshold_evaluation
+from ceilometer.openstack.common import timeutils
+from ceilometer import storage
+from ceilometer.storage import models
+
+
+class Evaluator(threshold_evaluation.Evaluator):
+    """Threshold alarm evaluator bypassing the API.
+
+    The alarms and their statistics are read from, and the alarm states
+    written to, the metering database through a single storage connection
+    instead of HTTP requests to the API, saving the authentication,
+    serialization and request handling costs of each evaluation.
+    """
+
+    # API query fields mapped to their SampleFilter arguments
+    QUERY_FIELDS = {
+        'user_id': 'user',
+        'project_id': 'project',
+        'resource_id': 'resource',
+        'source': 'source',
+    }
+
+    def __init__(self, notifier=None):
+        super(Evaluator, self).__init__(notifier)
+        self.storage_conn = None
+
+    @property
+    def _client(self):
+        """Construct or reuse the storage connection."""
+        if not self.storage_conn:
+            self.storage_conn = storage.get_connection(cfg.CONF)
+        return self.storage_conn
+
+    def _authenticate(self):
+        """The storage connection needs no authentication."""
+        return self._client
+
+    @classmethod
+    def _sample_filter(cls, meter, query):
+        """Convert an API statistics query to a storage sample filter.
+
+        The value of a user, project or resource constraint can be a list,
+        matching any of its values.
+        """
+        kwargs = {'meter': meter, 'metaquery': {}}
+        for constraint in query:
+            field = constraint['field']
+            op = constraint['op']
+            value = constraint['value']
+            if field == 'timestamp':
+                if op in ('lt', 'le'):
+                    kwargs['end'] = value
+                    kwargs['end_timestamp_op'] = op
+                else:
+                    kwargs['start'] = value
+                    kwargs['start_timestamp_op'] = op
+            elif field.startswith('metadata.'):
+                kwargs['metaquery'][field] = value
+            else:
+                kwargs[cls.QUERY_FIELDS[field]] = value
+        return storage.SampleFilter(**kwargs)
+
+    def _list_statistics(self, meter, query, period, groupby=None,
+                         aggregate=None):
+        """Compute the statistics of a meter from the storage."""
+        return list(self._client.get_meter_statistics(
+            self._sample_filter(meter, query),
+            period=period,
+            groupby=groupby,
+            aggregate=aggregate))
+
+    def _can_group(self):
+        """The storage drivers all group the statistics."""
+        return True
+
+    def _update_state(self, alarm, state):
+        """Persist the new state of an alarm in the storage."""
+        now = timeutils.utcnow()
+        data = alarm.as_dict()
+        data.update(state=state, state_timestamp=now, timestamp=now)
+        self._client.update_alarm(models.Alarm(**data))
+
+    def list_alarms(self, updated_since=None):
+        """Return the enabled alarms from the storage, or all the alarms
+           updated since the given datetime.
+        """
+        if updated_since is not None:
+            return list(self._client.get_alarms(enabled=None,
+                                                updated_since=updated_since))
+        return list(self._client.get_alarms(enabled=True))
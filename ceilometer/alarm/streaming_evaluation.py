@@ -0,0 +1,178 @@
+# -*- encoding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Threshold alarm evaluation on the stream of samples ingested.
+"""
+
+import calendar
+import datetime
+
+from ceilometer.alarm import storage_evaluation
+from ceilometer.openstack.common.gettextutils import _
+from ceilometer.openstack.common import log
+from ceilometer.openstack.common import timeutils
+from ceilometer.storage import models
+
+LOG = log.getLogger(__name__)
+
+# alarm attributes whose change invalidates the window of the alarm
+WINDOW_ATTRIBUTES = ('counter_name', 'period', 'evaluation_periods',
+                     'matching_metadata')
+
+# matching_metadata fields mapped to the sample field they match
+SAMPLE_FIELDS = {
+    'resource_id': 'resource_id',
+    'user_id': 'user_id',
+    'project_id': 'project_id',
+    'source': 'source',
+}
+
+
+class Window(object):
+    """Aggregates of the samples of an alarm, by evaluation period."""
+
+    def __init__(self, alarm):
+        self.period = alarm.period
+        self.periods = alarm.evaluation_periods
+        self.definition = tuple(getattr(alarm, a) for a in WINDOW_ATTRIBUTES)
+        # period start (in seconds since the epoch) -> [count, sum, min, max]
+        self.buckets = {}
+
+    def add(self, timestamp, volume):
+        """Add a sample, returning False if it is too old for the window.
+        """
+        seconds = calendar.timegm(timestamp.utctimetuple())
+        start = seconds - seconds % self.period
+        if self.buckets:
+            oldest = max(self.buckets) - (self.periods - 1) * self.period
+            if start < oldest:
+                return False
+        bucket = self.buckets.get(start)
+        if bucket is None:
+            self.buckets[start] = [1, volume, volume, volume]
+        else:
+            bucket[0] += 1
+            bucket[1] += volume
+            bucket[2] = min(bucket[2], volume)
+            bucket[3] = max(bucket[3], volume)
+        # only the most recent evaluation periods are kept
+        for old in sorted(self.buckets)[:-self.periods]:
+            del self.buckets[old]
+        return True
+
+    def statistics(self, unit):
+        """Return the statistics of each period, oldest first."""
+        statistics = []
+        for start in sorted(self.buckets):
+            count, total, minimum, maximum = self.buckets[start]
+            period_start = datetime.datetime.utcfromtimestamp(start)
+            period_end = period_start + datetime.timedelta(
+                seconds=self.period)
+            statistics.append(models.Statistics(
+                unit=unit, min=minimum, max=maximum, avg=total / count,
+                sum=total, count=count, period=self.period,
+                period_start=period_start, period_end=period_end,
+                duration=None, duration_start=None, duration_end=None))
+        return statistics
+
+
+class Evaluator(storage_evaluation.Evaluator):
+    """Threshold alarm evaluator fed with the samples as they are ingested.
+
+    The alarms are indexed by meter, so that each sample only costs the
+    update of the sliding windows of the alarms on its meter matching it,
+    and these alarms are evaluated as soon as their windows change instead
+    of on the next evaluation cycle.
+
+    Only state transitions are notified: the periodic evaluator still
+    handles the repeated actions and the alarms lacking data.
+    """
+
+    def __init__(self, notifier=None):
+        super(Evaluator, self).__init__(notifier)
+        self.index = {}
+        self.windows = {}
+
+    def assign_alarms(self, alarms):
+        """Assign alarms to be evaluated, keeping their current windows."""
+        super(Evaluator, self).assign_alarms(alarms)
+        index = {}
+        windows = {}
+        for alarm in alarms:
+            if not alarm.enabled:
+                continue
+            index.setdefault(alarm.counter_name, []).append(alarm)
+            window = self.windows.get(alarm.alarm_id)
+            if window is None or window.definition != tuple(
+                    getattr(alarm, a) for a in WINDOW_ATTRIBUTES):
+                window = Window(alarm)
+            windows[alarm.alarm_id] = window
+        self.index = index
+        self.windows = windows
+
+    @staticmethod
+    def _matches(alarm, sample):
+        for field, value in alarm.matching_metadata.iteritems():
+            if field.startswith('metadata.'):
+                actual = sample.get('resource_metadata') or {}
+                for key in field.split('.')[1:]:
+                    if not isinstance(actual, dict):
+                        return False
+                    actual = actual.get(key)
+            elif field in SAMPLE_FIELDS:
+                actual = sample.get(SAMPLE_FIELDS[field])
+            else:
+                return False
+            if actual != value:
+                return False
+        return True
+
+    @staticmethod
+    def _timestamp(sample):
+        timestamp = sample.get('timestamp')
+        if not timestamp:
+            return timeutils.utcnow()
+        if not isinstance(timestamp, datetime.datetime):
+            timestamp = timeutils.parse_isotime(timestamp)
+        return timeutils.normalize_time(timestamp)
+
+    def _refresh(self, alarm, state, reason):
+        # the samples keep flowing while the state stays the same
+        if alarm.state != state:
+            super(Evaluator, self)._refresh(alarm, state, reason)
+
+    def record_sample(self, sample):
+        """Update the windows of the alarms matching a sample, and evaluate
+           these alarms.
+
+        :param sample: A metering message, as received by the collector.
+        """
+        alarms = self.index.get(sample['counter_name'])
+        if not alarms:
+            return
+        timestamp = self._timestamp(sample)
+        for alarm in alarms:
+            if not self._matches(alarm, sample):
+                continue
+            window = self.windows[alarm.alarm_id]
+            if not window.add(timestamp, float(sample['counter_volume'])):
+                continue
+            # the alarm lacks data until all its periods are covered
+            if len(window.buckets) < window.periods:
+                continue
+            try:
+                self._evaluate_alarm(
+                    alarm, window.statistics(sample.get('counter_unit')))
+            except Exception:
+                LOG.exception(_('streaming evaluation of alarm %s failed') %
+                              alarm.alarm_id)
@@ -19,12 +19,33 @@
 import datetime
 import operator
 
+import eventlet
 from oslo.config import cfg
 
+from ceilometer import keystone_client
 from ceilometer.openstack.common import log
 from ceilometerclient import client as ceiloclient
 from ceilometer.openstack.common.gettextutils import _
 
+OPTS = [
+    cfg.IntOpt('evaluation_workers',
+               default=16,
+               help='Number of alarms evaluated concurrently'),
+    cfg.IntOpt('evaluation_timeout',
+               default=0,
+               help='Number of seconds after which the evaluation of an '
+               'alarm is abandoned until the next cycle (0 means no '
+               'limit)'),
+    cfg.BoolOpt('evaluation_batching',
+                default=True,
+                help='Retrieve in one grouped statistics query the data of '
+                'the alarms on the same meter and window that only differ '
+                'by the resource, user or project they match, when '
+                'evaluating through the storage'),
+]
+
+cfg.CONF.register_opts(OPTS, group='alarm')
+
 LOG = log.getLogger(__name__)
 
 COMPARATORS = {
@@ -40,6 +61,9 @@ UNKNOWN = 'insufficient data'
 OK = 'ok'
 ALARM = 'alarm'
 
+# matching_metadata fields whose statistics can be grouped by the storage
+GROUPBY_FIELDS = ('resource_id', 'user_id', 'project_id')
+
 
 class Evaluator(object):
     """This class implements the basic alarm threshold evaluation
@@ -58,27 +82,37 @@ class Evaluator(object):
         self.alarms = []
         self.notifier = notifier
         self.api_client = None
+        self.api_token = None
 
     def assign_alarms(self, alarms):
         """Assign alarms to be evaluated."""
         self.alarms = alarms
 
-    @property
-    def _client(self):
-        """Construct or reuse an authenticated API client."""
-        if not self.api_client:
+    def _authenticate(self):
+        """Construct the API client, or rebuild it once the shared Keystone
+           client has renewed its token, authenticating if needed.
+        """
+        keystone = keystone_client.get_client()
+        token = keystone.auth_token
+        if not self.api_client or token != self.api_token:
             auth_config = cfg.CONF.service_credentials
-            creds = dict(
-                os_auth_url=auth_config.os_auth_url,
-                os_tenant_name=auth_config.os_tenant_name,
-                os_password=auth_config.os_password,
-                os_username=auth_config.os_username,
-                cacert=auth_config.os_cacert,
-                endpoint_type=auth_config.os_endpoint_type,
+            endpoint = keystone.url_for(
+                service_type='metering',
+                endpoint_type=auth_config.os_endpoint_type)
+            self.api_client = ceiloclient.get_client(
+                2,
+                os_auth_token=token,
+                ceilometer_url=endpoint,
+                ca_file=auth_config.os_cacert,
             )
-            self.api_client = ceiloclient.get_client(2, **creds)
+            self.api_token = token
         return self.api_client
 
+    @property
+    def _client(self):
+        """Reuse the API client, authenticated on first use."""
+        return self.api_client or self._authenticate()
+
     @staticmethod
     def _constraints(alarm):
         """Assert the constraints on the statistics query."""
@@ -114,17 +148,73 @@ class Evaluator(object):
         LOG.debug(_('pruned statistics to %d') % len(statistics))
         return statistics
 
+    def _list_statistics(self, meter, query, period, groupby=None,
+                         aggregate=None):
+        """Query the statistics of a meter through the API.
+
+        The API client computes all the aggregates, and cannot group the
+        statistics: the alarms are not batched (see _can_group).
+        """
+        return self._client.statistics.list(meter, q=query, period=period)
+
+    def _can_group(self):
+        """Whether the statistics of several alarms can be retrieved in a
+           single grouped query.
+        """
+        return False
+
+    def _update_state(self, alarm, state):
+        """Persist the new state of an alarm through the API."""
+        self._client.alarms.update(alarm.alarm_id, **dict(state=state))
+
+    def list_alarms(self, updated_since=None):
+        """Return all the alarms from the API, or the alarms updated since
+           the given datetime.
+        """
+        client = self._authenticate()
+        if updated_since is None:
+            return client.alarms.list()
+        since = dict(field='timestamp', op='ge',
+                     value=updated_since.isoformat())
+        return client.alarms.list(q=[since])
+
     def _statistics(self, alarm, query):
         """Retrieve statistics over the current window."""
         LOG.debug(_('stats query %s') % query)
         try:
-            return self._client.statistics.list(alarm.counter_name,
-                                                q=query,
-                                                period=alarm.period)
+            return self._list_statistics(alarm.counter_name,
+                                         query,
+                                         alarm.period,
+                                         aggregate=[alarm.statistic])
         except Exception:
             LOG.exception(_('alarm stats retrieval failed'))
             return []
 
+    def _grouped_statistics(self, alarms, field, aggregate=None):
+        """Retrieve statistics over the current window for the values of
+           field matched by the alarms at once, as a dict of statistics
+           lists keyed by value. Only the aggregates given are computed,
+           if any.
+        """
+        values = sorted(set(a.matching_metadata[field] for a in alarms))
+        query = self._bound_duration(
+            alarms[0], [dict(field=field, op='eq', value=values)])
+        LOG.debug(_('stats query %(query)s grouped by %(field)s') %
+                  {'query': query, 'field': field})
+        try:
+            statistics = self._list_statistics(alarms[0].counter_name,
+                                               query,
+                                               alarms[0].period,
+                                               groupby=[field],
+                                               aggregate=aggregate)
+        except Exception:
+            LOG.exception(_('grouped alarm stats retrieval failed'))
+            return {}
+        grouped = {}
+        for stat in statistics:
+            grouped.setdefault(stat.groupby[field], []).append(stat)
+        return grouped
+
     def _refresh(self, alarm, state, reason):
         """Refresh alarm state."""
         try:
@@ -135,7 +225,7 @@ class Evaluator(object):
                                             'state': state,
                                             'reason': reason})
 
-                self._client.alarms.update(alarm.alarm_id, **dict(state=state))
+                self._update_state(alarm, state)
             alarm.state = state
             if self.notifier:
                 self.notifier.notify(alarm, previous, reason)
@@ -200,40 +290,130 @@ class Evaluator(object):
             reason = self._reason(alarm, statistics, distilled, state)
             self._refresh(alarm, state, reason)
 
+    def _evaluate_alarm(self, alarm, statistics=None):
+        """Evaluate a single alarm, over the given statistics if already
+           retrieved.
+        """
+        LOG.debug(_('evaluating alarm %s') % alarm.alarm_id)
+
+        if statistics is None:
+            query = self._bound_duration(
+                alarm,
+                self._constraints(alarm)
+            )
+            statistics = self._statistics(alarm, query)
+
+        statistics = self._sanitize(alarm, statistics)
+
+        if self._sufficient(alarm, statistics):
+
+            def _compare(stat):
+                op = COMPARATORS[alarm.comparison_operator]
+                value = getattr(stat, alarm.statistic)
+                limit = alarm.threshold
+                LOG.debug(_('comparing value %(value)s against threshold'
+                            ' %(limit)s') %
+                          {'value': value, 'limit': limit})
+                return op(value, limit)
+
+            self._transition(alarm,
+                             statistics,
+                             list(map(_compare, statistics)))
+
+    def _evaluate_alarm_bounded(self, alarm, statistics=None):
+        """Evaluate an alarm within the configured time limit.
+
+        A failed or timed out evaluation is retried naturally on the next
+        cycle, and does not prevent the other alarms from being evaluated.
+        """
+        timeout = eventlet.Timeout(cfg.CONF.alarm.evaluation_timeout or None)
+        try:
+            self._evaluate_alarm(alarm, statistics)
+        except eventlet.Timeout as t:
+            if t is not timeout:
+                raise
+            LOG.warning(_('evaluation of alarm %s timed out') %
+                        alarm.alarm_id)
+        except Exception:
+            LOG.exception(_('evaluation of alarm %s failed') % alarm.alarm_id)
+        finally:
+            timeout.cancel()
+
+    def _evaluate_batch(self, field, alarms):
+        """Evaluate alarms differing only by the value of field they match.
+        """
+        timeout = eventlet.Timeout(cfg.CONF.alarm.evaluation_timeout or None)
+        try:
+            grouped = self._grouped_statistics(
+                alarms, field,
+                aggregate=sorted(set(a.statistic for a in alarms)))
+        except eventlet.Timeout as t:
+            if t is not timeout:
+                raise
+            LOG.warning(_('grouped stats retrieval of %d alarms timed out') %
+                        len(alarms))
+            grouped = {}
+        finally:
+            timeout.cancel()
+        for alarm in alarms:
+            self._evaluate_alarm_bounded(
+                alarm, grouped.get(alarm.matching_metadata[field], []))
+
+    @staticmethod
+    def _batch_key(alarm):
+        """Key shared by the alarms whose statistics can be retrieved in
+           the same grouped query, None if the alarm cannot be batched.
+        """
+        fields = alarm.matching_metadata.keys()
+        if len(fields) == 1 and fields[0] in GROUPBY_FIELDS:
+            return (alarm.counter_name, alarm.period,
+                    alarm.evaluation_periods, fields[0])
+
+    def _batches(self, alarms):
+        """Split alarms between batches sharing a grouped statistics query
+           and alarms to evaluate on their own.
+        """
+        batches = {}
+        for alarm in alarms:
+            key = self._batch_key(alarm)
+            if key:
+                batches.setdefault(key, []).append(alarm)
+        singles = [alarm for alarm in alarms
+                   if len(batches.get(self._batch_key(alarm), [])) < 2]
+        batches = dict((key, batch) for key, batch in batches.iteritems()
+                       if len(batch) > 1)
+        return batches, singles
+
     def evaluate(self):
         """Evaluate the alarms assigned to this evaluator."""
 
         LOG.info(_('initiating evaluation cycle on %d alarms') %
                  len(self.alarms))
 
+        enabled = []
         for alarm in self.alarms:
-
             if not alarm.enabled:
                 LOG.debug(_('skipping alarm %s') % alarm.alarm_id)
                 continue
-            LOG.debug(_('evaluating alarm %s') % alarm.alarm_id)
-
-            query = self._bound_duration(
-                alarm,
-                self._constraints(alarm)
-            )
-
-            statistics = self._sanitize(
-                alarm,
-                self._statistics(alarm, query)
-            )
-
-            if self._sufficient(alarm, statistics):
-
-                def _compare(stat):
-                    op = COMPARATORS[alarm.comparison_operator]
-                    value = getattr(stat, alarm.statistic)
-                    limit = alarm.threshold
-                    LOG.debug(_('comparing value %(value)s against threshold'
-                                ' %(limit)s') %
-                              {'value': value, 'limit': limit})
-                    return op(value, limit)
-
-                self._transition(alarm,
-                                 statistics,
-                                 list(map(_compare, statistics)))
+            enabled.append(alarm)
+
+        if not enabled:
+            return
+        # authenticate, or renew the token, once per cycle before the
+        # workers share the client
+        self._authenticate()
+        if cfg.CONF.alarm.evaluation_batching and self._can_group():
+            batches, enabled = self._batches(enabled)
+        else:
+            batches = {}
+        pool = eventlet.GreenPool(cfg.CONF.alarm.evaluation_workers)
+        for alarm in enabled:
+            pool.spawn_n(self._evaluate_alarm_bounded, alarm)
+        for key, alarms in batches.iteritems():
+            LOG.debug(_('evaluating %(count)d alarms on %(meter)s in batch') %
+                      {'count': len(alarms), 'meter': key[0]})
+            pool.spawn_n(self._evaluate_batch, key[-1], alarms)
+        pool.waitall()
+        if self.notifier:
+            # send the notifications batched during the cycle, if any
+            self.notifier.flush()
@@ -30,6 +30,22 @@ API_SERVICE_OPTS = [
                default='0.0.0.0',
                help='The listen IP for the ceilometer API server',
                ),
+    cfg.IntOpt('workers',
+               default=1,
+               help='Number of processes serving the ceilometer API, '
+               'sharing its listening socket'),
+    cfg.IntOpt('wsgi_pool_size',
+               default=1000,
+               help='Maximum number of green threads of each API process, '
+               'that is of requests it handles concurrently'),
+    cfg.BoolOpt('wsgi_keep_alive',
+                default=True,
+                help='Keep the client connections open between requests '
+                '(HTTP keep-alive)'),
+    cfg.IntOpt('wsgi_shutdown_timeout',
+               default=30,
+               help='Number of seconds given to the requests in progress to '
+               'complete when an API process stops or reloads'),
 ]
 
 CONF = cfg.CONF
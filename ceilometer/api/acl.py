@@ -24,6 +24,10 @@ from oslo.config import cfg
 
 
 _ENFORCER = None
+# decisions of the admin rule by roles, for the rules of _ADMIN_RULES
+_ADMIN_ROLES = {}
+_ADMIN_ROLES_SIZE = 1000
+_ADMIN_RULES = None
 OPT_GROUP_NAME = 'keystone_authtoken'
 
 
@@ -44,12 +48,31 @@ def install(app, conf):
                                    conf=dict(conf.get(OPT_GROUP_NAME)))
 
 
-def get_limited_to_project(headers):
-    """Return the tenant the request should be limited to."""
-    global _ENFORCER
+def is_admin(roles):
+    """Tell whether the roles, as given by the X-Roles header, are admin.
+
+    The decisions are cached by roles until the policy file is modified.
+    """
+    global _ENFORCER, _ADMIN_RULES
     if not _ENFORCER:
         _ENFORCER = policy.Enforcer()
-    if not _ENFORCER.enforce('context_is_admin',
-                             {},
-                             {'roles': headers.get('X-Roles', "").split(",")}):
+    # reloads the rules if the policy file was modified
+    _ENFORCER.load_rules()
+    if _ENFORCER.rules is not _ADMIN_RULES:
+        _ADMIN_ROLES.clear()
+        _ADMIN_RULES = _ENFORCER.rules
+    admin = _ADMIN_ROLES.get(roles)
+    if admin is None:
+        admin = bool(_ENFORCER.enforce('context_is_admin',
+                                       {},
+                                       {'roles': roles.split(",")}))
+        if len(_ADMIN_ROLES) >= _ADMIN_ROLES_SIZE:
+            _ADMIN_ROLES.clear()
+        _ADMIN_ROLES[roles] = admin
+    return admin
+
+
+def get_limited_to_project(headers):
+    """Return the tenant the request should be limited to."""
+    if not is_admin(headers.get('X-Roles', "")):
         return headers.get('X-Project-Id')
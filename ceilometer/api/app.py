@@ -18,17 +18,22 @@
 
 import logging
 import os
+
+import eventlet
+from eventlet import wsgi
 from oslo.config import cfg
 import pecan
 
 from ceilometer.api import acl
+from ceilometer.api import compact
 from ceilometer.api import config as api_config
 from ceilometer.api import hooks
 from ceilometer.api import middleware
+from ceilometer.api import streaming
 from ceilometer import service
 from ceilometer import storage
 from ceilometer.openstack.common import log
-from wsgiref import simple_server
+from ceilometer.openstack.common import service as os_service
 
 LOG = log.getLogger(__name__)
 
@@ -53,13 +58,17 @@ def get_pecan_config():
 
 def setup_app(pecan_config=None, extra_hooks=None):
     storage_engine = storage.get_engine(cfg.CONF)
+    pipeline_hook = hooks.PipelineHook()
     # FIXME: Replace DBHook with a hooks.TransactionHook
     app_hooks = [hooks.ConfigHook(),
+                 hooks.AuthProjectHook(),
                  hooks.DBHook(
                      storage_engine,
                      storage_engine.get_connection(cfg.CONF),
                  ),
-                 hooks.PipelineHook(),
+                 pipeline_hook,
+                 hooks.IngestionHook(pipeline_hook.pipeline_manager),
+                 hooks.StatisticsCacheHook(),
                  hooks.TranslationHook()]
     if extra_hooks:
         app_hooks.extend(extra_hooks)
@@ -69,6 +78,9 @@ def setup_app(pecan_config=None, extra_hooks=None):
 
     pecan.configuration.set_config(dict(pecan_config), overwrite=True)
 
+    renderers = {streaming.RENDERER: streaming.StreamRenderer}
+    renderers.update(compact.RENDERERS)
+
     app = pecan.make_app(
         pecan_config.app.root,
         static_root=pecan_config.app.static_root,
@@ -77,6 +89,7 @@ def setup_app(pecan_config=None, extra_hooks=None):
         force_canonical=getattr(pecan_config.app, 'force_canonical', True),
         hooks=app_hooks,
         wrap_app=middleware.ParsableErrorMiddleware,
+        custom_renderers=renderers,
     )
 
     if pecan_config.app.enable_acl:
@@ -105,15 +118,51 @@ class VersionSelectorApplication(object):
         return self.v2(environ, start_response)
 
 
+class APIService(os_service.Service):
+    """Serve the API with the eventlet WSGI server.
+
+    The listening socket is bound before the worker processes are forked,
+    so that all of them accept connections on it. Each worker builds its
+    own application, hence its own storage connection, and handles the
+    requests in a pool of green threads. When a worker stops or reloads
+    its configuration (on SIGHUP), it stops accepting connections and
+    gives the requests in progress some time to complete.
+    """
+
+    def __init__(self, app_factory, sock):
+        super(APIService, self).__init__()
+        self.app_factory = app_factory
+        self.sock = sock
+        self.pool = None
+
+    def start(self):
+        super(APIService, self).start()
+        self.pool = eventlet.GreenPool(cfg.CONF.api.wsgi_pool_size)
+        # the server closes its socket when stopped, the listening one is
+        # kept to serve again on reload
+        self.tg.add_thread(wsgi.server,
+                           self.sock.dup(),
+                           self.app_factory(),
+                           custom_pool=self.pool,
+                           keepalive=cfg.CONF.api.wsgi_keep_alive,
+                           log=log.WritableLogger(
+                               log.getLogger('eventlet.wsgi.server')))
+
+    def stop(self):
+        # stop accepting connections, then wait for the requests in progress
+        self.tg.stop()
+        if self.pool is not None:
+            with eventlet.Timeout(cfg.CONF.api.wsgi_shutdown_timeout, False):
+                self.pool.waitall()
+        super(APIService, self).stop()
+
+
 def start():
     service.prepare_service()
 
-    # Build the WSGI app
-    root = VersionSelectorApplication()
-
-    # Create the WSGI server and start it
+    # Bind the socket shared by the workers
     host, port = cfg.CONF.api.host, cfg.CONF.api.port
-    srv = simple_server.make_server(host, port, root)
+    sock = eventlet.listen((host, port))
 
     LOG.info('Starting server in PID %s' % os.getpid())
     LOG.info("Configuration:")
@@ -125,4 +174,8 @@ def start():
     else:
         LOG.info("serving on http://%s:%s" % (host, port))
 
-    srv.serve_forever()
+    workers = cfg.CONF.api.workers
+    launcher = os_service.launch(
+        APIService(VersionSelectorApplication, sock),
+        workers=workers if workers > 1 else None)
+    launcher.wait()
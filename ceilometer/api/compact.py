@@ -0,0 +1,121 @@
+# -*- encoding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Compact binary formats of the API responses.
+
+Besides JSON and XML, the listings and statistics can be requested in
+MessagePack, either as the same document as in JSON (MSGPACK), or in
+columns (COLUMNS): a sequence of MessagePack maps, each holding the values
+of a block of documents as an array per field, which the streamed
+listings encode as they are read from storage. The errors are still
+reported in JSON.
+"""
+
+import itertools
+
+import msgpack
+from oslo.config import cfg
+import pecan
+import wsme.rest.json
+import wsmeext.pecan as wsme_pecan
+
+OPTS = [
+    cfg.IntOpt('columns_block_size',
+               default=1000,
+               help='Number of documents of the blocks of the listings '
+               'returned in columns'),
+]
+
+cfg.CONF.register_opts(OPTS, group='api')
+
+MSGPACK = 'application/x-msgpack'
+COLUMNS = 'application/vnd.ceilometer.columns+msgpack'
+
+# renderers of the WSME results in the compact formats
+MSGPACK_RENDERER = 'msgpack'
+COLUMNS_RENDERER = 'msgpack_columns'
+
+
+def _pack_block(documents):
+    fields = sorted(set(itertools.chain.from_iterable(documents)))
+    return msgpack.packb(dict((field, [d.get(field) for d in documents])
+                              for field in fields))
+
+
+def columns(documents):
+    """Yield the blocks of columns of the given documents.
+
+    :param documents: Iterable of dictionaries serializable in MessagePack.
+    """
+    block_size = cfg.CONF.api.columns_block_size
+    block = []
+    for document in documents:
+        block.append(document)
+        if len(block) >= block_size:
+            yield _pack_block(block)
+            block = []
+    if block:
+        yield _pack_block(block)
+
+
+class MsgpackRenderer(object):
+    """Render the WSME results in MessagePack."""
+
+    def __init__(self, path, extra_vars):
+        pass
+
+    @staticmethod
+    def encode(data):
+        return msgpack.packb(data)
+
+    def render(self, template_path, namespace):
+        if 'faultcode' in namespace:
+            return wsme.rest.json.encode_error(None, namespace)
+        return self.encode(wsme.rest.json.tojson(namespace['datatype'],
+                                                 namespace['result']))
+
+
+class ColumnsRenderer(MsgpackRenderer):
+    """Render the WSME listings in MessagePack blocks of columns."""
+
+    @staticmethod
+    def encode(data):
+        return ''.join(columns(data))
+
+
+RENDERERS = {
+    MSGPACK_RENDERER: MsgpackRenderer,
+    COLUMNS_RENDERER: ColumnsRenderer,
+}
+
+
+def wsexpose(*args, **kwargs):
+    """Expose a WSME controller also in the compact formats.
+
+    The arguments are those of wsmeext.pecan.wsexpose. The controllers
+    returning a list can be exposed in columns.
+    """
+    wsme_decorate = wsme_pecan.wsexpose(*args, **kwargs)
+
+    def decorate(f):
+        # the content types exposed on the function are kept by the
+        # function WSME wraps it in, which is then exposed in JSON (the
+        # default content type) and XML, with the arguments of f
+        pecan.expose(template=MSGPACK_RENDERER + ':', content_type=MSGPACK,
+                     generic=False)(f)
+        if isinstance(args[0], list):
+            pecan.expose(template=COLUMNS_RENDERER + ':',
+                         content_type=COLUMNS, generic=False)(f)
+        return wsme_decorate(f)
+
+    return decorate
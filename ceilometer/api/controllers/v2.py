@@ -29,9 +29,11 @@
 # [GET   ] /meters/<meter> -- list the samples for this meter
 # [PUT   ] /meters/<meter> -- update the meter (not the samples)
 # [DELETE] /meters/<meter> -- delete the meter and samples
+# [POST  ] /samples -- queue new samples of any meters to publish
 #
 import datetime
 import inspect
+import json
 import pecan
 from pecan import rest
 
@@ -45,7 +47,10 @@ from ceilometer.openstack.common import log
 from ceilometer.openstack.common import timeutils
 from ceilometer import sample
 from ceilometer import storage
-from ceilometer.api import acl
+from ceilometer.storage import base as storage_base
+from ceilometer.api import compact
+from ceilometer.api import ingestion
+from ceilometer.api import streaming
 
 
 LOG = log.getLogger(__name__)
@@ -53,6 +58,9 @@ LOG = log.getLogger(__name__)
 
 operation_kind = wtypes.Enum(str, 'lt', 'le', 'eq', 'ne', 'ge', 'gt')
 
+STATISTICS_GROUPBY_FIELDS = ('user_id', 'project_id', 'resource_id',
+                             'source')
+
 
 class _Base(wtypes.Base):
 
@@ -135,7 +143,7 @@ def _sanitize_query(q):
     2) non-admin - make sure that the query includes the requester's
     project.
     '''
-    auth_project = acl.get_limited_to_project(pecan.request.headers)
+    auth_project = pecan.request.auth_project
     if auth_project:
         proj_q = [i for i in q if i.field == 'project_id']
         for i in proj_q:
@@ -203,6 +211,10 @@ def _query_to_kwargs(query, db_func):
         elif 'start_timestamp' in valid_keys:
             kwargs['start_timestamp'] = q_ts['query_start']
             kwargs['end_timestamp'] = q_ts['query_end']
+        elif 'updated_since' in valid_keys and not q_ts['query_end']:
+            kwargs['updated_since'] = q_ts['query_start']
+            # the lower bound is always inclusive
+            stamp.pop('start_timestamp_op', None)
         else:
             raise wsme.exc.UnknownArgument('timestamp',
                                            "not valid for this resource")
@@ -345,6 +357,24 @@ class Sample(_Base):
         if self.resource_metadata in (wtypes.Unset, None):
             self.resource_metadata = {}
 
+    @staticmethod
+    def json_from_db_model(m):
+        """Return the JSON document of the Sample of a storage sample,
+        without building the Sample.
+        """
+        return {'source': m.source,
+                'counter_name': m.counter_name,
+                'counter_type': m.counter_type,
+                'counter_unit': m.counter_unit,
+                'counter_volume': float(m.counter_volume),
+                'user_id': m.user_id,
+                'project_id': m.project_id,
+                'resource_id': m.resource_id,
+                'timestamp': m.timestamp and m.timestamp.isoformat(),
+                'resource_metadata': _flatten_metadata(m.resource_metadata),
+                'message_id': m.message_id,
+                }
+
     @classmethod
     def sample(cls):
         return cls(source='openstack',
@@ -402,7 +432,20 @@ class Statistics(_Base):
     period_end = datetime.datetime
     "UTC date and time of the period end"
 
+    groupby = {wtypes.text: wtypes.text}
+    "The values of the fields these statistics are grouped by"
+
+    stddev = float
+    "The standard deviation of the volume values, if requested"
+
+    percentiles = {wtypes.text: float}
+    "The estimated percentiles of the volume values requested, as pNN"
+
     def __init__(self, start_timestamp=None, end_timestamp=None, **kwds):
+        if kwds.get('groupby'):
+            # the values of the metadata fields are not always text
+            kwds['groupby'] = dict((k, v if v is None else unicode(v))
+                                   for k, v in kwds['groupby'].iteritems())
         super(Statistics, self).__init__(**kwds)
         self._update_duration(start_timestamp, end_timestamp)
 
@@ -465,7 +508,7 @@ class MeterController(rest.RestController):
         pecan.request.context['meter_id'] = meter_id
         self._id = meter_id
 
-    @wsme_pecan.wsexpose([Sample], [Query], int)
+    @compact.wsexpose([Sample], [Query], int)
     def get_all(self, q=[], limit=None):
         """Return samples for the meter.
 
@@ -477,9 +520,11 @@ class MeterController(rest.RestController):
         kwargs = _query_to_kwargs(q, storage.SampleFilter.__init__)
         kwargs['meter'] = self._id
         f = storage.SampleFilter(**kwargs)
-        return [Sample.from_db_model(e)
-                for e in pecan.request.storage_conn.get_samples(f, limit=limit)
-                ]
+        samples = pecan.request.storage_conn.get_samples(f, limit=limit)
+        if streaming.enabled():
+            return streaming.stream(Sample.json_from_db_model(e)
+                                    for e in samples)
+        return [Sample.from_db_model(e) for e in samples]
 
     @wsme.validate([Sample])
     @wsme_pecan.wsexpose([Sample], body=[Sample])
@@ -513,7 +558,7 @@ class MeterController(rest.RestController):
 
         samples = [Sample(**b) for b in body]
         now = timeutils.utcnow()
-        auth_project = acl.get_limited_to_project(pecan.request.headers)
+        auth_project = pecan.request.auth_project
         source = get_consistent_source()
         for s in samples:
             if self._id != s.counter_name:
@@ -559,18 +604,48 @@ class MeterController(rest.RestController):
         # a list of message_ids).
         return samples
 
-    @wsme_pecan.wsexpose([Statistics], [Query], int)
-    def statistics(self, q=[], period=None):
+    @compact.wsexpose([Statistics], [Query], int, [unicode], [unicode])
+    def statistics(self, q=[], period=None, groupby=[], aggregate=[]):
         """Computes the statistics of the samples in the time range given.
 
         :param q: Filter rules for the data to be returned.
         :param period: Returned result will be an array of statistics for a
                        period long of that number of seconds.
+        :param groupby: Fields for which to compute separate statistics,
+                        among user_id, project_id, resource_id, source
+                        and the metadata fields, as metadata.<key>.
+        :param aggregate: Aggregates to compute, among min, max, avg, sum,
+                          count, stddev and the percentiles as pNN (p95
+                          for instance). min, max, avg, sum and count by
+                          default.
         """
+        for field in groupby:
+            if (field not in STATISTICS_GROUPBY_FIELDS
+                    and not field.startswith('metadata.')):
+                raise wsme.exc.InvalidInput('groupby', field,
+                                            'unable to group by this field')
+        for name in aggregate:
+            try:
+                storage_base.parse_aggregates([name])
+            except ValueError:
+                raise wsme.exc.InvalidInput('aggregate', name,
+                                            'unknown aggregate')
         kwargs = _query_to_kwargs(q, storage.SampleFilter.__init__)
         kwargs['meter'] = self._id
         f = storage.SampleFilter(**kwargs)
-        computed = pecan.request.storage_conn.get_meter_statistics(f, period)
+        # only the options given are passed, the drivers defaulting them
+        stats_kwargs = {}
+        if groupby:
+            stats_kwargs['groupby'] = groupby
+        if aggregate:
+            stats_kwargs['aggregate'] = aggregate
+        cache = pecan.request.statistics_cache
+        if cache is not None:
+            computed = cache.get_meter_statistics(
+                pecan.request.storage_conn, f, period, **stats_kwargs)
+        else:
+            computed = pecan.request.storage_conn.get_meter_statistics(
+                f, period, **stats_kwargs)
         LOG.debug('computed value coming from %r', pecan.request.storage_conn)
         # Find the original timestamp in the query to use for clamping
         # the duration returned in the statistics.
@@ -632,7 +707,7 @@ class MetersController(rest.RestController):
             remainder = remainder[:-1]
         return MeterController(meter_id), remainder
 
-    @wsme_pecan.wsexpose([Meter], [Query])
+    @compact.wsexpose([Meter], [Query])
     def get_all(self, q=[]):
         """Return all known meters, based on the data recorded so far.
 
@@ -669,6 +744,18 @@ class Resource(_Base):
         metadata = _flatten_metadata(metadata)
         super(Resource, self).__init__(metadata=metadata, **kwds)
 
+    @staticmethod
+    def json_from_db_and_links(m, links):
+        """Return the JSON document of the Resource of a storage resource,
+        without building the Resource.
+        """
+        return {'resource_id': m.resource_id,
+                'project_id': m.project_id,
+                'user_id': m.user_id,
+                'metadata': _flatten_metadata(m.metadata),
+                'links': [{'href': l.href, 'rel': l.rel} for l in links],
+                }
+
     @classmethod
     def sample(cls):
         return cls(resource_id='bd9431c1-8d69-4ad3-803a-8d4a6b89fd36',
@@ -691,14 +778,19 @@ class Resource(_Base):
 class ResourcesController(rest.RestController):
     """Works on resources."""
 
-    def _resource_links(self, resource_id):
-        links = [_make_link('self', pecan.request.host_url, 'resources',
-                            resource_id)]
-        for meter in pecan.request.storage_conn.get_meters(resource=
-                                                           resource_id):
-            query = {'field': 'resource_id', 'value': resource_id}
-            links.append(_make_link(meter.name, pecan.request.host_url,
-                                    'meters', meter.name, query=query))
+    @staticmethod
+    def _resource_links(url, resource):
+        links = [_make_link('self', url, 'resources', resource.resource_id)]
+        # the meters come with the resource, some drivers listing a meter
+        # once per sample
+        names = set()
+        for meter in resource.meter:
+            if meter.counter_name in names:
+                continue
+            names.add(meter.counter_name)
+            query = {'field': 'resource_id', 'value': resource.resource_id}
+            links.append(_make_link(meter.counter_name, url, 'meters',
+                                    meter.counter_name, query=query))
         return links
 
     @wsme_pecan.wsexpose(Resource, unicode)
@@ -707,7 +799,7 @@ class ResourcesController(rest.RestController):
 
         :param resource_id: The UUID of the resource.
         """
-        authorized_project = acl.get_limited_to_project(pecan.request.headers)
+        authorized_project = pecan.request.auth_project
         resources = list(pecan.request.storage_conn.get_resources(
             resource=resource_id, project=authorized_project))
         # FIXME (flwang): Need to change this to return a 404 error code when
@@ -718,21 +810,27 @@ class ResourcesController(rest.RestController):
             raise wsme.exc.InvalidInput("resource_id",
                                         resource_id,
                                         error)
-        return Resource.from_db_and_links(resources[0],
-                                          self._resource_links(resource_id))
+        return Resource.from_db_and_links(
+            resources[0],
+            self._resource_links(pecan.request.host_url, resources[0]))
 
-    @wsme_pecan.wsexpose([Resource], [Query])
+    @compact.wsexpose([Resource], [Query])
     def get_all(self, q=[]):
         """Retrieve definitions of all of the resources.
 
         :param q: Filter rules for the resources to be returned.
         """
-        kwargs = _query_to_kwargs(q, pecan.request.storage_conn.get_resources)
-        resources = [
-            Resource.from_db_and_links(r,
-                                       self._resource_links(r.resource_id))
-            for r in pecan.request.storage_conn.get_resources(**kwargs)]
-        return resources
+        conn = pecan.request.storage_conn
+        url = pecan.request.host_url
+        kwargs = _query_to_kwargs(q, conn.get_resources)
+        resources = conn.get_resources(**kwargs)
+        if streaming.enabled():
+            return streaming.stream(
+                Resource.json_from_db_and_links(
+                    r, self._resource_links(url, r))
+                for r in resources)
+        return [Resource.from_db_and_links(r, self._resource_links(url, r))
+                for r in resources]
 
 
 class Alarm(_Base):
@@ -883,7 +981,7 @@ class AlarmController(rest.RestController):
 
     def _alarm(self):
         self.conn = pecan.request.storage_conn
-        auth_project = acl.get_limited_to_project(pecan.request.headers)
+        auth_project = pecan.request.auth_project
         alarms = list(self.conn.get_alarms(alarm_id=self._id,
                                            project=auth_project))
         # FIXME (flwang): Need to change this to return a 404 error code when
@@ -913,6 +1011,7 @@ class AlarmController(rest.RestController):
             setattr(alarm_in, k, v)
             if k == 'state':
                 alarm_in.state_timestamp = timeutils.utcnow()
+        alarm_in.timestamp = timeutils.utcnow()
 
         alarm = self.conn.update_alarm(alarm_in)
         return Alarm.from_db_model(alarm)
@@ -984,17 +1083,75 @@ class AlarmsController(rest.RestController):
     def get_all(self, q=[]):
         """Return all alarms, based on the query provided.
 
+        The alarms updated since a time, selected by a lower bound on their
+        timestamp, include the disabled ones.
+
         :param q: Filter rules for the alarms to be returned.
         """
         kwargs = _query_to_kwargs(q,
                                   pecan.request.storage_conn.get_alarms)
+        if 'updated_since' in kwargs:
+            kwargs.setdefault('enabled', None)
         return [Alarm.from_db_model(m)
                 for m in pecan.request.storage_conn.get_alarms(**kwargs)]
 
 
+def _fault(status, message):
+    """Return the fault of a controller exposed without WSME."""
+    pecan.response.status = status
+    return {'faultcode': 'Client',
+            'faultstring': message,
+            'debuginfo': None}
+
+
+class SamplesController(rest.RestController):
+    """Samples of any meters posted in batches."""
+
+    @pecan.expose('json')
+    def post(self):
+        """Queue a batch of new samples of any meters to publish.
+
+        The body is a list of samples, as posted to /meters/<meter>. They
+        are published asynchronously, the response (202 Accepted) being
+        the list of their message ids.
+        """
+        try:
+            documents = json.loads(pecan.request.body)
+        except ValueError:
+            return _fault(400, _('the body is not valid JSON'))
+        if (isinstance(documents, list) and
+                len(documents) > pecan.request.cfg.api.ingestion_batch_size):
+            return _fault(413, _('too many samples posted at once'))
+
+        headers = pecan.request.headers
+        try:
+            samples = ingestion.make_samples(
+                documents,
+                user_id=headers.get('X-User-Id'),
+                project_id=headers.get('X-Project-Id'),
+                auth_project=pecan.request.auth_project)
+        except ValueError as err:
+            return _fault(400, unicode(err))
+
+        ingester = pecan.request.ingester
+        project = headers.get('X-Project-Id')
+        if not ingester.limiter.consume(project, len(samples)):
+            # not a status known to webob yet
+            return _fault('429 Too Many Requests',
+                          _('too many samples posted by the project'))
+        if samples and not ingester.put(samples):
+            # the samples refused do not count against the rate limit
+            ingester.limiter.refund(project, len(samples))
+            return _fault(503, _('too many samples waiting to be '
+                                 'published'))
+        pecan.response.status = 202
+        return [s.id for s in samples]
+
+
 class V2Controller(object):
     """Version 2 API controller root."""
 
     resources = ResourcesController()
     meters = MetersController()
     alarms = AlarmsController()
+    samples = SamplesController()
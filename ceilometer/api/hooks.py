@@ -21,6 +21,9 @@ import threading
 from oslo.config import cfg
 from pecan import hooks
 
+from ceilometer.api import acl
+from ceilometer.api import ingestion
+from ceilometer.api import statistics_cache
 from ceilometer import pipeline
 from ceilometer import transformer
 
@@ -34,6 +37,16 @@ class ConfigHook(hooks.PecanHook):
         state.request.cfg = cfg.CONF
 
 
+class AuthProjectHook(hooks.PecanHook):
+    '''Attach to the request the project it is limited to, None if
+    unlimited, so that the policy is checked once per request.
+    '''
+
+    def before(self, state):
+        state.request.auth_project = acl.get_limited_to_project(
+            state.request.headers)
+
+
 class DBHook(hooks.PecanHook):
 
     def __init__(self, storage_engine, storage_connection):
@@ -45,6 +58,18 @@ class DBHook(hooks.PecanHook):
         state.request.storage_conn = self.storage_connection
 
 
+class StatisticsCacheHook(hooks.PecanHook):
+    '''Attach the statistics cache of the process, if enabled, to the
+    request.
+    '''
+
+    def __init__(self):
+        self.statistics_cache = statistics_cache.get_cache(cfg.CONF)
+
+    def before(self, state):
+        state.request.statistics_cache = self.statistics_cache
+
+
 class PipelineHook(hooks.PecanHook):
     '''Create and attach a pipeline to the request so that
     new samples can be posted via the /v2/meters/ API.
@@ -64,6 +89,18 @@ class PipelineHook(hooks.PecanHook):
         state.request.pipeline_manager = self.pipeline_manager
 
 
+class IngestionHook(hooks.PecanHook):
+    '''Attach the queue of the samples posted in batches, published
+    asynchronously through the pipeline, to the request.
+    '''
+
+    def __init__(self, pipeline_manager):
+        self.ingester = ingestion.Ingester(pipeline_manager)
+
+    def before(self, state):
+        state.request.ingester = self.ingester
+
+
 class TranslationHook(hooks.PecanHook):
 
     def __init__(self):
@@ -0,0 +1,213 @@
+# -*- encoding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Asynchronous publication of the samples posted in batches.
+
+The samples of a batch, of any meters, are checked against a lightweight
+schema instead of being built as WSME objects, then queued: a green
+thread of the API process publishes them through its pipeline, while the
+request is answered as soon as they are queued. The samples still queued
+when the process stops are lost, as the RPC messages being cast.
+
+The number of samples each project can post is limited by a token bucket:
+the samples are accepted up to the burst, the bucket being refilled at
+the rate limit.
+"""
+
+import time
+
+import eventlet
+from eventlet import queue
+from oslo.config import cfg
+
+from ceilometer.openstack.common import context
+from ceilometer.openstack.common.gettextutils import _
+from ceilometer.openstack.common import log
+from ceilometer.openstack.common import timeutils
+from ceilometer import sample
+from ceilometer import utils
+
+LOG = log.getLogger(__name__)
+
+OPTS = [
+    cfg.IntOpt('ingestion_batch_size',
+               default=1000,
+               help='Maximum number of samples of a batch posted'),
+    cfg.IntOpt('ingestion_queue_size',
+               default=100,
+               help='Maximum number of batches of samples waiting to be '
+               'published by an API process'),
+    cfg.FloatOpt('ingestion_rate_limit',
+                 default=0.0,
+                 help='Number of samples per second each project can post '
+                 'in batches, 0 for unlimited'),
+    cfg.IntOpt('ingestion_rate_burst',
+               default=0,
+               help='Number of samples each project can post at once, '
+               'above its rate limit; one second of the rate limit if 0'),
+]
+
+cfg.CONF.register_opts(OPTS, group='api')
+
+SAMPLE_TYPES = (sample.TYPE_GAUGE, sample.TYPE_DELTA, sample.TYPE_CUMULATIVE)
+
+# fields of the samples posted, with their types
+REQUIRED_FIELDS = (('counter_name', basestring),
+                   ('counter_type', basestring),
+                   ('counter_unit', basestring),
+                   ('counter_volume', (int, long, float)),
+                   ('resource_id', basestring))
+OPTIONAL_FIELDS = (('user_id', basestring),
+                   ('project_id', basestring),
+                   ('source', basestring),
+                   ('timestamp', basestring),
+                   ('resource_metadata', dict))
+
+
+def _check_field(document, field, types):
+    value = document[field]
+    # the booleans are integers
+    if not isinstance(value, types) or isinstance(value, bool):
+        raise ValueError(_('%s has an invalid type') % field)
+    return value
+
+
+def make_samples(documents, user_id=None, project_id=None,
+                 auth_project=None):
+    """Return the samples of the given documents, as posted.
+
+    :param documents: The list of the samples posted, as dictionaries.
+    :param user_id: The user of the samples not giving theirs.
+    :param project_id: The project of the samples not giving theirs.
+    :param auth_project: The project the samples are limited to, if any.
+    :raises ValueError: if a sample is invalid.
+    """
+    if not isinstance(documents, list):
+        raise ValueError(_('the samples must be given as a list'))
+    now = timeutils.utcnow().isoformat()
+    samples = []
+    for index, document in enumerate(documents):
+        if not isinstance(document, dict):
+            raise ValueError(_('sample %d is not an object') % index)
+        try:
+            for field, types in REQUIRED_FIELDS:
+                if document.get(field) is None:
+                    raise ValueError(_('%s is missing') % field)
+                _check_field(document, field, types)
+            for field, types in OPTIONAL_FIELDS:
+                if document.get(field) is not None:
+                    _check_field(document, field, types)
+            if document['counter_type'] not in SAMPLE_TYPES:
+                raise ValueError(_('counter_type is unknown'))
+            timestamp = document.get('timestamp')
+            if timestamp:
+                timestamp = timeutils.normalize_time(
+                    timeutils.parse_isotime(timestamp)).isoformat()
+        except ValueError as err:
+            raise ValueError(_('sample %(index)d: %(error)s') %
+                             {'index': index, 'error': err})
+        sample_project = document.get('project_id') or project_id
+        if auth_project and auth_project != sample_project:
+            raise ValueError(_('sample %d: can not post samples to other '
+                               'projects') % index)
+        samples.append(sample.Sample(
+            name=document['counter_name'],
+            type=document['counter_type'],
+            unit=document['counter_unit'],
+            volume=document['counter_volume'],
+            user_id=document.get('user_id') or user_id,
+            project_id=sample_project,
+            resource_id=document['resource_id'],
+            timestamp=timestamp or now,
+            resource_metadata=document.get('resource_metadata') or {},
+            source=document.get('source') or cfg.CONF.sample_source))
+    return samples
+
+
+class RateLimiter(object):
+    """Token buckets of the samples each project can post."""
+
+    # number of projects whose bucket is kept, the least recently used
+    # ones being dropped
+    size = 10000
+
+    def __init__(self, rate, burst=0):
+        self.rate = rate
+        self.burst = burst or rate
+        self.buckets = utils.LRUCache(self.size)
+
+    def consume(self, project, count):
+        """Take count tokens from the bucket of the project.
+
+        :returns: False if the project posted too many samples.
+        """
+        if not self.rate:
+            return True
+        now = time.time()
+        tokens, last = self.buckets.pop(project, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        allowed = tokens >= count
+        if allowed:
+            tokens -= count
+        self.buckets[project] = (tokens, now)
+        return allowed
+
+    def refund(self, project, count):
+        """Give back count tokens consumed by samples finally refused."""
+        bucket = self.buckets.get(project)
+        if bucket is not None:
+            tokens, last = bucket
+            self.buckets[project] = (min(self.burst, tokens + count), last)
+
+
+class Ingester(object):
+    """Queue of the batches of samples published by a green thread."""
+
+    def __init__(self, pipeline_manager):
+        self.pipeline_manager = pipeline_manager
+        self.queue = queue.Queue(cfg.CONF.api.ingestion_queue_size)
+        self.limiter = RateLimiter(cfg.CONF.api.ingestion_rate_limit,
+                                   cfg.CONF.api.ingestion_rate_burst)
+        self.worker = None
+
+    def put(self, samples):
+        """Queue samples to publish.
+
+        :returns: False if too many samples are queued already.
+        """
+        if self.worker is None:
+            self.worker = eventlet.spawn_n(self._publish_batches)
+        try:
+            self.queue.put_nowait(samples)
+        except queue.Full:
+            return False
+        return True
+
+    def _publish_batches(self):
+        while True:
+            samples = self.queue.get()
+            try:
+                with self.pipeline_manager.publisher(
+                        context.get_admin_context()) as publisher:
+                    publisher(samples)
+            except Exception:
+                LOG.exception(_('failed to publish %d samples posted') %
+                              len(samples))
+            finally:
+                self.queue.task_done()
+
+    def flush(self):
+        """Wait for the samples queued to be published."""
+        # join would wait forever on a queue never used with eventlet 0.13
+        if self.queue.unfinished_tasks:
+            self.queue.join()
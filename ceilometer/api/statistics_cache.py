@@ -0,0 +1,217 @@
+# -*- encoding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Cache of the statistics computed over closed time periods.
+
+The statistics of a period no longer receiving samples do not change, so
+they are cached by period start: a query only computes from storage the
+periods following the ones found in the cache, such as the trailing
+period still open. The periods are aligned on the start of the query,
+hence queries sharing period boundaries share their cached periods.
+"""
+
+import copy
+import datetime
+import hashlib
+import time
+
+from oslo.config import cfg
+from stevedore import driver
+
+from ceilometer.openstack.common import importutils
+from ceilometer.openstack.common import log
+from ceilometer.openstack.common import timeutils
+from ceilometer import utils
+
+OPTS = [
+    cfg.StrOpt('statistics_cache_backend',
+               help='Backend caching the statistics computed over closed '
+               'periods, among memory and memcached (no caching if unset)'),
+    cfg.IntOpt('statistics_cache_size',
+               default=10000,
+               help='Maximum number of periods cached by the memory backend '
+               'of each API process'),
+    cfg.ListOpt('statistics_cache_servers',
+                default=['127.0.0.1:11211'],
+                help='Servers of the memcached backend'),
+    cfg.IntOpt('statistics_cache_ttl',
+               default=86400,
+               help='Number of seconds the statistics of a period are '
+               'cached'),
+    cfg.IntOpt('statistics_cache_delay',
+               default=600,
+               help='Number of seconds after its end before a period is '
+               'considered closed and cached, allowing for the samples '
+               'recorded late'),
+]
+
+cfg.CONF.register_opts(OPTS, group='api')
+
+LOG = log.getLogger(__name__)
+
+STATISTICS_CACHE_NAMESPACE = 'ceilometer.statistics_cache'
+
+
+def get_cache(conf):
+    """Return the configured statistics cache, or None if disabled."""
+    name = conf.api.statistics_cache_backend
+    if not name:
+        return None
+    LOG.debug('looking for %r driver in %r',
+              name, STATISTICS_CACHE_NAMESPACE)
+    mgr = driver.DriverManager(STATISTICS_CACHE_NAMESPACE,
+                               name,
+                               invoke_on_load=True)
+    return StatisticsCache(mgr.driver)
+
+
+class MemoryBackend(object):
+    """Least recently used entries of the API process."""
+
+    def __init__(self):
+        self.entries = utils.LRUCache(cfg.CONF.api.statistics_cache_size)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expiry, value = entry
+        if expiry < time.time():
+            self.entries.pop(key)
+            return None
+        return value
+
+    def set(self, key, value, ttl):
+        self.entries[key] = (time.time() + ttl, value)
+
+
+class MemcachedBackend(object):
+    """Entries shared by the API processes through memcached."""
+
+    def __init__(self):
+        memcache = importutils.import_module('memcache')
+        self.client = memcache.Client(cfg.CONF.api.statistics_cache_servers)
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, value, ttl):
+        self.client.set(key, value, time=ttl)
+
+
+class StatisticsCache(object):
+    """Compute meter statistics, reusing those of the closed periods."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        # number of periods found in, and missing from, the cache
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(sample_filter, period, groupby, aggregate, *bounds):
+        key = (sample_filter.meter, sample_filter.user,
+               sample_filter.project, sample_filter.resource,
+               sample_filter.source,
+               sorted(sample_filter.metaquery.items()),
+               period, tuple(groupby or ()),
+               tuple(sorted(aggregate or ()))) + bounds
+        return 'ceilometer-statistics-%s' % hashlib.sha1(
+            repr(key)).hexdigest()
+
+    def _compute(self, conn, sample_filter, period, groupby, aggregate):
+        return list(conn.get_meter_statistics(sample_filter, period,
+                                              groupby=groupby,
+                                              aggregate=aggregate))
+
+    def get_meter_statistics(self, conn, sample_filter, period=None,
+                             groupby=None, aggregate=None):
+        """Return the statistics described by the query parameters.
+
+        :param conn: The storage connection computing the statistics of
+                     the periods missing from the cache.
+
+        The other parameters are those of the storage get_meter_statistics.
+        """
+        start = sample_filter.start
+        end = sample_filter.end
+        closed = timeutils.utcnow() - datetime.timedelta(
+            seconds=cfg.CONF.api.statistics_cache_delay)
+        if end is not None:
+            closed = min(closed, end)
+        ttl = cfg.CONF.api.statistics_cache_ttl
+
+        if start is None:
+            # the periods are aligned on the oldest sample
+            return self._compute(conn, sample_filter, period, groupby,
+                                 aggregate)
+
+        if not period:
+            # a single aggregate over a range, cached once closed
+            if end is None or end > closed:
+                return self._compute(conn, sample_filter, period, groupby,
+                                     aggregate)
+            key = self._key(sample_filter, period, groupby, aggregate,
+                            start, sample_filter.start_timestamp_op,
+                            end, sample_filter.end_timestamp_op)
+            statistics = self.backend.get(key)
+            if statistics is None:
+                self.misses += 1
+                statistics = self._compute(conn, sample_filter, period,
+                                           groupby, aggregate)
+                self.backend.set(key, statistics, ttl)
+            else:
+                self.hits += 1
+            return statistics
+
+        if sample_filter.start_timestamp_op == 'gt' or start.microsecond:
+            # the samples on the start of the periods would be left out
+            # when computing the following ones only, and some drivers
+            # align the periods on whole seconds
+            return self._compute(conn, sample_filter, period, groupby,
+                                 aggregate)
+
+        increment = datetime.timedelta(seconds=period)
+        statistics = []
+        hits = 0
+        while start + increment <= closed:
+            cached = self.backend.get(self._key(sample_filter, period,
+                                                groupby, aggregate, start))
+            if cached is None:
+                break
+            statistics.extend(cached)
+            start += increment
+            hits += 1
+        self.hits += hits
+
+        if end is not None and start >= end:
+            return statistics
+
+        remaining = copy.copy(sample_filter)
+        remaining.start = start
+        computed = self._compute(conn, remaining, period, groupby, aggregate)
+        by_period = {}
+        for s in computed:
+            by_period.setdefault(s.period_start, []).append(s)
+        misses = 0
+        while start + increment <= closed:
+            self.backend.set(self._key(sample_filter, period, groupby,
+                                       aggregate, start),
+                             by_period.get(start, []), ttl)
+            start += increment
+            misses += 1
+        self.misses += misses
+        LOG.debug('statistics of %d periods cached, %d computed '
+                  '(%d hits, %d misses)',
+                  hits, misses, self.hits, self.misses)
+        return statistics + computed
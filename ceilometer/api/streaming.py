@@ -0,0 +1,109 @@
+# -*- encoding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Streaming of JSON listings.
+
+WSME builds the whole response body from the objects returned by the
+controllers. For large listings, the controllers can instead stream the
+JSON documents of the storage models as they are read, the response body
+being written in chunks while the storage iterator is consumed. The
+listings requested in columns are streamed the same way.
+"""
+
+import itertools
+import json
+
+from oslo.config import cfg
+import pecan
+
+from ceilometer.api import compact
+
+OPTS = [
+    cfg.BoolOpt('stream_listings',
+                default=True,
+                help='Stream the listings of samples and resources, in '
+                'JSON or in columns, instead of building their whole '
+                'response body'),
+    cfg.IntOpt('stream_chunk_size',
+               default=65536,
+               help='Number of bytes of the chunks of the streamed '
+               'listings'),
+]
+
+cfg.CONF.register_opts(OPTS, group='api')
+
+# renderer of the streamed responses, whose body is the response iterator
+RENDERER = 'stream'
+
+
+class StreamRenderer(object):
+    """Leave the body of the response to its iterator."""
+
+    def __init__(self, path, extra_vars):
+        pass
+
+    def render(self, template_path, namespace):
+        return ''
+
+
+def _json_chunks(documents):
+    chunk_size = cfg.CONF.api.stream_chunk_size
+    chunk = ['[']
+    size = 0
+    separator = ''
+    for document in documents:
+        if size >= chunk_size:
+            yield ''.join(chunk)
+            chunk = []
+            size = 0
+        data = separator + json.dumps(document)
+        separator = ', '
+        chunk.append(data)
+        size += len(data)
+    chunk.append(']')
+    yield ''.join(chunk)
+
+
+# encoders of the documents, by content type of the response
+ENCODERS = {
+    'application/json': _json_chunks,
+    compact.COLUMNS: compact.columns,
+}
+
+
+def enabled():
+    """Tell whether the response to the current request can be streamed.
+    """
+    return (cfg.CONF.api.stream_listings and
+            pecan.request.pecan['content_type'] in ENCODERS)
+
+
+def stream(documents):
+    """Stream the documents as response body, in the requested format.
+
+    The first document is read right away, so that the errors raised on
+    querying the storage are reported as usual. The iterator must not
+    refer to the request, which is gone once it is consumed.
+
+    :param documents: Iterable of objects serializable in JSON.
+    """
+    content_type = pecan.request.pecan['content_type']
+    encode = ENCODERS[content_type]
+    documents = iter(documents)
+    try:
+        first = next(documents)
+    except StopIteration:
+        pecan.response.body = ''.join(encode([]))
+    else:
+        pecan.response.app_iter = encode(itertools.chain([first], documents))
+    pecan.override_template(RENDERER + ':', content_type)
@@ -48,6 +48,11 @@ def make_app(conf, enable_acl=True, attach_storage=True,
         flask.request.cfg = conf
         flask.request.sources = sources
 
+    @app.before_request
+    def attach_auth_project():
+        flask.request.auth_project = acl.get_limited_to_project(
+            flask.request.headers)
+
     if attach_storage:
         @app.before_request
         def attach_storage():
@@ -94,8 +94,6 @@ from ceilometer.openstack.common import timeutils
 
 from ceilometer import storage
 
-from ceilometer.api import acl
-
 
 LOG = log.getLogger(__name__)
 
@@ -120,7 +118,7 @@ def _get_metaquery(args):
 
 
 def check_authorized_project(project):
-    authorized_project = acl.get_limited_to_project(flask.request.headers)
+    authorized_project = flask.request.auth_project
     if authorized_project and authorized_project != project:
         flask.abort(404)
 
@@ -136,7 +134,7 @@ def list_meters_all():
     """
     rq = flask.request
     meters = rq.storage_conn.get_meters(
-        project=acl.get_limited_to_project(rq.headers),
+        project=rq.auth_project,
         metaquery=_get_metaquery(rq.args))
     return flask.jsonify(meters=[m.as_dict() for m in meters])
 
@@ -152,7 +150,7 @@ def list_meters_by_resource(resource):
     rq = flask.request
     meters = rq.storage_conn.get_meters(
         resource=resource,
-        project=acl.get_limited_to_project(rq.headers),
+        project=rq.auth_project,
         metaquery=_get_metaquery(rq.args))
     return flask.jsonify(meters=[m.as_dict() for m in meters])
 
@@ -168,7 +166,7 @@ def list_meters_by_user(user):
     rq = flask.request
     meters = rq.storage_conn.get_meters(
         user=user,
-        project=acl.get_limited_to_project(rq.headers),
+        project=rq.auth_project,
         metaquery=_get_metaquery(rq.args))
     return flask.jsonify(meters=[m.as_dict() for m in meters])
 
@@ -201,7 +199,7 @@ def list_meters_by_source(source):
     rq = flask.request
     meters = rq.storage_conn.get_meters(
         source=source,
-        project=acl.get_limited_to_project(rq.headers),
+        project=rq.auth_project,
         metaquery=_get_metaquery(rq.args))
     return flask.jsonify(meters=[m.as_dict() for m in meters])
 
@@ -256,7 +254,7 @@ def list_all_resources():
                            (optional)
     """
     return _list_resources(
-        project=acl.get_limited_to_project(flask.request.headers))
+        project=flask.request.auth_project)
 
 
 @blueprint.route('/sources/<source>')
@@ -285,7 +283,7 @@ def list_resources_by_source(source):
     """
     return _list_resources(
         source=source,
-        project=acl.get_limited_to_project(flask.request.headers),
+        project=flask.request.auth_project,
     )
 
 
@@ -305,10 +303,24 @@ def list_resources_by_user(user):
     """
     return _list_resources(
         user=user,
-        project=acl.get_limited_to_project(flask.request.headers),
+        project=flask.request.auth_project,
     )
 
 
+def _get_page(args):
+    """Return the limit and marker of a page of a listing.
+
+    :param args: The query arguments, the optional limit and marker.
+    """
+    try:
+        limit = int(args.get('limit', 0)) or None
+    except ValueError:
+        limit = -1
+    if limit is not None and limit < 0:
+        flask.abort(400)
+    return limit, args.get('marker')
+
+
 ## APIs for working with users.
 
 
@@ -318,16 +330,22 @@ def _list_users(source=None):
     # TODO(jd) it might be better to return the real list of users that are
     # belonging to the project, but that's not provided by the storage
     # drivers for now
-    if acl.get_limited_to_project(flask.request.headers):
+    if flask.request.auth_project:
         users = [flask.request.headers.get('X-User-id')]
     else:
-        users = flask.request.storage_conn.get_users(source=source)
+        limit, marker = _get_page(flask.request.args)
+        users = flask.request.storage_conn.get_users(source=source,
+                                                     limit=limit,
+                                                     marker=marker)
     return flask.jsonify(users=list(users))
 
 
 @blueprint.route('/users')
 def list_all_users():
     """Return a list of all known user names.
+
+    :param limit: The maximum number of user names to return. (optional)
+    :param marker: The user name the names returned follow. (optional)
     """
     return _list_users()
 
@@ -348,24 +366,30 @@ def list_users_by_source(source):
 def _list_projects(source=None):
     """Return a list of project names.
     """
-    project = acl.get_limited_to_project(flask.request.headers)
+    project = flask.request.auth_project
     if project:
         if source:
-            if project in flask.request.storage_conn.get_projects(
-                    source=source):
+            if flask.request.storage_conn.has_project(project,
+                                                      source=source):
                 projects = [project]
             else:
                 projects = []
         else:
             projects = [project]
     else:
-        projects = flask.request.storage_conn.get_projects(source=source)
+        limit, marker = _get_page(flask.request.args)
+        projects = flask.request.storage_conn.get_projects(source=source,
+                                                           limit=limit,
+                                                           marker=marker)
     return flask.jsonify(projects=list(projects))
 
 
 @blueprint.route('/projects')
 def list_all_projects():
     """Return a list of all known project names.
+
+    :param limit: The maximum number of project names to return. (optional)
+    :param marker: The project name the names returned follow. (optional)
     """
     return _list_projects()
 
@@ -454,7 +478,7 @@ def list_samples_by_resource(resource, meter):
     return _list_samples(
         resource=resource,
         meter=meter,
-        project=acl.get_limited_to_project(flask.request.headers),
+        project=flask.request.auth_project,
     )
 
 
@@ -474,7 +498,7 @@ def list_samples_by_source(source, meter):
     return _list_samples(
         source=source,
         meter=meter,
-        project=acl.get_limited_to_project(flask.request.headers),
+        project=flask.request.auth_project,
     )
 
 
@@ -494,7 +518,7 @@ def list_samples_by_user(user, meter):
     return _list_samples(
         user=user,
         meter=meter,
-        project=acl.get_limited_to_project(flask.request.headers),
+        project=flask.request.auth_project,
     )
 
 
@@ -555,7 +579,7 @@ def compute_duration_by_resource(resource, meter):
     # within the desired range.
     f = storage.SampleFilter(
         meter=meter,
-        project=acl.get_limited_to_project(flask.request.headers),
+        project=flask.request.auth_project,
         resource=resource,
         start=q_ts['query_start'],
         end=q_ts['query_end'],
@@ -607,7 +631,8 @@ def _get_statistics(stats_type, meter=None, resource=None, project=None):
     )
     # TODO(sberler): do we want to return an error if the resource
     # does not exist?
-    results = list(flask.request.storage_conn.get_meter_statistics(f))
+    results = list(flask.request.storage_conn.get_meter_statistics(
+        f, aggregate=[stats_type]))
     value = None
     if results:
         value = getattr(results[0], stats_type)  # there should only be one!
@@ -632,7 +657,7 @@ def compute_max_resource_volume(resource, meter):
         'max',
         meter=meter,
         resource=resource,
-        project=acl.get_limited_to_project(flask.request.headers),
+        project=flask.request.auth_project,
     )
 
 
@@ -653,7 +678,7 @@ def compute_resource_volume_sum(resource, meter):
         'sum',
         meter=meter,
         resource=resource,
-        project=acl.get_limited_to_project(flask.request.headers),
+        project=flask.request.auth_project,
     )
 
 
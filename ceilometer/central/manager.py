@@ -16,40 +16,102 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-from keystoneclient.v2_0 import client as ksclient
+import eventlet
 from oslo.config import cfg
 from stevedore import extension
 
 from ceilometer import agent
+from ceilometer.central import partition
+from ceilometer import keystone_client
+from ceilometer.openstack.common.gettextutils import _
 from ceilometer.openstack.common import log
 from ceilometer.openstack.common import service as os_service
 from ceilometer.openstack.common.rpc import service as rpc_service
 from ceilometer import service
 
-cfg.CONF.import_group('service_credentials', 'ceilometer.service')
+OPTS = [
+    cfg.IntOpt('polling_workers',
+               default=8,
+               help='Number of groups of pollsters not sharing any cached '
+               'data that the central agent polls concurrently'),
+    cfg.IntOpt('pollster_timeout',
+               default=0,
+               help='Number of seconds after which a central pollster is '
+               'interrupted (0 means no limit)'),
+]
+
+cfg.CONF.register_opts(OPTS, group='central')
 
 LOG = log.getLogger(__name__)
 
 
 class PollingTask(agent.PollingTask):
+
+    @staticmethod
+    def _group_key(pollster):
+        # pollsters sharing cached data have to run one after the other,
+        # so that the first one fills the cache for the others
+        return getattr(pollster.obj, 'CACHE_KEY', pollster.name)
+
+    def _poll_group(self, pollsters, cache, results):
+        timeout = cfg.CONF.central.pollster_timeout or None
+        try:
+            for pollster in pollsters:
+                try:
+                    LOG.info("Polling pollster %s", pollster.name)
+                    with eventlet.Timeout(timeout):
+                        samples = list(pollster.obj.get_samples(
+                            self.manager,
+                            cache,
+                        ))
+                    results.put((pollster, samples))
+                except (Exception, eventlet.Timeout) as err:
+                    LOG.warning('Continue after error from %s: %s',
+                                pollster.name, err)
+                    LOG.exception(err)
+        finally:
+            results.put(None)
+
     def poll_and_publish(self):
         """Tasks to be run at a periodic interval."""
+        groups = {}
+        for pollster in sorted(self.pollsters, key=lambda p: p.name):
+            groups.setdefault(self._group_key(pollster), []).append(pollster)
+
         with self.publish_context as publisher:
             # TODO(yjiang5) passing samples into get_samples to avoid
             # polling all counters one by one
             cache = {}
-            for pollster in self.pollsters:
-                try:
-                    LOG.info("Polling pollster %s", pollster.name)
-                    samples = list(pollster.obj.get_samples(
-                        self.manager,
-                        cache,
-                    ))
-                    publisher(samples)
-                except Exception as err:
-                    LOG.warning('Continue after error from %s: %s',
-                                pollster.name, err)
-                    LOG.exception(err)
+            results = eventlet.queue.LightQueue()
+            pool = eventlet.GreenPool(cfg.CONF.central.polling_workers)
+            threads = [pool.spawn(self._poll_group, pollsters, cache, results)
+                       for pollsters in groups.itervalues()]
+            try:
+                # publish the samples of each pollster as soon as available
+                remaining = len(threads)
+                while remaining:
+                    result = results.get()
+                    if result is None:
+                        remaining -= 1
+                        continue
+                    pollster, samples = result
+                    try:
+                        coordinator = self.manager.partition_coordinator
+                        # the samples of the pollsters not skipping the
+                        # resources of the other agents are filtered, once
+                        # polled
+                        if coordinator and not getattr(pollster.obj,
+                                                       'PARTITIONED', False):
+                            samples = coordinator.extract_my_subset(
+                                samples, key=lambda s: s.resource_id)
+                        publisher(samples)
+                    except Exception as err:
+                        LOG.warning('Continue after error from %s: %s',
+                                    pollster.name, err)
+                        LOG.exception(err)
+            finally:
+                for thread in threads:
+                    thread.kill()
 
 
 class AgentManager(agent.AgentManager):
@@ -61,24 +123,40 @@ class AgentManager(agent.AgentManager):
                 invoke_on_load=True,
             )
         )
+        self.partition_coordinator = partition.get_coordinator(cfg.CONF)
+        # authenticated lazily, and only again when the token expires
+        self.keystone = keystone_client.get_client()
 
     def create_polling_task(self):
         return PollingTask(self)
 
-    def interval_task(self, task):
-        self.keystone = ksclient.Client(
-            username=cfg.CONF.service_credentials.os_username,
-            password=cfg.CONF.service_credentials.os_password,
-            tenant_id=cfg.CONF.service_credentials.os_tenant_id,
-            tenant_name=cfg.CONF.service_credentials.os_tenant_name,
-            cacert=cfg.CONF.service_credentials.os_cacert,
-            auth_url=cfg.CONF.service_credentials.os_auth_url)
+    def initialize_service_hook(self, service):
+        super(AgentManager, self).initialize_service_hook(service)
+        if self.partition_coordinator:
+            self.service.tg.add_timer(
+                cfg.CONF.central.partitioning_heartbeat,
+                self.partition_coordinator.heartbeat)
+
+
+class CentralAgentService(rpc_service.Service):
+    """Central agent leaving its partitioning group when stopped.
+
+    The resources assigned to a stopped agent are rebalanced right away
+    instead of going unpolled until its heartbeat times out.
+    """
 
-        super(AgentManager, self).interval_task(task)
+    def stop(self):
+        coordinator = self.manager.partition_coordinator
+        if coordinator:
+            try:
+                coordinator.leave()
+            except Exception:
+                LOG.exception(_('Unable to leave the partitioning group'))
+        super(CentralAgentService, self).stop()
 
 
 def agent_central():
     service.prepare_service()
-    os_service.launch(rpc_service.Service(cfg.CONF.host,
+    os_service.launch(CentralAgentService(cfg.CONF.host,
                                           'ceilometer.agent.central',
                                           AgentManager())).wait()
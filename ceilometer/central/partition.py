@@ -0,0 +1,198 @@
+# -*- encoding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Workload partitioning between several central agents.
+
+Every central agent registers itself in a group membership backend and
+polls only the resources that the consistent hash ring built from the
+current members assigns to it.
+"""
+
+import abc
+import errno
+import os
+import time
+import urlparse
+
+from oslo.config import cfg
+from stevedore import driver
+
+from ceilometer.openstack.common.gettextutils import _
+from ceilometer.openstack.common import log
+from ceilometer import utils
+
+LOG = log.getLogger(__name__)
+
+PARTITION_NAMESPACE = 'ceilometer.central.partition'
+
+OPTS = [
+    cfg.StrOpt('partitioning_url',
+               default=None,
+               help='URL of the group membership backend used to split '
+               'the polled resources between several central agents, '
+               'for example file:///var/lib/ceilometer/central (if unset '
+               'every agent polls every resource)'),
+    cfg.IntOpt('partitioning_heartbeat',
+               default=10,
+               help='Number of seconds between two heartbeats of a central '
+               'agent to the group membership backend'),
+    cfg.IntOpt('partitioning_member_timeout',
+               default=30,
+               help='Number of seconds without heartbeat after which a '
+               'central agent is considered gone'),
+]
+
+cfg.CONF.register_opts(OPTS, group='central')
+cfg.CONF.import_opt('host', 'ceilometer.service')
+
+
+class MembershipBase(object):
+    """Base class for group membership backends."""
+
+    __metaclass__ = abc.ABCMeta
+
+    def __init__(self, url):
+        self.url = url
+
+    @abc.abstractmethod
+    def heartbeat(self, member_id):
+        """Record that member_id is alive."""
+
+    @abc.abstractmethod
+    def get_members(self, timeout):
+        """Return the ids of the members seen in the last timeout seconds.
+        """
+
+    @abc.abstractmethod
+    def leave(self, member_id):
+        """Remove member_id from the group."""
+
+
+class FileMembership(MembershipBase):
+    """Group membership kept as one file per member in a directory.
+
+    The modification time of each file is the last heartbeat of the
+    member, so the directory can be shared between hosts (e.g. over NFS)
+    or used locally for testing.
+    """
+
+    def __init__(self, url):
+        super(FileMembership, self).__init__(url)
+        self.path = urlparse.urlparse(url).path
+        try:
+            os.makedirs(self.path)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    def heartbeat(self, member_id):
+        with open(os.path.join(self.path, member_id), 'a'):
+            os.utime(os.path.join(self.path, member_id), None)
+
+    def get_members(self, timeout):
+        deadline = time.time() - timeout
+        members = []
+        for member_id in os.listdir(self.path):
+            try:
+                mtime = os.stat(os.path.join(self.path, member_id)).st_mtime
+            except OSError:
+                # member left while listing
+                continue
+            if mtime >= deadline:
+                members.append(member_id)
+        return members
+
+    def leave(self, member_id):
+        try:
+            os.unlink(os.path.join(self.path, member_id))
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+
+
+class PartitionCoordinator(object):
+    """Tell which resources belong to this agent.
+
+    The hash ring is rebuilt, and the resources rebalanced, whenever the
+    set of live members seen on a heartbeat changes.
+    """
+
+    def __init__(self, backend, member_id, timeout):
+        self.backend = backend
+        self.member_id = member_id
+        self.timeout = timeout
+        self.members = [member_id]
+        self.ring = utils.HashRing(self.members)
+
+    def heartbeat(self):
+        try:
+            self.backend.heartbeat(self.member_id)
+            members = sorted(set(self.backend.get_members(self.timeout)) |
+                             set([self.member_id]))
+        except Exception:
+            LOG.exception(_('Unable to refresh partitioning membership'))
+            return
+        if members != self.members:
+            LOG.info(_('Partitioning members changed from %(old)s to '
+                       '%(new)s, rebalancing') %
+                     {'old': self.members, 'new': members})
+            self.members = members
+            self.ring = utils.HashRing(members)
+
+    def leave(self):
+        self.backend.leave(self.member_id)
+
+    def belongs(self, resource_id):
+        return self.ring.get_node(resource_id) == self.member_id
+
+    def extract_my_subset(self, resources, key=lambda r: r):
+        """Return the resources assigned to this agent.
+
+        :param resources: Iterable of resources.
+        :param key: Function returning the id of a resource.
+        """
+        return [r for r in resources if self.belongs(key(r))]
+
+
+def get_coordinator(conf):
+    """Return a PartitionCoordinator, or None if partitioning is disabled.
+    """
+    url = conf.central.partitioning_url
+    if not url:
+        return None
+    backend_name = urlparse.urlparse(url).scheme
+    LOG.debug('looking for %r driver in %r', backend_name, PARTITION_NAMESPACE)
+    mgr = driver.DriverManager(PARTITION_NAMESPACE,
+                               backend_name,
+                               invoke_on_load=True,
+                               invoke_args=(url,))
+    return PartitionCoordinator(mgr.driver,
+                                '%s.%d' % (conf.host, os.getpid()),
+                                conf.central.partitioning_member_timeout)
+
+
+def iter_my_resources(manager, resources, key=lambda r: r):
+    """Iterate over the resources the central agent of manager polls.
+
+    The pollsters filter the resources they list through it before doing
+    any work on them, declaring so with their PARTITIONED attribute;
+    every resource is polled when the agent is not partitioned.
+
+    :param manager: The manager of the agent polling.
+    :param resources: Iterable of resources.
+    :param key: Function returning the id of a resource.
+    """
+    coordinator = getattr(manager, 'partition_coordinator', None)
+    for resource in resources:
+        if coordinator is None or coordinator.belongs(key(resource)):
+            yield resource
@@ -0,0 +1,24 @@
+# -*- encoding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Entry points of the services needing eventlet before any other import.
+
+The standard library is patched by eventlet as soon as this package is
+imported, so that the libraries keeping thread local state from their
+import, such as the request state of pecan, get one local to each green
+thread.
+"""
+
+import eventlet
+
+eventlet.monkey_patch()
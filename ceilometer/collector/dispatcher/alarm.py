@@ -0,0 +1,99 @@
+# -*- encoding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import time
+
+from oslo.config import cfg
+
+from ceilometer.alarm import cache
+from ceilometer.alarm import rpc as rpc_alarm
+from ceilometer.alarm import streaming_evaluation
+from ceilometer.collector import dispatcher
+from ceilometer.openstack.common.gettextutils import _
+from ceilometer.openstack.common import log
+from ceilometer.publisher import rpc as publisher_rpc
+
+LOG = log.getLogger(__name__)
+
+alarm_dispatcher_opts = [
+    cfg.IntOpt('refresh_interval',
+               default=60,
+               help='Number of seconds between two reloads of the alarms '
+                    'evaluated on the ingested samples'),
+]
+
+cfg.CONF.register_opts(alarm_dispatcher_opts, group="dispatcher_alarm")
+
+
+class AlarmDispatcher(dispatcher.Base):
+    '''Dispatcher class evaluating the threshold alarms on the samples.
+
+    The alarms on the meter of each sample received are evaluated as soon
+    as the sample arrives, over windows of aggregates maintained in memory,
+    and their state transitions are notified right away instead of on the
+    next cycle of the alarm evaluation service. The alarms updated in the
+    database are reloaded every refresh_interval seconds.
+
+    The windows only account for the samples received by this collector:
+    with several collectors sharing the metering queue, each one sees part
+    of the samples of an alarm, so this is best suited to a single collector
+    or to the min and max statistics.
+
+    To enable this dispatcher, the following section needs to be present in
+    ceilometer.conf file
+
+    [collector]
+    dispatcher = database
+    dispatcher = alarm
+    '''
+    def __init__(self, conf):
+        super(AlarmDispatcher, self).__init__(conf)
+        self.evaluator = streaming_evaluation.Evaluator(
+            rpc_alarm.RPCAlarmNotifier())
+        self.cache = cache.AlarmCache(self.evaluator.list_alarms)
+        self.refreshed_at = None
+
+    def _refresh_alarms(self):
+        now = time.time()
+        if (self.refreshed_at is not None and
+                now - self.refreshed_at <
+                self.conf.dispatcher_alarm.refresh_interval):
+            return
+        # do not retry on each sample if the database is unavailable
+        self.refreshed_at = now
+        try:
+            self.cache.refresh()
+            self.evaluator.assign_alarms(self.cache.alarms())
+        except Exception:
+            LOG.exception(_('Unable to load the alarms'))
+
+    def record_metering_data(self, context, data):
+        # We may have receive only one counter on the wire
+        if not isinstance(data, list):
+            data = [data]
+
+        self._refresh_alarms()
+        for meter in data:
+            if publisher_rpc.verify_signature(
+                    meter,
+                    self.conf.publisher_rpc.metering_secret):
+                self.evaluator.record_sample(meter)
+            else:
+                LOG.warning(
+                    'message signature invalid, discarding message: %r',
+                    meter)
+        try:
+            self.evaluator.notifier.flush()
+        except Exception:
+            LOG.exception(_('Unable to send the alarm notifications'))
@@ -59,9 +59,12 @@ class DatabaseDispatcher(dispatcher.Base):
                     # Convert the timestamp to a datetime instance.
                     # Storage engines are responsible for converting
                     # that value to something they can store.
+                    # The message is copied, so that the other
+                    # dispatchers can still verify its signature.
                     if meter.get('timestamp'):
                         ts = timeutils.parse_isotime(meter['timestamp'])
-                        meter['timestamp'] = timeutils.normalize_time(ts)
+                        meter = dict(meter,
+                                     timestamp=timeutils.normalize_time(ts))
                     self.storage_conn.record_metering_data(meter)
                 except Exception as err:
                     LOG.error('Failed to record metering data: %s', err)
@@ -20,6 +20,7 @@ from oslo.config import cfg
 from keystoneclient import exceptions
 import requests
 
+from ceilometer.central import partition
 from ceilometer.central import plugin
 from ceilometer import sample
 from ceilometer.openstack.common.gettextutils import _
@@ -63,6 +64,8 @@ class _Base(plugin.CentralPollster):
         return KwapiClient(endpoint, ksclient.auth_token)
 
     CACHE_KEY_PROBE = 'kwapi.probes'
+    CACHE_KEY = CACHE_KEY_PROBE
+    PARTITIONED = True
 
     def _iter_probes(self, ksclient, cache):
         """Iterate over all probes."""
@@ -70,6 +73,12 @@ class _Base(plugin.CentralPollster):
             cache[self.CACHE_KEY_PROBE] = self._get_probes(ksclient)
         return iter(cache[self.CACHE_KEY_PROBE])
 
+    def _iter_my_probes(self, manager, cache):
+        """Iterate over the probes the agent polls."""
+        return partition.iter_my_resources(
+            manager, self._iter_probes(manager.keystone, cache),
+            key=lambda probe: probe['id'])
+
     def _get_probes(self, ksclient):
         try:
             client = self.get_kwapi_client(ksclient)
@@ -84,7 +93,7 @@ class EnergyPollster(_Base):
 
     def get_samples(self, manager, cache):
         """Returns all counters."""
-        for probe in self._iter_probes(manager.keystone, cache):
+        for probe in self._iter_my_probes(manager, cache):
             yield sample.Sample(
                 name='energy',
                 type=sample.TYPE_CUMULATIVE,
@@ -104,7 +113,7 @@ class PowerPollster(_Base):
 
     def get_samples(self, manager, cache):
         """Returns all counters."""
-        for probe in self._iter_probes(manager.keystone, cache):
+        for probe in self._iter_my_probes(manager, cache):
             yield sample.Sample(
                 name='power',
                 type=sample.TYPE_GAUGE,
@@ -20,17 +20,53 @@
 
 from __future__ import absolute_import
 
-import itertools
 import glanceclient
 from oslo.config import cfg
 
+from ceilometer.central import partition
 from ceilometer import sample
 from ceilometer.openstack.common import timeutils
 from ceilometer import plugin
 
 
+OPTS = [
+    cfg.IntOpt('glance_page_size',
+               default=0,
+               help="Number of images to retrieve per request to the "
+               "Glance API (0 means the Glance client default)."),
+    cfg.IntOpt('glance_full_listing_interval',
+               default=3600,
+               help="Number of seconds between two full listings of the "
+               "Glance images; in between, only the images changed since "
+               "the previous listing are retrieved (0 disables change "
+               "tracking)."),
+]
+
+cfg.CONF.register_opts(OPTS)
+
+
+class _ImageCatalog(object):
+    """Images known from the previous listings, with their metadata."""
+
+    def __init__(self):
+        # image id -> image, and image id -> (updated_at, metadata) for
+        # the metadata extracted from them
+        self.images = {}
+        self.metadata = {}
+        # time of the previous listing, and of the previous full listing
+        self.changes_since = None
+        self.full_listing_at = None
+
+
 class _Base(plugin.PollsterBase):
 
+    CACHE_KEY = 'images'
+    PARTITIONED = True
+
+    def __init__(self):
+        super(_Base, self).__init__()
+        self._catalog = _ImageCatalog()
+
     @staticmethod
     def get_glance_client(ksclient):
         endpoint = ksclient.service_catalog.url_for(
@@ -41,16 +77,12 @@ class _Base(plugin.PollsterBase):
         return glanceclient.Client('1', endpoint,
                                    token=ksclient.auth_token)
 
-    def _get_images(self, ksclient):
-        client = self.get_glance_client(ksclient)
-        #TODO(eglynn): use pagination to protect against unbounded
-        #              memory usage
-        rawImageList = list(itertools.chain(
-            client.images.list(filters={"is_public": True}),
-            #TODO(eglynn): extend glance API with all_tenants logic to
-            #              avoid second call to retrieve private images
-            client.images.list(filters={"is_public": False})))
-
+    @staticmethod
+    def _list_images(client, filters):
+        """Iterate over the unique images, fetching them page by page."""
+        kwargs = {}
+        if cfg.CONF.glance_page_size > 0:
+            kwargs['page_size'] = cfg.CONF.glance_page_size
         # When retrieving images from glance, glance will check
         # whether the user is of 'admin_role' which is
         # configured in glance-api.conf. If the user is of
@@ -63,18 +95,76 @@ class _Base(plugin.PollsterBase):
         # the _Base.iter_images method will return a image list
         # which contains duplicate images. Add the following
         # code to avoid recording down duplicate image events.
-        imageIdSet = set(image.id for image in rawImageList)
-
-        for image in rawImageList:
-            if image.id in imageIdSet:
-                imageIdSet -= set([image.id])
-                yield image
+        seen = set()
+        #TODO(eglynn): extend glance API with all_tenants logic to
+        #              avoid second call to retrieve private images
+        for is_public in (True, False):
+            for image in client.images.list(
+                    filters=dict(filters, is_public=is_public), **kwargs):
+                if image.id not in seen:
+                    seen.add(image.id)
+                    yield image
 
     def _iter_images(self, ksclient, cache):
-        """Iterate over all images."""
-        if 'images' not in cache:
-            cache['images'] = list(self._get_images(ksclient))
-        return iter(cache['images'])
+        """Iterate over all images, listed once per polling cycle."""
+        if self.CACHE_KEY in cache:
+            # listed already by another image pollster of the cycle
+            return cache[self.CACHE_KEY].images.itervalues()
+        cache[self.CACHE_KEY] = self._catalog
+        return self._update_catalog(ksclient)
+
+    def _update_catalog(self, ksclient):
+        """Update the images of the catalog from Glance and iterate over
+        them, page by page for a full listing.
+        """
+        client = self.get_glance_client(ksclient)
+        catalog = self._catalog
+        now = timeutils.utcnow()
+        interval = cfg.CONF.glance_full_listing_interval
+
+        if (interval <= 0 or catalog.full_listing_at is None or
+                timeutils.is_older_than(catalog.full_listing_at, interval)):
+            images = {}
+            for image in self._list_images(client, {}):
+                if not (image.deleted or image.status == 'deleted'):
+                    images[image.id] = image
+                    yield image
+            catalog.images = images
+            catalog.full_listing_at = now
+        else:
+            # the unchanged images are known only once the changes applied
+            for image in self._list_images(
+                    client,
+                    {'changes-since': timeutils.isotime(
+                        catalog.changes_since)}):
+                if image.deleted or image.status == 'deleted':
+                    catalog.images.pop(image.id, None)
+                else:
+                    catalog.images[image.id] = image
+            for image in catalog.images.itervalues():
+                yield image
+        catalog.changes_since = now
+
+        for image_id in set(catalog.metadata) - set(catalog.images):
+            del catalog.metadata[image_id]
+
+    def _iter_my_images(self, manager, cache):
+        """Iterate over the images the agent polls."""
+        # all the images are listed and kept in the catalog, the unchanged
+        # ones being assigned to another agent when the members change
+        return partition.iter_my_resources(
+            manager, self._iter_images(manager.keystone, cache),
+            key=lambda image: image.id)
+
+    def _image_metadata(self, image, cache):
+        """Return the metadata of image, reusing it if unchanged."""
+        catalog = cache.get(self.CACHE_KEY, self._catalog)
+        cached = catalog.metadata.get(image.id)
+        if cached and cached[0] == image.updated_at:
+            return cached[1]
+        metadata = self.extract_image_metadata(image)
+        catalog.metadata[image.id] = (image.updated_at, metadata)
+        return metadata
 
     @staticmethod
     def extract_image_metadata(image):
@@ -102,7 +192,7 @@ class _Base(plugin.PollsterBase):
 class ImagePollster(_Base):
 
     def get_samples(self, manager, cache):
-        for image in self._iter_images(manager.keystone, cache):
+        for image in self._iter_my_images(manager, cache):
             yield sample.Sample(
                 name='image',
                 type=sample.TYPE_GAUGE,
@@ -112,14 +202,14 @@ class ImagePollster(_Base):
                 project_id=image.owner,
                 resource_id=image.id,
                 timestamp=timeutils.isotime(),
-                resource_metadata=self.extract_image_metadata(image),
+                resource_metadata=self._image_metadata(image, cache),
             )
 
 
 class ImageSizePollster(_Base):
 
     def get_samples(self, manager, cache):
-        for image in self._iter_images(manager.keystone, cache):
+        for image in self._iter_my_images(manager, cache):
             yield sample.Sample(
                 name='image.size',
                 type=sample.TYPE_GAUGE,
@@ -129,5 +219,5 @@ class ImageSizePollster(_Base):
                 project_id=image.owner,
                 resource_id=image.id,
                 timestamp=timeutils.isotime(),
-                resource_metadata=self.extract_image_metadata(image),
+                resource_metadata=self._image_metadata(image, cache),
             )
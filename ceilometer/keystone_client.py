@@ -0,0 +1,134 @@
+# -*- encoding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Keystone client shared by the components of a ceilometer process.
+"""
+
+import threading
+import time
+
+from keystoneclient.v2_0 import client as ksclient
+from oslo.config import cfg
+
+from ceilometer.openstack.common.gettextutils import _
+from ceilometer.openstack.common import log
+
+OPTS = [
+    cfg.IntOpt('token_stale_duration',
+               default=300,
+               help='Number of seconds before its expiry at which the '
+               'cached Keystone token is renewed'),
+]
+
+cfg.CONF.register_opts(OPTS, group='service_credentials')
+cfg.CONF.import_group('service_credentials', 'ceilometer.service')
+
+LOG = log.getLogger(__name__)
+
+
+class Client(object):
+    """Authenticated Keystone client renewing its token near expiry.
+
+    This can be used wherever a keystoneclient Client authenticated with
+    the service credentials is expected: authentication only happens on
+    first use and when the token is about to expire, and the service
+    catalog lookups are remembered until then. It is safe to share between
+    threads.
+
+    The auth_count, auth_failures, auth_latency (of the last
+    authentication) and auth_latency_total attributes can be used to
+    monitor the authentications made.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._client = None
+        self._endpoints = {}
+        self.auth_count = 0
+        self.auth_failures = 0
+        self.auth_latency = None
+        self.auth_latency_total = 0.0
+
+    def _authenticate(self):
+        conf = cfg.CONF.service_credentials
+        start = time.time()
+        try:
+            client = ksclient.Client(username=conf.os_username,
+                                     password=conf.os_password,
+                                     tenant_id=conf.os_tenant_id,
+                                     tenant_name=conf.os_tenant_name,
+                                     cacert=conf.os_cacert,
+                                     auth_url=conf.os_auth_url)
+        except Exception:
+            self.auth_failures += 1
+            raise
+        self.auth_latency = time.time() - start
+        self.auth_latency_total += self.auth_latency
+        self.auth_count += 1
+        LOG.info(_('Authenticated to Keystone in %.3fs'), self.auth_latency)
+        return client
+
+    def _needs_authentication(self):
+        if self._client is None:
+            return True
+        auth_ref = getattr(self._client, 'auth_ref', None)
+        if auth_ref is None:
+            # the expiry of the token cannot be told
+            return True
+        return auth_ref.will_expire_soon(
+            cfg.CONF.service_credentials.token_stale_duration)
+
+    @property
+    def client(self):
+        """The underlying keystoneclient Client, authenticated if needed."""
+        with self._lock:
+            if self._needs_authentication():
+                self._client = self._authenticate()
+                self._endpoints = {}
+            return self._client
+
+    def url_for(self, **kwargs):
+        """Look up an endpoint in the service catalog."""
+        key = tuple(sorted(kwargs.items()))
+        with self._lock:
+            client = self.client
+            if key not in self._endpoints:
+                self._endpoints[key] = client.service_catalog.url_for(
+                    **kwargs)
+            return self._endpoints[key]
+
+    @property
+    def service_catalog(self):
+        # only url_for is used from the catalog, so it is served by
+        # the memoized lookup
+        return self
+
+    @property
+    def auth_token(self):
+        return self.client.auth_token
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the Keystone client shared by the whole process."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = Client()
+        return _client
@@ -22,6 +22,7 @@
 from ceilometer.openstack.common import log
 from ceilometer.openstack.common import timeutils
 
+from ceilometer.central import partition
 from ceilometer.central import plugin
 from ceilometer import sample
 from ceilometer import nova_client
@@ -31,17 +32,22 @@ class FloatingIPPollster(plugin.CentralPollster):
 
     LOG = log.getLogger(__name__ + '.floatingip')
 
+    CACHE_KEY = 'floating_ips'
+    PARTITIONED = True
+
     def _get_floating_ips(self):
         nv = nova_client.Client()
         return nv.floating_ip_get_all()
 
     def _iter_floating_ips(self, cache):
-        if 'floating_ips' not in cache:
-            cache['floating_ips'] = list(self._get_floating_ips())
-        return iter(cache['floating_ips'])
+        if self.CACHE_KEY not in cache:
+            cache[self.CACHE_KEY] = list(self._get_floating_ips())
+        return iter(cache[self.CACHE_KEY])
 
     def get_samples(self, manager, cache):
-        for ip in self._iter_floating_ips(cache):
+        for ip in partition.iter_my_resources(
+                manager, self._iter_floating_ips(cache),
+                key=lambda ip: ip.id):
             self.LOG.info("FLOATING IP USAGE: %s" % ip.ip)
             # FIXME (flwang) Now Nova API /os-floating-ips can't provide those
             # attributes were used by Ceilometer, such as project id, host.
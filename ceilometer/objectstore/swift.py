@@ -20,6 +20,7 @@
 
 from __future__ import absolute_import
 
+import eventlet
 from oslo.config import cfg
 from swiftclient import client as swift
 from keystoneclient import exceptions
@@ -31,6 +32,7 @@ from ceilometer.openstack.common import timeutils
 from ceilometer import plugin
 
 from urlparse import urljoin
+from urlparse import urlparse
 
 
 LOG = log.getLogger(__name__)
@@ -40,6 +42,13 @@ OPTS = [
                default='AUTH_',
                help="Swift reseller prefix. Must be on par with "
                "reseller_prefix in proxy-server.conf."),
+    cfg.IntOpt('swift_head_workers',
+               default=8,
+               help="Number of Swift account HEAD requests issued "
+               "concurrently by the central agent."),
+    cfg.IntOpt('swift_head_timeout',
+               default=30,
+               help="Timeout in seconds of a Swift account HEAD request."),
 ]
 
 cfg.CONF.register_opts(OPTS)
@@ -49,10 +58,19 @@ class _Base(plugin.PollsterBase):
 
     CACHE_KEY_TENANT = 'tenants'
     CACHE_KEY_HEAD = 'swift.head_account'
+    # the central agent runs the pollsters sharing a cache key in sequence
+    CACHE_KEY = CACHE_KEY_TENANT
+    # only the accounts of the tenants assigned to the agent are polled
+    PARTITIONED = True
 
-    def _iter_accounts(self, ksclient, cache):
+    def _iter_accounts(self, ksclient, cache, partition_coordinator=None):
         if self.CACHE_KEY_TENANT not in cache:
-            cache[self.CACHE_KEY_TENANT] = ksclient.tenants.list()
+            tenants = ksclient.tenants.list()
+            # only HEAD the accounts this agent is in charge of
+            if partition_coordinator:
+                tenants = partition_coordinator.extract_my_subset(
+                    tenants, key=lambda t: t.id)
+            cache[self.CACHE_KEY_TENANT] = tenants
         if self.CACHE_KEY_HEAD not in cache:
             cache[self.CACHE_KEY_HEAD] = list(self._get_account_info(ksclient,
                                                                      cache))
@@ -67,9 +85,39 @@ class _Base(plugin.PollsterBase):
             LOG.debug(_("Swift endpoint not found"))
             raise StopIteration()
 
-        for t in cache['tenants']:
-            yield (t.id, swift.head_account(self._neaten_url(endpoint, t.id),
-                                            ksclient.auth_token))
+        # idle keep-alive connections to the endpoint, shared by the workers
+        connections = []
+
+        def _head_account(tenant_id):
+            url = self._neaten_url(endpoint, tenant_id)
+            if connections:
+                # the idle connections are all to the endpoint host
+                parsed, conn = urlparse(url), connections.pop()
+            else:
+                parsed, conn = swift.http_connection(url)
+            try:
+                with eventlet.Timeout(cfg.CONF.swift_head_timeout):
+                    account = swift.head_account(url, ksclient.auth_token,
+                                                 http_conn=(parsed, conn))
+            except (Exception, eventlet.Timeout) as err:
+                conn.close()
+                LOG.warning(_("Unable to get Swift account of tenant "
+                              "%(tenant)s: %(err)s") %
+                            {'tenant': tenant_id, 'err': err})
+                return None
+            connections.append(conn)
+            return tenant_id, account
+
+        pool = eventlet.GreenPool(cfg.CONF.swift_head_workers)
+        tenant_ids = [t.id for t in cache[self.CACHE_KEY_TENANT]]
+        try:
+            for info in pool.imap(_head_account, tenant_ids):
+                if info:
+                    yield info
+        finally:
+            # not kept open until the next polling cycle
+            while connections:
+                connections.pop().close()
 
     @staticmethod
     def _neaten_url(endpoint, tenant_id):
@@ -83,7 +131,8 @@ class ObjectsPollster(_Base):
     """
 
     def get_samples(self, manager, cache):
-        for tenant, account in self._iter_accounts(manager.keystone, cache):
+        for tenant, account in self._iter_accounts(
+                manager.keystone, cache, manager.partition_coordinator):
             yield sample.Sample(
                 name='storage.objects',
                 type=sample.TYPE_GAUGE,
@@ -102,7 +151,8 @@ class ObjectsSizePollster(_Base):
     """
 
     def get_samples(self, manager, cache):
-        for tenant, account in self._iter_accounts(manager.keystone, cache):
+        for tenant, account in self._iter_accounts(
+                manager.keystone, cache, manager.partition_coordinator):
             yield sample.Sample(
                 name='storage.objects.size',
                 type=sample.TYPE_GAUGE,
@@ -121,7 +171,8 @@ class ObjectsContainersPollster(_Base):
     """
 
     def get_samples(self, manager, cache):
-        for tenant, account in self._iter_accounts(manager.keystone, cache):
+        for tenant, account in self._iter_accounts(
+                manager.keystone, cache, manager.partition_coordinator):
             yield sample.Sample(
                 name='storage.objects.containers',
                 type=sample.TYPE_GAUGE,
@@ -94,6 +94,9 @@ class SampleFilter(object):
     :param meter: Optional filter for meter type using the meter name.
     :param source: Optional source filter.
     :param metaquery: Optional filter on the metadata
+
+    The user, project and resource can also be given as a list of values,
+    to match the samples having any of them.
     """
     def __init__(self, user=None, project=None,
                  start=None, start_timestamp_op=None,
@@ -19,8 +19,10 @@
 """
 
 import abc
+import bisect
 import datetime
 import math
+import re
 
 from ceilometer.openstack.common import timeutils
 
@@ -45,6 +47,175 @@ def iter_period(start, end, period):
         period_start = next_start
 
 
+def metadata_value(metadata, field):
+    """Return the value of a metadata field, None if it is missing.
+
+    :param metadata: The resource metadata of a sample.
+    :param field: The field name, as metadata.<key>, the keys of nested
+                  metadata being separated by dots.
+    """
+    value = metadata
+    for key in field.split('.')[1:]:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+# aggregates of the statistics computed when none are selected
+DEFAULT_AGGREGATES = ('min', 'max', 'avg', 'sum', 'count')
+# aggregates which can be selected, besides the percentiles as pNN
+AGGREGATES = DEFAULT_AGGREGATES + ('stddev',)
+
+
+def parse_aggregates(aggregate=None):
+    """Return the names of the aggregates to compute and the percentiles.
+
+    :param aggregate: Optional list of aggregates, among AGGREGATES and
+                      the percentiles as pNN, such as p95. All of
+                      DEFAULT_AGGREGATES by default.
+    :returns: The set of the aggregates, and the sorted list of the
+              percentiles requested, as integers.
+    :raises ValueError: if an aggregate is unknown.
+    """
+    if not aggregate:
+        return set(DEFAULT_AGGREGATES), []
+    names = set()
+    percentiles = set()
+    for name in aggregate:
+        match = re.match(r'^p([1-9][0-9]?)$', name)
+        if match:
+            percentiles.add(int(match.group(1)))
+        elif name in AGGREGATES:
+            names.add(name)
+        else:
+            raise ValueError('Unknown aggregate %s' % name)
+    return names, sorted(percentiles)
+
+
+def stddev(count, total, squares):
+    """Return the population standard deviation of values.
+
+    :param count: The number of values.
+    :param total: The sum of the values.
+    :param squares: The sum of the squares of the values.
+    """
+    mean = total / float(count)
+    # the rounding errors could make the variance slightly negative
+    return math.sqrt(max(squares / float(count) - mean * mean, 0))
+
+
+class PercentileEstimator(object):
+    """Estimate a percentile of a series of values in constant memory.
+
+    The percentile is exact for the first values, kept up to exact_size.
+    It is then estimated with the P-square algorithm of Jain and Chlamtac:
+    five markers, placed at the minimum, the maximum, the percentile and
+    the middles between them, are adjusted as values are added.
+    """
+
+    exact_size = 100
+
+    def __init__(self, percentile):
+        p = percentile / 100.0
+        self.p = p
+        self.count = 0
+        self.sorted = []
+        self.heights = None
+        self.positions = None
+        self.desired = None
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def _start_markers(self):
+        values = self.sorted
+        n = len(values)
+        p = self.p
+        self.desired = [1, 1 + (n - 1) * p / 2, 1 + (n - 1) * p,
+                        1 + (n - 1) * (1 + p) / 2, n]
+        positions = [int(round(d)) for d in self.desired]
+        # the markers must be on distinct values
+        for i in (1, 2, 3):
+            positions[i] = max(positions[i], positions[i - 1] + 1)
+        for i in (3, 2, 1):
+            positions[i] = min(positions[i], positions[i + 1] - 1)
+        self.positions = positions
+        self.heights = [values[i - 1] for i in positions]
+        self.sorted = None
+
+    def add(self, value):
+        self.count += 1
+        if self.count <= self.exact_size:
+            bisect.insort(self.sorted, value)
+            return
+        if self.heights is None:
+            self._start_markers()
+        h = self.heights
+        if value < h[0]:
+            h[0] = value
+            k = 0
+        elif value >= h[4]:
+            h[4] = value
+            k = 3
+        else:
+            k = bisect.bisect_right(h, value) - 1
+        n = self.positions
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            if ((d >= 1 and n[i + 1] - n[i] > 1) or
+                    (d <= -1 and n[i - 1] - n[i] < -1)):
+                d = 1 if d > 0 else -1
+                height = self._parabolic(i, d)
+                if not h[i - 1] < height < h[i + 1]:
+                    height = self._linear(i, d)
+                h[i] = height
+                n[i] += d
+
+    def _parabolic(self, i, d):
+        h, n = self.heights, self.positions
+        return h[i] + d / float(n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (h[i + 1] - h[i]) / float(n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (h[i] - h[i - 1])
+            / float(n[i] - n[i - 1]))
+
+    def _linear(self, i, d):
+        h, n = self.heights, self.positions
+        return h[i] + d * (h[i + d] - h[i]) / float(n[i + d] - n[i])
+
+    def value(self):
+        """Return the estimated percentile, None if no value was added."""
+        if self.heights is not None:
+            return self.heights[2]
+        values = self.sorted
+        if not values:
+            return None
+        # interpolated between the closest ranks
+        rank = self.p * (len(values) - 1)
+        low = int(rank)
+        high = min(low + 1, len(values) - 1)
+        return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+class Percentiles(object):
+    """Estimators of several percentiles of the same series of values."""
+
+    def __init__(self, percentiles):
+        self.estimators = [PercentileEstimator(p) for p in percentiles]
+        self.percentiles = percentiles
+
+    def add(self, value):
+        for estimator in self.estimators:
+            estimator.add(value)
+
+    def values(self):
+        """Return the estimated percentiles by name, as pNN."""
+        return dict(('p%d' % p, e.value())
+                    for p, e in zip(self.percentiles, self.estimators))
+
+
 def _handle_sort_key(model_name, sort_key=None):
     """Generate sort keys according to the passed in sort key from user.
 
@@ -122,17 +293,29 @@ class Connection(object):
         """
 
     @abc.abstractmethod
-    def get_users(self, source=None):
-        """Return an iterable of user id strings.
+    def get_users(self, source=None, limit=None, marker=None):
+        """Return an iterable of user id strings, sorted.
 
         :param source: Optional source filter.
+        :param limit: Maximum number of users to return.
+        :param marker: Optional user id the users returned follow.
         """
 
     @abc.abstractmethod
-    def get_projects(self, source=None):
-        """Return an iterable of project id strings.
+    def get_projects(self, source=None, limit=None, marker=None):
+        """Return an iterable of project id strings, sorted.
 
         :param source: Optional source filter.
+        :param limit: Maximum number of projects to return.
+        :param marker: Optional project id the projects returned follow.
+        """
+
+    @abc.abstractmethod
+    def has_project(self, project, source=None):
+        """Return whether a project is known.
+
+        :param project: The project id.
+        :param source: Optional source the project must be known from.
         """
 
     @abc.abstractmethod
@@ -176,16 +359,28 @@ class Connection(object):
         """
 
     @abc.abstractmethod
-    def get_meter_statistics(self, sample_filter, period=None):
+    def get_meter_statistics(self, sample_filter, period=None, groupby=None,
+                             aggregate=None):
         """Return an iterable of model.Statistics instances.
 
         The filter must have a meter value set.
+
+        :param groupby: Optional list of sample fields (user_id, project_id,
+                        resource_id, source or metadata.<key>) to compute
+                        separate statistics for.
+        :param aggregate: Optional list of the aggregates to compute (see
+                          parse_aggregates), the others being None. The
+                          unit, count and duration are always computed.
         """
 
     @abc.abstractmethod
     def get_alarms(self, name=None, user=None,
-                   project=None, enabled=True, alarm_id=None):
+                   project=None, enabled=True, alarm_id=None,
+                   updated_since=None):
         """Yields a lists of alarms that match filters
+
+        :param updated_since: Optional datetime, to only return the alarms
+                              updated at or after it.
         """
 
     @abc.abstractmethod
@@ -255,29 +255,49 @@ class Connection(base.Connection):
         """
         raise NotImplementedError
 
-    def get_users(self, source=None):
-        """Return an iterable of user id strings.
-
-        :param source: Optional source filter.
-        """
-        user_table = self.conn.table(self.USER_TABLE)
+    @staticmethod
+    def _distinct_ids(table, source=None, limit=None, marker=None):
         LOG.debug("source: %s" % source)
         scan_args = {}
         if source:
             scan_args['columns'] = ['f:s_%s' % source]
-        return sorted(key for key, ignored in user_table.scan(**scan_args))
+        if marker is not None:
+            # the first row key following the marker
+            scan_args['row_start'] = marker + '\x00'
+        if limit:
+            scan_args['limit'] = limit
+        # the rows are scanned in the order of their keys, the ids
+        return (key for key, ignored in table.scan(**scan_args))
+
+    def get_users(self, source=None, limit=None, marker=None):
+        """Return an iterable of user id strings, sorted.
 
-    def get_projects(self, source=None):
-        """Return an iterable of project id strings.
+        :param source: Optional source filter.
+        :param limit: Maximum number of users to return.
+        :param marker: Optional user id the users returned follow.
+        """
+        return self._distinct_ids(self.conn.table(self.USER_TABLE),
+                                  source, limit, marker)
+
+    def get_projects(self, source=None, limit=None, marker=None):
+        """Return an iterable of project id strings, sorted.
 
         :param source: Optional source filter.
+        :param limit: Maximum number of projects to return.
+        :param marker: Optional project id the projects returned follow.
+        """
+        return self._distinct_ids(self.conn.table(self.PROJECT_TABLE),
+                                  source, limit, marker)
+
+    def has_project(self, project, source=None):
+        """Return whether a project is known.
+
+        :param project: The project id.
+        :param source: Optional source the project must be known from.
         """
         project_table = self.conn.table(self.PROJECT_TABLE)
-        LOG.debug("source: %s" % source)
-        scan_args = {}
-        if source:
-            scan_args['columns'] = ['f:s_%s' % source]
-        return (key for key, ignored in project_table.scan(**scan_args))
+        columns = ['f:s_%s' % source] if source else None
+        return bool(project_table.row(project, columns=columns))
 
     def get_resources(self, user=None, project=None, source=None,
                       start_timestamp=None, start_timestamp_op=None,
@@ -471,30 +491,33 @@ class Connection(base.Connection):
                 yield make_sample(meter)
 
     @staticmethod
-    def _update_meter_stats(stat, meter):
+    def _update_meter_stats(stat, meter, aggregates):
         """Do the stats calculation on a requested time bucket in stats dict
 
         :param stats: dict where aggregated stats are kept
-        :param index: time bucket index in stats
         :param meter: meter record as returned from HBase
-        :param start_time: query start time
-        :param period: length of the time bucket
+        :param aggregates: the aggregates to compute
         """
         vol = int(meter['f:counter_volume'])
         ts = timeutils.parse_strtime(meter['f:timestamp'])
         stat.unit = meter['f:counter_unit']
-        stat.min = min(vol, stat.min or vol)
-        stat.max = max(vol, stat.max)
-        stat.sum = vol + (stat.sum or 0)
         stat.count += 1
-        stat.avg = (stat.sum / float(stat.count))
+        if 'min' in aggregates:
+            stat.min = min(vol, stat.min or vol)
+        if 'max' in aggregates:
+            stat.max = max(vol, stat.max)
+        if aggregates & set(['sum', 'avg', 'stddev']):
+            stat.sum = vol + (stat.sum or 0)
+        if 'avg' in aggregates:
+            stat.avg = (stat.sum / float(stat.count))
         stat.duration_start = min(ts, stat.duration_start or ts)
         stat.duration_end = max(ts, stat.duration_end or ts)
         stat.duration = \
             timeutils.delta_seconds(stat.duration_start,
                                     stat.duration_end)
 
-    def get_meter_statistics(self, sample_filter, period=None):
+    def get_meter_statistics(self, sample_filter, period=None, groupby=None,
+                             aggregate=None):
         """Return an iterable of models.Statistics instances containing meter
         statistics described by the query parameters.
 
@@ -507,6 +530,15 @@ class Connection(base.Connection):
            because of all the Thrift traffic it is going to create.
 
         """
+        if groupby:
+            for group in groupby:
+                if (group not in ['user_id', 'project_id', 'resource_id',
+                                  'source']
+                        and not group.startswith('metadata.')):
+                    raise NotImplementedError(
+                        "Unable to group by field %s" % group)
+        aggregates, percentiles = base.parse_aggregates(aggregate)
+
         meter_table = self.conn.table(self.METER_TABLE)
 
         q, start, stop = make_query_from_filter(sample_filter)
@@ -530,7 +562,11 @@ class Connection(base.Connection):
         else:
             end_time = None
 
-        results = []
+        # (period start, group values) -> statistics being accumulated
+        results = {}
+        # the sums of the squares and the percentile estimators, by key
+        squares = {}
+        estimators = {}
 
         if not period:
             period = 0
@@ -545,31 +581,57 @@ class Connection(base.Connection):
                 offset = int(timeutils.delta_seconds(
                     start_time, ts) / period) * period
                 period_start = start_time + datetime.timedelta(0, offset)
-
-            if not len(results) or not results[-1].period_start == \
-                    period_start:
-                if period:
-                    period_end = period_start + datetime.timedelta(
-                        0, period)
-                results.append(
-                    models.Statistics(unit='',
-                                      count=0,
-                                      min=0,
-                                      max=0,
-                                      avg=0,
-                                      sum=0,
-                                      period=period,
-                                      period_start=period_start,
-                                      period_end=period_end,
-                                      duration=None,
-                                      duration_start=None,
-                                      duration_end=None)
-                )
-            self._update_meter_stats(results[-1], meter)
-        return results
+                period_end = period_start + datetime.timedelta(0, period)
+
+            if groupby:
+                if any(g.startswith('metadata.') for g in groupby):
+                    # the metadata is only stored in the original message
+                    metadata = json.loads(
+                        meter['f:message'])['resource_metadata']
+                group = tuple((g, base.metadata_value(metadata, g)
+                               if g.startswith('metadata.')
+                               else meter['f:%s' % g])
+                              for g in groupby)
+            else:
+                group = None
+            key = (period_start, group)
+            if key not in results:
+                results[key] = models.Statistics(
+                    unit='',
+                    count=0,
+                    min=0 if 'min' in aggregates else None,
+                    max=0 if 'max' in aggregates else None,
+                    avg=0 if 'avg' in aggregates else None,
+                    sum=0 if 'sum' in aggregates else None,
+                    period=period,
+                    period_start=period_start,
+                    period_end=period_end,
+                    duration=None,
+                    duration_start=None,
+                    duration_end=None,
+                    groupby=dict(group) if group else None)
+                squares[key] = 0
+                if percentiles:
+                    estimators[key] = base.Percentiles(percentiles)
+            self._update_meter_stats(results[key], meter, aggregates)
+            if 'stddev' in aggregates:
+                squares[key] += int(meter['f:counter_volume']) ** 2
+            if percentiles:
+                estimators[key].add(int(meter['f:counter_volume']))
+
+        for key, stat in results.iteritems():
+            if 'stddev' in aggregates:
+                stat.stddev = base.stddev(stat.count, stat.sum, squares[key])
+            if 'sum' not in aggregates:
+                # only summed for the other aggregates
+                stat.sum = None
+            if percentiles:
+                stat.percentiles = estimators[key].values()
+        return [results[key] for key in sorted(results)]
 
     def get_alarms(self, name=None, user=None,
-                   project=None, enabled=True, alarm_id=None):
+                   project=None, enabled=True, alarm_id=None,
+                   updated_since=None):
         """Yields a lists of alarms that match filters
             raise NotImplementedError('metaquery not implemented')
         """
@@ -612,8 +674,11 @@ class MTable(object):
         self.families = families
         self._rows = {}
 
-    def row(self, key):
-        return self._rows.get(key, {})
+    def row(self, key, columns=None):
+        row = self._rows.get(key, {})
+        if columns:
+            return dict((k, v) for k, v in row.items() if k in columns)
+        return row
 
     def rows(self, keys):
         return ((k, self.row(k)) for k in keys)
@@ -621,7 +686,8 @@ class MTable(object):
     def put(self, key, data):
         self._rows[key] = data
 
-    def scan(self, filter=None, columns=[], row_start=None, row_stop=None):
+    def scan(self, filter=None, columns=[], row_start=None, row_stop=None,
+             limit=None):
         sorted_keys = sorted(self._rows)
         # copy data between row_start and row_stop into a dict
         rows = {}
@@ -641,25 +707,36 @@ class MTable(object):
             rows = ret
         elif filter:
             # TODO(jdanjou): we should really parse this properly,
-            # but at the moment we are only going to support AND here
+            # but at the moment we are only going to support AND here,
+            # and OR between the filters of a parenthesized group
             filters = filter.split('AND')
             for f in filters:
-                # Extract filter name and its arguments
-                g = re.search("(.*)\((.*),?\)", f)
-                fname = g.group(1).strip()
-                fargs = [s.strip().replace('\'', '').replace('\"', '')
-                         for s in g.group(2).split(',')]
-                m = getattr(self, fname)
-                if callable(m):
-                    # overwrite rows for filtering to take effect
-                    # in case of multiple filters
-                    rows = m(fargs, rows)
+                f = f.strip()
+                if f.startswith('(') and ' OR ' in f:
+                    alternatives = f[1:-1].split(' OR ')
                 else:
-                    raise NotImplementedError("%s filter is not implemented, "
-                                              "you may want to add it!")
-        for k in sorted(rows):
+                    alternatives = [f]
+                matched = {}
+                for alternative in alternatives:
+                    matched.update(self._filter(alternative, rows))
+                # overwrite rows for filtering to take effect
+                # in case of multiple filters
+                rows = matched
+        for k in sorted(rows)[:limit]:
             yield k, rows[k]
 
+    def _filter(self, f, rows):
+        # Extract filter name and its arguments
+        g = re.search("(.*)\((.*),?\)", f)
+        fname = g.group(1).strip()
+        fargs = [s.strip().replace('\'', '').replace('\"', '')
+                 for s in g.group(2).split(',')]
+        m = getattr(self, fname)
+        if callable(m):
+            return m(fargs, rows)
+        raise NotImplementedError("%s filter is not implemented, "
+                                  "you may want to add it!")
+
     @staticmethod
     def SingleColumnValueFilter(args, rows):
         """This method is called from scan() when 'SingleColumnValueFilter'
@@ -732,15 +809,28 @@ def reverse_timestamp(dt):
     return 0x7fffffffffffffff - ts
 
 
+def _column_filter(column, value):
+    """Return the filter matching a column value, or any of a list of
+    values.
+    """
+    if not isinstance(value, list):
+        value = [value]
+    filters = ["SingleColumnValueFilter ('f', '%s', =, 'binary:%s')"
+               % (column, v) for v in value]
+    if len(filters) == 1:
+        return filters[0]
+    return "(%s)" % " OR ".join(filters)
+
+
 def make_query(user=None, project=None, meter=None,
                resource=None, source=None, start=None, start_op=None,
                end=None, end_op=None, require_meter=True, query_only=False):
     """Return a filter query string based on the selected parameters.
 
-    :param user: Optional user-id
-    :param project: Optional project-id
+    :param user: Optional user-id, or list of user-ids
+    :param project: Optional project-id, or list of project-ids
     :param meter: Optional counter-name
-    :param resource: Optional resource-id
+    :param resource: Optional resource-id, or list of resource-ids
     :param source: Optional source-id
     :param start: Optional start timestamp
     :param start_op: Optional start timestamp operator, like gt, ge
@@ -754,14 +844,11 @@ def make_query(user=None, project=None, meter=None,
     q = []
 
     if user:
-        q.append("SingleColumnValueFilter ('f', 'user_id', =, 'binary:%s')"
-                 % user)
+        q.append(_column_filter('user_id', user))
     if project:
-        q.append("SingleColumnValueFilter ('f', 'project_id', =, 'binary:%s')"
-                 % project)
+        q.append(_column_filter('project_id', project))
     if resource:
-        q.append("SingleColumnValueFilter ('f', 'resource_id', =, 'binary:%s')"
-                 % resource)
+        q.append(_column_filter('resource_id', resource))
     if source:
         q.append("SingleColumnValueFilter "
                  "('f', 'source', =, 'binary:%s')" % source)
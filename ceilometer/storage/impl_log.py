@@ -67,20 +67,32 @@ class Connection(base.Connection):
         """
         LOG.info("Dropping data with TTL %d", ttl)
 
-    def get_users(self, source=None):
-        """Return an iterable of user id strings.
+    def get_users(self, source=None, limit=None, marker=None):
+        """Return an iterable of user id strings, sorted.
 
         :param source: Optional source filter.
+        :param limit: Maximum number of users to return.
+        :param marker: Optional user id the users returned follow.
         """
         return []
 
-    def get_projects(self, source=None):
-        """Return an iterable of project id strings.
+    def get_projects(self, source=None, limit=None, marker=None):
+        """Return an iterable of project id strings, sorted.
 
         :param source: Optional source filter.
+        :param limit: Maximum number of projects to return.
+        :param marker: Optional project id the projects returned follow.
         """
         return []
 
+    def has_project(self, project, source=None):
+        """Return whether a project is known.
+
+        :param project: The project id.
+        :param source: Optional source the project must be known from.
+        """
+        return False
+
     def get_resources(self, user=None, project=None, source=None,
                       start_timestamp=None, start_timestamp_op=None,
                       end_timestamp=None, end_timestamp_op=None,
@@ -133,7 +145,8 @@ class Connection(base.Connection):
         """
         return []
 
-    def get_meter_statistics(self, sample_filter, period=None):
+    def get_meter_statistics(self, sample_filter, period=None, groupby=None,
+                             aggregate=None):
         """Return a dictionary containing meter statistics.
         described by the query parameters.
 
@@ -156,7 +169,8 @@ class Connection(base.Connection):
         return []
 
     def get_alarms(self, name=None, user=None,
-                   project=None, enabled=True, alarm_id=None):
+                   project=None, enabled=True, alarm_id=None,
+                   updated_since=None):
         """Yields a lists of alarms that match filters
         """
         return []
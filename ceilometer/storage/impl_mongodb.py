@@ -22,6 +22,7 @@
 
 import calendar
 import copy
+import json
 import operator
 import uuid
 import weakref
@@ -100,6 +101,14 @@ def make_timestamp_range(start, end,
     return ts_range
 
 
+def _match_in(value):
+    """Return the condition matching a value, or any of a list of values.
+    """
+    if isinstance(value, list):
+        return {'$in': value}
+    return value
+
+
 def make_query_from_filter(sample_filter, require_meter=True):
     """Return a query dictionary based on the settings in the filter.
 
@@ -110,9 +119,9 @@ def make_query_from_filter(sample_filter, require_meter=True):
     q = {}
 
     if sample_filter.user:
-        q['user_id'] = sample_filter.user
+        q['user_id'] = _match_in(sample_filter.user)
     if sample_filter.project:
-        q['project_id'] = sample_filter.project
+        q['project_id'] = _match_in(sample_filter.project)
 
     if sample_filter.meter:
         q['counter_name'] = sample_filter.meter
@@ -126,7 +135,7 @@ def make_query_from_filter(sample_filter, require_meter=True):
         q['timestamp'] = ts_range
 
     if sample_filter.resource:
-        q['resource_id'] = sample_filter.resource
+        q['resource_id'] = _match_in(sample_filter.resource)
     if sample_filter.source:
         q['source'] = sample_filter.source
 
@@ -175,57 +184,64 @@ class Connection(base.Connection):
 
     MAP_STATS = bson.code.Code("""
     function () {
-        emit('statistics', { unit: this.counter_unit,
-                             min : this.counter_volume,
-                             max : this.counter_volume,
-                             sum : this.counter_volume,
-                             count : NumberInt(1),
-                             duration_start : this.timestamp,
-                             duration_end : this.timestamp,
-                             period_start : this.timestamp,
-                             period_end : this.timestamp} )
+        function metadata(value, keys) {
+            for (var i = 0; value != null && i < keys.length; i++)
+                value = value[keys[i]];
+            return value === undefined ? null : value;
+        }
+        var groupby = %(groupby)s;
+        emit(groupby,
+             { unit: this.counter_unit,%(aggregates)s
+               count : NumberInt(1),
+               duration_start : this.timestamp,
+               duration_end : this.timestamp,
+               period_start : this.timestamp,
+               period_end : this.timestamp,
+               groupby : groupby } )
     }
     """)
 
     MAP_STATS_PERIOD = bson.code.Code("""
     function () {
-        var period = %d * 1000;
-        var period_first = %d * 1000;
+        var period = %(period)d * 1000;
+        var period_first = %(period_first)d * 1000;
+        function metadata(value, keys) {
+            for (var i = 0; value != null && i < keys.length; i++)
+                value = value[keys[i]];
+            return value === undefined ? null : value;
+        }
+        var groupby = %(groupby)s;
         var period_start = period_first
                            + (Math.floor(new Date(this.timestamp.getTime()
                                          - period_first) / period)
                               * period);
-        emit(period_start,
-             { unit: this.counter_unit,
-               min : this.counter_volume,
-               max : this.counter_volume,
-               sum : this.counter_volume,
+        emit({ period_start : period_start, groupby : groupby },
+             { unit: this.counter_unit,%(aggregates)s
                count : NumberInt(1),
                duration_start : this.timestamp,
                duration_end : this.timestamp,
                period_start : new Date(period_start),
-               period_end : new Date(period_start + period) } )
+               period_end : new Date(period_start + period),
+               groupby : groupby } )
     }
     """)
 
     REDUCE_STATS = bson.code.Code("""
     function (key, values) {
-        var res = { unit: values[0].unit,
-                    min: values[0].min,
-                    max: values[0].max,
-                    count: values[0].count,
-                    sum: values[0].sum,
-                    period_start: values[0].period_start,
-                    period_end: values[0].period_end,
-                    duration_start: values[0].duration_start,
-                    duration_end: values[0].duration_end };
+        // only the aggregates emitted are there
+        var res = {};
+        for ( var field in values[0] )
+            res[field] = values[0][field];
         for ( var i=1; i<values.length; i++ ) {
-            if ( values[i].min < res.min )
+            if ( 'min' in res && values[i].min < res.min )
                res.min = values[i].min;
-            if ( values[i].max > res.max )
+            if ( 'max' in res && values[i].max > res.max )
                res.max = values[i].max;
             res.count = NumberInt(res.count + values[i].count);
-            res.sum += values[i].sum;
+            if ( 'sum' in res )
+               res.sum += values[i].sum;
+            if ( 'squares' in res )
+               res.squares += values[i].squares;
             if ( values[i].duration_start < res.duration_start )
                res.duration_start = values[i].duration_start;
             if ( values[i].duration_end > res.duration_end )
@@ -237,7 +253,8 @@ class Connection(base.Connection):
 
     FINALIZE_STATS = bson.code.Code("""
     function (key, value) {
-        value.avg = value.sum / value.count;
+        if ( 'sum' in value )
+            value.avg = value.sum / value.count;
         value.duration = (value.duration_end - value.duration_start) / 1000;
         value.period = NumberInt((value.period_end - value.period_start)
                                   / 1000);
@@ -485,31 +502,48 @@ class Connection(base.Connection):
             limit = 0
         return db_collection.find(q, limit=limit, sort=all_sort)
 
-    def get_users(self, source=None):
-        """Return an iterable of user id strings.
-
-        :param source: Optional source filter.
-        """
+    @staticmethod
+    def _distinct_ids(collection, source=None, limit=None, marker=None):
         q = {}
         if source is not None:
             q['source'] = source
+        if marker is not None:
+            q['_id'] = {'$gt': marker}
 
+        # read from the _id index, 0 being no limit
         return (doc['_id'] for doc in
-                self.db.user.find(q, fields=['_id'],
-                                  sort=[('_id', pymongo.ASCENDING)]))
+                collection.find(q, fields=['_id'],
+                                sort=[('_id', pymongo.ASCENDING)],
+                                limit=limit or 0))
 
-    def get_projects(self, source=None):
-        """Return an iterable of project id strings.
+    def get_users(self, source=None, limit=None, marker=None):
+        """Return an iterable of user id strings, sorted.
 
         :param source: Optional source filter.
+        :param limit: Maximum number of users to return.
+        :param marker: Optional user id the users returned follow.
         """
-        q = {}
+        return self._distinct_ids(self.db.user, source, limit, marker)
+
+    def get_projects(self, source=None, limit=None, marker=None):
+        """Return an iterable of project id strings, sorted.
+
+        :param source: Optional source filter.
+        :param limit: Maximum number of projects to return.
+        :param marker: Optional project id the projects returned follow.
+        """
+        return self._distinct_ids(self.db.project, source, limit, marker)
+
+    def has_project(self, project, source=None):
+        """Return whether a project is known.
+
+        :param project: The project id.
+        :param source: Optional source the project must be known from.
+        """
+        q = {'_id': project}
         if source is not None:
             q['source'] = source
-
-        return (doc['_id'] for doc in
-                self.db.project.find(q, fields=['_id'],
-                                     sort=[('_id', pymongo.ASCENDING)]))
+        return self.db.project.find_one(q, fields=['_id']) is not None
 
     def get_resources(self, user=None, project=None, source=None,
                       start_timestamp=None, start_timestamp_op=None,
@@ -684,15 +718,31 @@ class Connection(base.Connection):
             s['counter_unit'] = s.get('counter_unit', '')
             yield models.Sample(**s)
 
-    def get_meter_statistics(self, sample_filter, period=None):
+    def get_meter_statistics(self, sample_filter, period=None, groupby=None,
+                             aggregate=None):
         """Return an iterable of models.Statistics instance containing meter
         statistics described by the query parameters.
 
         The filter must have a meter value set.
 
         """
+        if groupby:
+            for group in groupby:
+                if (group not in ['user_id', 'project_id', 'resource_id',
+                                  'source']
+                        and not group.startswith('metadata.')):
+                    raise NotImplementedError(
+                        "Unable to group by field %s" % group)
+            # the values of the fields are part of the map-reduce key
+            groupby_js = '[ %s ]' % ', '.join(self._groupby_js(g)
+                                              for g in groupby)
+        else:
+            groupby_js = 'null'
+        aggregates, percentiles = base.parse_aggregates(aggregate)
+
         q = make_query_from_filter(sample_filter)
 
+        period_start = None
         if period:
             if sample_filter.start:
                 period_start = sample_filter.start
@@ -701,9 +751,17 @@ class Connection(base.Connection):
                     limit=1, sort=[('timestamp',
                                     pymongo.ASCENDING)])[0]['timestamp']
             period_start = int(calendar.timegm(period_start.utctimetuple()))
-            map_stats = self.MAP_STATS_PERIOD % (period, period_start)
+            map_stats = self.MAP_STATS_PERIOD % {
+                'period': period,
+                'period_first': period_start,
+                'groupby': groupby_js,
+                'aggregates': self._aggregates_js(aggregates),
+            }
         else:
-            map_stats = self.MAP_STATS
+            map_stats = self.MAP_STATS % {
+                'groupby': groupby_js,
+                'aggregates': self._aggregates_js(aggregates),
+            }
 
         results = self.db.meter.map_reduce(
             map_stats,
@@ -713,9 +771,80 @@ class Connection(base.Connection):
             query=q,
         )
 
-        return sorted((models.Statistics(**(r['value']))
-                       for r in results['results']),
-                      key=operator.attrgetter('period_start'))
+        estimated = (self._estimate_percentiles(q, groupby, percentiles,
+                                                period, period_start)
+                     if percentiles else {})
+
+        statistics = []
+        for r in results['results']:
+            value = r['value']
+            squares = value.pop('squares', None)
+            if 'stddev' in aggregates:
+                value['stddev'] = base.stddev(value['count'], value['sum'],
+                                              squares)
+            for name in ('min', 'max', 'avg', 'sum'):
+                if name not in aggregates:
+                    value[name] = None
+            if percentiles:
+                value['percentiles'] = estimated.get(
+                    self._percentiles_key(value['groupby'], period,
+                                          period_start,
+                                          value['period_start']))
+            if groupby:
+                value['groupby'] = dict(zip(groupby, value['groupby']))
+            statistics.append(models.Statistics(**value))
+        return sorted(statistics, key=operator.attrgetter('period_start'))
+
+    @staticmethod
+    def _aggregates_js(aggregates):
+        # only the aggregates needed are emitted and reduced
+        fields = []
+        if 'min' in aggregates:
+            fields.append('min : this.counter_volume')
+        if 'max' in aggregates:
+            fields.append('max : this.counter_volume')
+        if aggregates & set(['sum', 'avg', 'stddev']):
+            fields.append('sum : this.counter_volume')
+        if 'stddev' in aggregates:
+            fields.append('squares : this.counter_volume'
+                          ' * this.counter_volume')
+        return ''.join('\n               %s,' % f for f in fields)
+
+    @staticmethod
+    def _percentiles_key(groupby, period, period_first, timestamp):
+        if not period:
+            return (tuple(groupby or ()), None)
+        # the start of the period of the timestamp, as in MAP_STATS_PERIOD
+        seconds = calendar.timegm(timestamp.utctimetuple())
+        return (tuple(groupby or ()),
+                period_first + (seconds - period_first) // period * period)
+
+    def _estimate_percentiles(self, q, groupby, percentiles, period,
+                              period_first):
+        """Return the estimated percentiles of the volumes by group."""
+        fields = ['counter_volume', 'timestamp']
+        for g in groupby or []:
+            fields.append('resource_metadata' if g.startswith('metadata.')
+                          else g)
+        estimators = {}
+        for s in self.db.meter.find(q, fields=fields):
+            group = [base.metadata_value(s.get('resource_metadata'), g)
+                     if g.startswith('metadata.') else s.get(g)
+                     for g in groupby or []]
+            key = self._percentiles_key(group, period, period_first,
+                                        s['timestamp'])
+            if key not in estimators:
+                estimators[key] = base.Percentiles(percentiles)
+            estimators[key].add(s['counter_volume'])
+        return dict((key, e.values()) for key, e in estimators.items())
+
+    @staticmethod
+    def _groupby_js(field):
+        if field.startswith('metadata.'):
+            # the keys are given as JSON strings to the lookup function
+            return 'metadata(this.resource_metadata, %s)' % json.dumps(
+                field.split('.')[1:])
+        return 'this.%s' % field
 
     @staticmethod
     def _decode_matching_metadata(matching_metadata):
@@ -739,7 +868,8 @@ class Connection(base.Connection):
 
     def get_alarms(self, name=None, user=None,
                    project=None, enabled=True, alarm_id=None, limit=None,
-                   marker_pairs=None, sort_key=None, sort_dir=None):
+                   marker_pairs=None, sort_key=None, sort_dir=None,
+                   updated_since=None):
         """Yields a lists of alarms that match filters
         :param name: The Alarm name.
         :param user: Optional ID for user that owns the resource.
@@ -751,6 +881,8 @@ class Connection(base.Connection):
                             the previous page.
         :param sort_key: Attribute by which results be sorted.
         :param sort_dir: Direction with which results be sorted(asc, desc).
+        :param updated_since: Optional datetime of the oldest update of the
+                              alarms returned.
         """
         q = {}
         if user is not None:
@@ -763,6 +895,8 @@ class Connection(base.Connection):
             q['enabled'] = enabled
         if alarm_id is not None:
             q['alarm_id'] = alarm_id
+        if updated_since is not None:
+            q['timestamp'] = {'$gte': updated_since}
 
         marker = self._get_marker(self.db.alarm, marker_pairs=marker_pairs)
         sort_keys = base._handle_sort_key('alarm', sort_key)
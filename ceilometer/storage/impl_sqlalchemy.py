@@ -40,6 +40,7 @@ from ceilometer.storage.sqlalchemy.models import Meter
 from ceilometer.storage.sqlalchemy.models import Project
 from ceilometer.storage.sqlalchemy.models import Resource
 from ceilometer.storage.sqlalchemy.models import Source
+from ceilometer.storage.sqlalchemy.models import sourceassoc
 from ceilometer.storage.sqlalchemy.models import Trait
 from ceilometer.storage.sqlalchemy.models import UniqueName
 from ceilometer.storage.sqlalchemy.models import User
@@ -99,6 +100,13 @@ class SQLAlchemyStorage(base.StorageEngine):
         return Connection(conf)
 
 
+def _filter_in(query, column, value):
+    """Filter the query on a value, or on any of a list of values."""
+    if isinstance(value, list):
+        return query.filter(column.in_(value))
+    return query.filter(column == value)
+
+
 def make_query_from_filter(query, sample_filter, require_meter=True):
     """Return a query dictionary based on the settings in the filter.
 
@@ -126,11 +134,11 @@ def make_query_from_filter(query, sample_filter, require_meter=True):
         else:
             query = query.filter(Meter.timestamp < ts_end)
     if sample_filter.user:
-        query = query.filter_by(user_id=sample_filter.user)
+        query = _filter_in(query, Meter.user_id, sample_filter.user)
     if sample_filter.project:
-        query = query.filter_by(project_id=sample_filter.project)
+        query = _filter_in(query, Meter.project_id, sample_filter.project)
     if sample_filter.resource:
-        query = query.filter_by(resource_id=sample_filter.resource)
+        query = _filter_in(query, Meter.resource_id, sample_filter.resource)
 
     if sample_filter.metaquery:
         raise NotImplementedError('metaquery not implemented')
@@ -246,28 +254,51 @@ class Connection(base.Connection):
         query.delete(synchronize_session='fetch')
 
     @staticmethod
-    def get_users(source=None):
-        """Return an iterable of user id strings.
-
-        :param source: Optional source filter.
-        """
+    def _distinct_ids(model, source=None, limit=None, marker=None):
         session = sqlalchemy_session.get_session()
-        query = session.query(User.id)
+        query = session.query(model.id)
         if source is not None:
-            query = query.filter(User.sources.any(id=source))
+            query = query.filter(model.sources.any(id=source))
+        if marker is not None:
+            query = query.filter(model.id > marker)
+        # the ids are the primary keys, read in their order
+        query = query.order_by(model.id)
+        if limit:
+            query = query.limit(limit)
         return (x[0] for x in query.all())
 
-    @staticmethod
-    def get_projects(source=None):
-        """Return an iterable of project id strings.
+    @classmethod
+    def get_users(cls, source=None, limit=None, marker=None):
+        """Return an iterable of user id strings, sorted.
 
         :param source: Optional source filter.
+        :param limit: Maximum number of users to return.
+        :param marker: Optional user id the users returned follow.
+        """
+        return cls._distinct_ids(User, source, limit, marker)
+
+    @classmethod
+    def get_projects(cls, source=None, limit=None, marker=None):
+        """Return an iterable of project id strings, sorted.
+
+        :param source: Optional source filter.
+        :param limit: Maximum number of projects to return.
+        :param marker: Optional project id the projects returned follow.
+        """
+        return cls._distinct_ids(Project, source or None, limit, marker)
+
+    @staticmethod
+    def has_project(project, source=None):
+        """Return whether a project is known.
+
+        :param project: The project id.
+        :param source: Optional source the project must be known from.
         """
         session = sqlalchemy_session.get_session()
-        query = session.query(Project.id)
+        query = session.query(Project.id).filter(Project.id == project)
         if source:
             query = query.filter(Project.sources.any(id=source))
-        return (x[0] for x in query.all())
+        return query.first() is not None
 
     @staticmethod
     def get_resources(user=None, project=None, source=None,
@@ -313,23 +344,32 @@ class Connection(base.Connection):
         if metaquery:
             raise NotImplementedError('metaquery not implemented')
 
-        for meter, first_ts, last_ts in query.all():
+        # the meters of all the resources are read from a single query
+        resource_ids = query.with_entities(Meter.resource_id).subquery()
+        meters = {}
+        for resource_id, name, type_, unit in session.query(
+                Meter.resource_id, Meter.counter_name, Meter.counter_type,
+                Meter.counter_unit).filter(
+                    Meter.resource_id.in_(resource_ids)).distinct():
+            meters.setdefault(resource_id, []).append(
+                api_models.ResourceMeter(
+                    counter_name=name,
+                    counter_type=type_,
+                    counter_unit=unit,
+                ))
+
+        query = query.add_columns(sourceassoc.c.source_id).join(
+            sourceassoc, sourceassoc.c.meter_id == Meter.id)
+        for meter, first_ts, last_ts, source in query.all():
             yield api_models.Resource(
                 resource_id=meter.resource_id,
                 project_id=meter.project_id,
                 first_sample_timestamp=first_ts,
                 last_sample_timestamp=last_ts,
-                source=meter.sources[0].id,
+                source=source,
                 user_id=meter.user_id,
                 metadata=meter.resource_metadata,
-                meter=[
-                    api_models.ResourceMeter(
-                        counter_name=m.counter_name,
-                        counter_type=m.counter_type,
-                        counter_unit=m.counter_unit,
-                    )
-                    for m in meter.resource.meters
-                ],
+                meter=meters.get(meter.resource_id, []),
             )
 
     @staticmethod
@@ -404,11 +444,18 @@ class Connection(base.Connection):
         query = session.query(Meter)
         query = make_query_from_filter(query, sample_filter,
                                        require_meter=False)
+        # the source of each sample is read along with it, instead of
+        # being loaded from its own query
+        query = query.add_columns(sourceassoc.c.source_id).join(
+            sourceassoc, sourceassoc.c.meter_id == Meter.id)
         if limit:
             query = query.limit(limit)
-        samples = query.from_self().order_by(desc(Meter.timestamp)).all()
+        # the rows are fetched by batches, so that the samples can be
+        # consumed as they are read
+        samples = query.from_self().order_by(
+            desc(Meter.timestamp)).yield_per(1000)
 
-        for s in samples:
+        for s, source in samples:
             # Remove the id generated by the database when
             # the sample was inserted. It is an implementation
             # detail that should not leak outside of the driver.
@@ -416,7 +463,7 @@ class Connection(base.Connection):
                 # Replace 'sources' with 'source' to meet the caller's
                 # expectation, Meter.sources contains one and only one
                 # source in the current implementation.
-                source=s.sources[0].id,
+                source=source,
                 counter_name=s.counter_name,
                 counter_type=s.counter_type,
                 counter_unit=s.counter_unit,
@@ -431,56 +478,137 @@ class Connection(base.Connection):
             )
 
     @staticmethod
-    def _make_stats_query(sample_filter):
+    def _make_group_query(select, sample_filter, groupby=None):
+        group_attributes = [sourceassoc.c.source_id.label('source')
+                            if g == 'source' else getattr(Meter, g)
+                            for g in groupby or []]
+        select = select + group_attributes
+
         session = sqlalchemy_session.get_session()
-        query = session.query(
+        query = session.query(*select)
+        if group_attributes:
+            if 'source' in groupby:
+                query = query.join(sourceassoc,
+                                   sourceassoc.c.meter_id == Meter.id)
+        return make_query_from_filter(query, sample_filter), group_attributes
+
+    @classmethod
+    def _make_stats_query(cls, sample_filter, groupby=None, aggregates=None):
+        if aggregates is None:
+            aggregates = base.DEFAULT_AGGREGATES
+        select = [
             Meter.counter_unit.label('unit'),
             func.min(Meter.timestamp).label('tsmin'),
             func.max(Meter.timestamp).label('tsmax'),
-            func.avg(Meter.counter_volume).label('avg'),
-            func.sum(Meter.counter_volume).label('sum'),
-            func.min(Meter.counter_volume).label('min'),
-            func.max(Meter.counter_volume).label('max'),
-            func.count(Meter.counter_volume).label('count'))
-
-        return make_query_from_filter(query, sample_filter)
+            func.count(Meter.counter_volume).label('count'),
+        ]
+        # only the aggregate functions needed are computed
+        if 'avg' in aggregates:
+            select.append(func.avg(Meter.counter_volume).label('avg'))
+        if 'sum' in aggregates or 'stddev' in aggregates:
+            select.append(func.sum(Meter.counter_volume).label('sum'))
+        if 'stddev' in aggregates:
+            select.append(func.sum(Meter.counter_volume *
+                                   Meter.counter_volume).label('squares'))
+        if 'min' in aggregates:
+            select.append(func.min(Meter.counter_volume).label('min'))
+        if 'max' in aggregates:
+            select.append(func.max(Meter.counter_volume).label('max'))
+
+        query, group_attributes = cls._make_group_query(select, sample_filter,
+                                                        groupby)
+        if group_attributes:
+            query = query.group_by(*group_attributes)
+        return query
+
+    @classmethod
+    def _estimate_percentiles(cls, sample_filter, groupby, percentiles,
+                              period_start=None, period_end=None):
+        """Return the estimated percentiles of the volumes by group."""
+        query, group_attributes = cls._make_group_query(
+            [Meter.counter_volume], sample_filter, groupby)
+        if period_start is not None:
+            query = query.filter(Meter.timestamp >= period_start)
+            query = query.filter(Meter.timestamp < period_end)
+        estimators = {}
+        for row in query.yield_per(1000):
+            group = tuple(row[1:])
+            if group not in estimators:
+                estimators[group] = base.Percentiles(percentiles)
+            estimators[group].add(row[0])
+        return dict((group, e.values()) for group, e in estimators.items())
 
     @staticmethod
-    def _stats_result_to_model(result, period, period_start, period_end):
+    def _stats_result_to_model(result, period, period_start, period_end,
+                               groupby=None, aggregates=None,
+                               percentiles=None):
+        if aggregates is None:
+            aggregates = base.DEFAULT_AGGREGATES
         duration = (timeutils.delta_seconds(result.tsmin, result.tsmax)
                     if result.tsmin is not None and result.tsmax is not None
                     else None)
+        stddev = (base.stddev(result.count, result.sum, result.squares)
+                  if 'stddev' in aggregates else None)
+        if percentiles is not None:
+            percentiles = percentiles.get(
+                tuple(getattr(result, g) for g in groupby or []))
         return api_models.Statistics(
             unit=result.unit,
             count=int(result.count),
-            min=result.min,
-            max=result.max,
-            avg=result.avg,
-            sum=result.sum,
+            min=result.min if 'min' in aggregates else None,
+            max=result.max if 'max' in aggregates else None,
+            avg=result.avg if 'avg' in aggregates else None,
+            sum=result.sum if 'sum' in aggregates else None,
             duration_start=result.tsmin,
             duration_end=result.tsmax,
             duration=duration,
             period=period,
             period_start=period_start,
             period_end=period_end,
+            groupby=(dict((g, getattr(result, g)) for g in groupby)
+                     if groupby else None),
+            stddev=stddev,
+            percentiles=percentiles,
         )
 
-    def get_meter_statistics(self, sample_filter, period=None):
+    def get_meter_statistics(self, sample_filter, period=None, groupby=None,
+                             aggregate=None):
         """Return an iterable of api_models.Statistics instances containing
         meter statistics described by the query parameters.
 
         The filter must have a meter value set.
 
         """
-        if not period or not sample_filter.start or not sample_filter.end:
-            res = self._make_stats_query(sample_filter).all()[0]
+        if groupby:
+            for group in groupby:
+                if group.startswith('metadata.'):
+                    # like the metaquery, the metadata is not indexed
+                    raise NotImplementedError('metadata groupby not '
+                                              'implemented')
+                if group not in ['user_id', 'project_id', 'resource_id',
+                                 'source']:
+                    raise NotImplementedError(
+                        "Unable to group by field %s" % group)
+        aggregates, percentiles = base.parse_aggregates(aggregate)
 
         if not period:
-            if res.count:
-                yield self._stats_result_to_model(res, 0, res.tsmin, res.tsmax)
+            estimated = (self._estimate_percentiles(sample_filter, groupby,
+                                                    percentiles)
+                         if percentiles else None)
+            for res in self._make_stats_query(sample_filter, groupby,
+                                              aggregates):
+                if res.count:
+                    yield self._stats_result_to_model(res, 0,
+                                                      res.tsmin, res.tsmax,
+                                                      groupby, aggregates,
+                                                      estimated)
             return
 
-        query = self._make_stats_query(sample_filter)
+        if not sample_filter.start or not sample_filter.end:
+            res = self._make_stats_query(sample_filter,
+                                         aggregates=()).all()[0]
+
+        query = self._make_stats_query(sample_filter, groupby, aggregates)
         # HACK(jd) This is an awful method to compute stats by period, but
         # since we're trying to be SQL agnostic we have to write portable
         # code, so here it is, admire! We're going to do one request to get
@@ -492,15 +620,24 @@ class Connection(base.Connection):
                 period):
             q = query.filter(Meter.timestamp >= period_start)
             q = q.filter(Meter.timestamp < period_end)
-            r = q.all()[0]
+            results = [r for r in q.all() if r.count]
             # Don't return results that didn't have any data.
-            if r.count:
+            if not results:
+                continue
+            estimated = (self._estimate_percentiles(sample_filter, groupby,
+                                                    percentiles,
+                                                    period_start, period_end)
+                         if percentiles else None)
+            for r in results:
                 yield self._stats_result_to_model(
                     result=r,
                     period=int(timeutils.delta_seconds(period_start,
                                                        period_end)),
                     period_start=period_start,
                     period_end=period_end,
+                    groupby=groupby,
+                    aggregates=aggregates,
+                    percentiles=estimated,
                 )
 
     @staticmethod
@@ -535,12 +672,15 @@ class Connection(base.Connection):
         return row
 
     def get_alarms(self, name=None, user=None,
-                   project=None, enabled=True, alarm_id=None):
+                   project=None, enabled=True, alarm_id=None,
+                   updated_since=None):
         """Yields a lists of alarms that match filters
         :param user: Optional ID for user that owns the resource.
         :param project: Optional ID for project that owns the resource.
         :param enabled: Optional boolean to list disable alarm.
         :param alarm_id: Optional alarm_id to return one alarm.
+        :param updated_since: Optional datetime of the oldest update of the
+                              alarms returned.
         """
         session = sqlalchemy_session.get_session()
         query = session.query(Alarm)
@@ -554,6 +694,8 @@ class Connection(base.Connection):
             query = query.filter(Alarm.project_id == project)
         if alarm_id is not None:
             query = query.filter(Alarm.id == alarm_id)
+        if updated_since is not None:
+            query = query.filter(Alarm.timestamp >= updated_since)
 
         return (self._row_to_alarm_model(x) for x in query.all())
 
@@ -0,0 +1,110 @@
+# -*- encoding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from ceilometer import sample
+from ceilometer.openstack.common.gettextutils import _
+from ceilometer.openstack.common import log
+from ceilometer.openstack.common import timeutils
+from ceilometer import transformer
+
+LOG = log.getLogger(__name__)
+
+
+class DeltaTransformer(transformer.TransformerBase):
+    """Transformer suppressing unchanged samples on the agent side.
+
+    The last value seen for each (meter, resource) is remembered. In
+    'suppress' mode a sample whose volume and resource metadata are
+    identical to the last published one is dropped. In 'delta' mode the
+    volume is replaced by its growth since the previous sample, and
+    samples that did not grow and did not change metadata are dropped.
+
+    In both modes an unchanged sample is still published once every
+    `heartbeat` seconds, so that consumers can tell an idle resource from
+    a vanished one.
+    """
+
+    MODES = ('suppress', 'delta')
+
+    def __init__(self, mode='suppress', heartbeat=3600, **kwargs):
+        """Initialize transformer with configured parameters.
+
+        :param mode: either 'suppress' or 'delta'
+        :param heartbeat: maximum number of seconds an unchanged sample
+                          can be held back, 0 means forever
+        """
+        if mode not in self.MODES:
+            raise ValueError(_('invalid delta transformer mode: %s') % mode)
+        self.mode = mode
+        self.heartbeat = heartbeat
+        # (meter, resource) -> (volume, metadata, last published timestamp)
+        self.cache = {}
+        super(DeltaTransformer, self).__init__(**kwargs)
+
+    def _delta(self, counter, prev_volume):
+        # as for rate of change, a cumulative counter going backward is
+        # assumed to have been reset in the meantime
+        if (prev_volume <= counter.volume or
+                counter.type != sample.TYPE_CUMULATIVE):
+            volume = counter.volume - prev_volume
+        else:
+            volume = counter.volume
+        return sample.Sample(
+            name=counter.name,
+            unit=counter.unit,
+            type=sample.TYPE_DELTA,
+            volume=volume,
+            user_id=counter.user_id,
+            project_id=counter.project_id,
+            resource_id=counter.resource_id,
+            timestamp=counter.timestamp,
+            resource_metadata=counter.resource_metadata,
+            source=counter.source,
+        )
+
+    def _heartbeat_due(self, published, timestamp):
+        if not self.heartbeat:
+            return False
+        return timeutils.delta_seconds(published, timestamp) >= self.heartbeat
+
+    def handle_sample(self, context, counter):
+        """Handle a sample, dropping or differencing it if possible."""
+        key = (counter.name, counter.resource_id)
+        timestamp = timeutils.parse_isotime(counter.timestamp)
+        prev = self.cache.get(key)
+
+        if not prev:
+            self.cache[key] = (counter.volume, counter.resource_metadata,
+                               timestamp)
+            if self.mode == 'delta':
+                LOG.debug(_('dropping counter with no predecessor: %s') %
+                          (counter,))
+                return None
+            return counter
+
+        prev_volume, prev_metadata, published = prev
+        changed = (counter.volume != prev_volume or
+                   counter.resource_metadata != prev_metadata)
+
+        if not changed and not self._heartbeat_due(published, timestamp):
+            self.cache[key] = (counter.volume, counter.resource_metadata,
+                               published)
+            LOG.debug(_('suppressing unchanged counter: %s') % (counter,))
+            return None
+
+        self.cache[key] = (counter.volume, counter.resource_metadata,
+                           timestamp)
+        if self.mode == 'delta':
+            counter = self._delta(counter, prev_volume)
+        return counter
@@ -20,9 +20,13 @@
 
 """Utilities and helper functions."""
 
+import bisect
 import calendar
 import datetime
 import decimal
+import hashlib
+import heapq
+import itertools
 
 from ceilometer.openstack.common import timeutils
 
@@ -74,3 +78,77 @@ def sanitize_timestamp(timestamp):
     if not isinstance(timestamp, datetime.datetime):
         timestamp = timeutils.parse_isotime(timestamp)
     return timeutils.normalize_time(timestamp)
+
+
+class HashRing(object):
+    """Consistent hash ring mapping keys to a set of nodes.
+
+    Each node is placed on the ring several times (`replicas`) so that
+    keys are spread evenly, and adding or removing a node only moves the
+    keys that node owned.
+    """
+
+    def __init__(self, nodes, replicas=100):
+        self._ring = {}
+        self._sorted_keys = []
+        for node in nodes:
+            for r in range(replicas):
+                hashed = self._hash('%s-%s' % (node, r))
+                self._ring[hashed] = node
+                self._sorted_keys.append(hashed)
+        self._sorted_keys.sort()
+
+    @staticmethod
+    def _hash(key):
+        if isinstance(key, unicode):
+            key = key.encode('utf-8')
+        return long(hashlib.md5(str(key)).hexdigest(), 16)
+
+    def get_node(self, key):
+        """Return the node owning key, or None if the ring is empty."""
+        if not self._ring:
+            return None
+        pos = bisect.bisect(self._sorted_keys, self._hash(key))
+        pos = pos if pos < len(self._sorted_keys) else 0
+        return self._ring[self._sorted_keys[pos]]
+
+
+class LRUCache(object):
+    """Mapping keeping only its most recently used entries.
+
+    collections.OrderedDict being unavailable on Python 2.6, the entries
+    are stamped with their last use and the least recently used ones
+    evicted in bulk, a tenth of the size at once, when the size is
+    exceeded.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._entries = {}
+        self._clock = itertools.count()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        """Return the value of key, marking it as the most recently used."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        self._entries[key] = (next(self._clock), entry[1])
+        return entry[1]
+
+    def pop(self, key, default=None):
+        entry = self._entries.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def __setitem__(self, key, value):
+        self._entries[key] = (next(self._clock), value)
+        if len(self._entries) > self.size:
+            count = len(self._entries) - self.size + self.size // 10
+            for stale in heapq.nsmallest(count, self._entries,
+                                         key=lambda k: self._entries[k][0]):
+                del self._entries[stale]
@@ -21,7 +21,9 @@
 
 import abc
 import datetime
+import eventlet
 import mock
+from oslo.config import cfg
 
 from stevedore import extension
 from stevedore.tests import manager as extension_tests
@@ -245,3 +247,48 @@ class BaseAgentManagerTestCase(base.TestCase):
         self.mgr.interval_task(polling_tasks.get(10))
         pub = self.mgr.pipeline_manager.pipelines[0].publishers[0]
         self.assertEqual(len(pub.counters), 0)
+
+    def test_polling_offset(self):
+        cfg.CONF.set_override('host', 'agent-1')
+        offset = self.mgr.polling_offset(60)
+        self.assertEqual(offset, self.mgr.polling_offset(60))
+        self.assertTrue(0 <= offset < 60)
+        cfg.CONF.set_override('host', 'agent-2')
+        self.assertNotEqual(offset, self.mgr.polling_offset(60))
+
+    def test_polling_offset_disabled(self):
+        cfg.CONF.set_override('polling_stagger', False)
+        self.assertEqual(self.mgr.polling_offset(60), None)
+
+    def test_initialize_service_hook(self):
+        service = mock.MagicMock()
+        self.mgr.initialize_service_hook(service)
+        timer = service.tg.add_timer
+        self.assertEqual(timer.call_count, 1)
+        args, kwargs = timer.call_args
+        self.assertEqual(args, (60, self.mgr.scheduled_task,
+                                self.mgr.polling_offset(60)))
+        self.assertEqual(kwargs['interval'], 60)
+        self.assertEqual([p.name for p in kwargs['task'].pollsters],
+                         ['test'])
+
+    def test_scheduled_task_skips_running_cycle(self):
+        self.mgr.service = mock.MagicMock()
+        task = self.mgr.setup_polling_tasks()[60]
+        self.mgr.scheduled_task(60, task)
+        self.mgr.scheduled_task(60, task)
+        self.mgr.service.tg.add_thread.assert_called_once_with(
+            self.mgr.run_task, 60, task)
+        self.mgr.run_task(60, task)
+        self.assertEqual(self.mgr.running_tasks, set())
+        self.mgr.scheduled_task(60, task)
+        self.assertEqual(self.mgr.service.tg.add_thread.call_count, 2)
+
+    def test_run_task_max_runtime(self):
+        cfg.CONF.set_override('polling_max_runtime_ratio', 0.0001)
+        task = self.mgr.setup_polling_tasks()[60]
+        self.mgr.running_tasks.add(task)
+        with mock.patch.object(self.mgr, 'interval_task',
+                               side_effect=lambda t: eventlet.sleep(1)):
+            self.mgr.run_task(60, task)
+        self.assertEqual(self.mgr.running_tasks, set())
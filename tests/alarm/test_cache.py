@@ -0,0 +1,104 @@
+# -*- encoding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Tests for ceilometer/alarm/cache.py
+"""
+import datetime
+import mock
+
+from ceilometerclient import exc
+from oslo.config import cfg
+
+from ceilometer.alarm import cache
+from ceilometer.openstack.common import timeutils
+from ceilometer.storage import models
+from ceilometer.tests import base
+
+
+class TestAlarmCache(base.TestCase):
+
+    def setUp(self):
+        super(TestAlarmCache, self).setUp()
+        self.list_alarms = mock.Mock()
+        self.cache = cache.AlarmCache(self.list_alarms)
+        self.now = datetime.datetime(2013, 8, 20, 10, 0)
+        timeutils.set_time_override(self.now)
+        self.addCleanup(timeutils.clear_time_override)
+        patcher = mock.patch.object(cache, 'time')
+        self.time = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.time.time.return_value = 1000.0
+
+    @staticmethod
+    def _alarm(alarm_id, counter_name='cpu_util', enabled=True):
+        return models.Alarm(name=alarm_id,
+                            counter_name=counter_name,
+                            comparison_operator='gt',
+                            threshold=80.0,
+                            statistic='avg',
+                            user_id='foobar',
+                            project_id='snafu',
+                            alarm_id=alarm_id,
+                            enabled=enabled)
+
+    def _ids(self, alarms):
+        return sorted(a.alarm_id for a in alarms)
+
+    def test_first_refresh_loads_all(self):
+        self.list_alarms.return_value = [self._alarm('a'),
+                                         self._alarm('b', 'memory')]
+        self.cache.refresh()
+        self.list_alarms.assert_called_once_with()
+        self.assertEqual(self._ids(self.cache.alarms()), ['a', 'b'])
+        self.assertEqual(self._ids(self.cache.alarms('memory')), ['b'])
+        self.assertEqual(self.cache.alarms('disk'), [])
+
+    def test_incremental_refresh(self):
+        self.list_alarms.return_value = [self._alarm('a'), self._alarm('b'),
+                                         self._alarm('c')]
+        self.cache.refresh()
+        timeutils.advance_time_seconds(60)
+        self.time.time.return_value = 1060.0
+        self.list_alarms.return_value = [
+            self._alarm('a', enabled=False),
+            self._alarm('b', 'memory'),
+            self._alarm('d')]
+        self.cache.refresh()
+        self.list_alarms.assert_called_with(
+            updated_since=self.now - datetime.timedelta(seconds=60))
+        self.assertEqual(self._ids(self.cache.alarms()), ['b', 'c', 'd'])
+        self.assertEqual(self._ids(self.cache.alarms('cpu_util')), ['c', 'd'])
+        self.assertEqual(self._ids(self.cache.alarms('memory')), ['b'])
+
+    def test_disabled_never_cached(self):
+        self.list_alarms.return_value = [self._alarm('a', enabled=False)]
+        self.cache.refresh()
+        self.assertEqual(self.cache.index, {})
+
+    def test_resync_drops_deleted(self):
+        cfg.CONF.set_override('alarm_cache_resync_interval', 600,
+                              group='alarm')
+        self.list_alarms.return_value = [self._alarm('a'), self._alarm('b')]
+        self.cache.refresh()
+        self.list_alarms.return_value = [self._alarm('a')]
+        self.time.time.return_value = 1600.0
+        self.cache.refresh()
+        self.list_alarms.assert_called_with()
+        self.assertEqual(self._ids(self.cache.alarms()), ['a'])
+
+    def test_failed_refresh_keeps_alarms(self):
+        self.list_alarms.return_value = [self._alarm('a')]
+        self.cache.refresh()
+        self.list_alarms.side_effect = exc.CommunicationError('boom')
+        self.assertRaises(exc.CommunicationError, self.cache.refresh)
+        self.assertEqual(self._ids(self.cache.alarms()), ['a'])
@@ -16,13 +16,17 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 import urlparse
+
+import eventlet
 import mock
 import requests
 
 from oslo.config import cfg
 
+from ceilometer.alarm.notifier import rest
 from ceilometer.alarm import service
 from ceilometer.openstack.common import context
+from ceilometer.openstack.common import jsonutils
 from ceilometer.tests import base
 
 
@@ -92,11 +96,14 @@ class TestAlarmNotifier(base.TestCase):
     def test_notify_alarm_rest_action_ok(self):
         action = 'http://host/action'
 
-        with mock.patch('eventlet.spawn_n', self._fake_spawn_n):
-            with mock.patch.object(requests, 'post') as poster:
+        with mock.patch.object(eventlet.GreenPool, 'spawn_n',
+                               side_effect=self._fake_spawn_n):
+            with mock.patch.object(requests.Session, 'post') as poster:
+                poster.return_value.status_code = 200
                 self.service.notify_alarm(context.get_admin_context(),
                                           self._notification(action))
-                poster.assert_called_with(action, data=DATA_JSON)
+                poster.assert_called_with(action, data=DATA_JSON,
+                                          timeout=10.0)
 
     def test_notify_alarm_rest_action_with_ssl_client_cert(self):
         action = 'https://host/action'
@@ -105,11 +112,14 @@ class TestAlarmNotifier(base.TestCase):
         cfg.CONF.set_override("rest_notifier_certificate_file", certificate,
                               group='alarm')
 
-        with mock.patch('eventlet.spawn_n', self._fake_spawn_n):
-            with mock.patch.object(requests, 'post') as poster:
+        with mock.patch.object(eventlet.GreenPool, 'spawn_n',
+                               side_effect=self._fake_spawn_n):
+            with mock.patch.object(requests.Session, 'post') as poster:
+                poster.return_value.status_code = 200
                 self.service.notify_alarm(context.get_admin_context(),
                                           self._notification(action))
                 poster.assert_called_with(action, data=DATA_JSON,
+                                          timeout=10.0,
                                           cert=certificate, verify=True)
 
     def test_notify_alarm_rest_action_with_ssl_client_cert_and_key(self):
@@ -122,11 +132,14 @@ class TestAlarmNotifier(base.TestCase):
         cfg.CONF.set_override("rest_notifier_certificate_key", key,
                               group='alarm')
 
-        with mock.patch('eventlet.spawn_n', self._fake_spawn_n):
-            with mock.patch.object(requests, 'post') as poster:
+        with mock.patch.object(eventlet.GreenPool, 'spawn_n',
+                               side_effect=self._fake_spawn_n):
+            with mock.patch.object(requests.Session, 'post') as poster:
+                poster.return_value.status_code = 200
                 self.service.notify_alarm(context.get_admin_context(),
                                           self._notification(action))
                 poster.assert_called_with(action, data=DATA_JSON,
+                                          timeout=10.0,
                                           cert=(certificate, key), verify=True)
 
     def test_notify_alarm_rest_action_with_ssl_verify_disable_by_cfg(self):
@@ -135,21 +148,27 @@ class TestAlarmNotifier(base.TestCase):
         cfg.CONF.set_override("rest_notifier_ssl_verify", False,
                               group='alarm')
 
-        with mock.patch('eventlet.spawn_n', self._fake_spawn_n):
-            with mock.patch.object(requests, 'post') as poster:
+        with mock.patch.object(eventlet.GreenPool, 'spawn_n',
+                               side_effect=self._fake_spawn_n):
+            with mock.patch.object(requests.Session, 'post') as poster:
+                poster.return_value.status_code = 200
                 self.service.notify_alarm(context.get_admin_context(),
                                           self._notification(action))
                 poster.assert_called_with(action, data=DATA_JSON,
+                                          timeout=10.0,
                                           verify=False)
 
     def test_notify_alarm_rest_action_with_ssl_verify_disable(self):
         action = 'https://host/action?ceilometer-alarm-ssl-verify=0'
 
-        with mock.patch('eventlet.spawn_n', self._fake_spawn_n):
-            with mock.patch.object(requests, 'post') as poster:
+        with mock.patch.object(eventlet.GreenPool, 'spawn_n',
+                               side_effect=self._fake_spawn_n):
+            with mock.patch.object(requests.Session, 'post') as poster:
+                poster.return_value.status_code = 200
                 self.service.notify_alarm(context.get_admin_context(),
                                           self._notification(action))
                 poster.assert_called_with(action, data=DATA_JSON,
+                                          timeout=10.0,
                                           verify=False)
 
     def test_notify_alarm_rest_action_with_ssl_verify_enable_by_user(self):
@@ -158,13 +177,62 @@ class TestAlarmNotifier(base.TestCase):
         cfg.CONF.set_override("rest_notifier_ssl_verify", False,
                               group='alarm')
 
-        with mock.patch('eventlet.spawn_n', self._fake_spawn_n):
-            with mock.patch.object(requests, 'post') as poster:
+        with mock.patch.object(eventlet.GreenPool, 'spawn_n',
+                               side_effect=self._fake_spawn_n):
+            with mock.patch.object(requests.Session, 'post') as poster:
+                poster.return_value.status_code = 200
                 self.service.notify_alarm(context.get_admin_context(),
                                           self._notification(action))
                 poster.assert_called_with(action, data=DATA_JSON,
+                                          timeout=10.0,
                                           verify=True)
 
+    def test_notify_alarms(self):
+        alarms = [dict(alarm_id='alarm-%d' % i, previous='ok',
+                       current='alarm', reason='reason %d' % i,
+                       actions=['test://first'] + (['test://odd']
+                                                   if i % 2 else []))
+                  for i in range(3)]
+        notifier = self.service.notifiers['test'].obj
+        with mock.patch.object(notifier, 'notify_batch') as notify_batch:
+            self.service.notify_alarms(context.get_admin_context(),
+                                       {'alarms': alarms})
+        calls = notify_batch.call_args_list
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(calls[0][0][0], urlparse.urlsplit('test://first'))
+        self.assertEqual(calls[0][0][1],
+                         [('alarm-%d' % i, 'ok', 'alarm', 'reason %d' % i)
+                          for i in range(3)])
+        self.assertEqual(calls[1][0][0], urlparse.urlsplit('test://odd'))
+        self.assertEqual(calls[1][0][1],
+                         [('alarm-1', 'ok', 'alarm', 'reason 1')])
+
+    def test_notify_alarms_default_batch(self):
+        self.service.notify_alarms(context.get_admin_context(), {
+            'alarms': [dict(alarm_id='alarm-%d' % i, previous='ok',
+                            current='alarm', reason='why', actions=['test://'])
+                       for i in range(2)]})
+        notifications = self.service.notifiers['test'].obj.notifications
+        self.assertEqual([n[1] for n in notifications], ['alarm-0', 'alarm-1'])
+
+    def test_notify_alarms_rest_action(self):
+        action = 'http://host/action'
+        alarms = [dict(NOTIFICATION, actions=[action]),
+                  dict(NOTIFICATION, actions=[action], alarm_id='other')]
+        with mock.patch.object(eventlet.GreenPool, 'spawn_n',
+                               side_effect=self._fake_spawn_n):
+            with mock.patch.object(requests.Session, 'post') as poster:
+                poster.return_value.status_code = 200
+                self.service.notify_alarms(context.get_admin_context(),
+                                           {'alarms': alarms})
+                self.assertEqual(poster.call_count, 1)
+                args, kwargs = poster.call_args
+                self.assertEqual(args, (action,))
+                body = jsonutils.loads(kwargs['data'])
+                self.assertEqual([a['alarm_id'] for a in body['alarms']],
+                                 ['foobar', 'other'])
+                self.assertEqual(body['alarms'][0]['reason'], 'what ?')
+
     @staticmethod
     def _fake_urlsplit(*args, **kwargs):
         raise Exception("Evil urlsplit!")
@@ -194,3 +262,75 @@ class TestAlarmNotifier(base.TestCase):
                     'condition': {'threshold': 42},
                 })
             self.assertTrue(LOG.error.called)
+
+
+class TestRestAlarmNotifier(base.TestCase):
+
+    def setUp(self):
+        super(TestRestAlarmNotifier, self).setUp()
+        self.notifier = rest.RestAlarmNotifier()
+        self.notifier.session = mock.Mock()
+        self.notifier.session.post.return_value.status_code = 200
+        self.notifier.pool = mock.Mock()
+        self.notifier.pool.free.return_value = 1
+        self.notifier.pool.spawn_n.side_effect = (
+            lambda f, *args, **kwargs: f(*args, **kwargs))
+        self.action = urlparse.urlsplit('http://host/action')
+        patcher = mock.patch('eventlet.sleep')
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _notify(self):
+        self.notifier.notify(self.action, 'foobar', 'OK', 'ALARM', 'what ?')
+
+    def test_session_pools_connections(self):
+        notifier = rest.RestAlarmNotifier()
+        adapter = notifier.session.get_adapter('https://host/action')
+        self.assertEqual(adapter._pool_maxsize, 10)
+
+    def test_succeeded(self):
+        self._notify()
+        self.assertEqual(self.notifier.succeeded, 1)
+        self.assertEqual(self.notifier.failed, 0)
+        self.assertEqual(self.notifier.in_flight, 0)
+
+    def test_retry_with_backoff(self):
+        ok = mock.Mock(status_code=200)
+        self.notifier.session.post.side_effect = [
+            requests.exceptions.ConnectionError(),
+            mock.Mock(status_code=503),
+            ok]
+        self._notify()
+        self.assertEqual(self.notifier.session.post.call_count, 3)
+        self.assertEqual(self.sleep.call_args_list,
+                         [mock.call(1.0), mock.call(2.0)])
+        self.assertEqual(self.notifier.succeeded, 1)
+
+    def test_failed_after_retries(self):
+        self.notifier.session.post.side_effect = requests.exceptions.Timeout()
+        self._notify()
+        self.assertEqual(self.notifier.session.post.call_count, 4)
+        self.assertEqual(self.notifier.failed, 1)
+        self.assertEqual(self.notifier.in_flight, 0)
+
+    def test_client_error_not_retried(self):
+        self.notifier.session.post.return_value.status_code = 404
+        self._notify()
+        self.assertEqual(self.notifier.session.post.call_count, 1)
+        self.assertEqual(self.notifier.failed, 1)
+
+    def test_queued_then_dropped(self):
+        cfg.CONF.set_override('rest_notifier_queue_size', 2, group='alarm')
+        self.notifier.pool.free.return_value = 0
+        for i in range(3):
+            self._notify()
+        self.assertFalse(self.notifier.session.post.called)
+        self.assertEqual(len(self.notifier.pending), 2)
+        self.assertEqual(self.notifier.dropped, 1)
+
+        # a worker sends the notifications queued after its own
+        self.notifier.pool.free.return_value = 1
+        self._notify()
+        self.assertEqual(self.notifier.session.post.call_count, 3)
+        self.assertEqual(len(self.notifier.pending), 0)
+        self.assertEqual(self.notifier.succeeded, 3)
@@ -0,0 +1,137 @@
+# -*- encoding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Tests for ceilometer/alarm/partition.py
+"""
+import mock
+
+from ceilometer.alarm import partition
+from ceilometer.tests import base
+
+
+class FakeAlarm(object):
+    def __init__(self, alarm_id):
+        self.alarm_id = alarm_id
+
+
+class TestRPCMembership(base.TestCase):
+
+    def setUp(self):
+        super(TestRPCMembership, self).setUp()
+        patcher = mock.patch.object(partition.rpc_alarm,
+                                    'RPCAlarmPartitionCoordination')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.backend = partition.RPCMembership()
+
+    def test_heartbeat(self):
+        self.backend.heartbeat('evaluator-1')
+        self.backend.rpc.presence.assert_called_once_with('evaluator-1')
+        self.backend.record_presence('evaluator-2')
+        self.assertEqual(sorted(self.backend.get_members(30)),
+                         ['evaluator-1', 'evaluator-2'])
+
+    def test_expired_member(self):
+        with mock.patch.object(partition, 'time') as fake_time:
+            fake_time.time.return_value = 100.0
+            self.backend.record_presence('evaluator-1')
+            fake_time.time.return_value = 140.0
+            self.backend.record_presence('evaluator-2')
+            self.assertEqual(self.backend.get_members(30), ['evaluator-2'])
+
+    def test_leave(self):
+        self.backend.record_presence('evaluator-2')
+        self.backend.record_presence('evaluator-2', leaving=True)
+        self.backend.heartbeat('evaluator-1')
+        self.backend.leave('evaluator-1')
+        self.backend.rpc.presence.assert_called_with('evaluator-1',
+                                                     leaving=True)
+        self.assertEqual(self.backend.get_members(30), [])
+
+
+class TestAlarmPartitionCoordinator(base.TestCase):
+
+    def setUp(self):
+        super(TestAlarmPartitionCoordinator, self).setUp()
+        self.backend = mock.Mock()
+        self.backend.get_members.return_value = []
+        self.alarms = [FakeAlarm('alarm-%d' % i) for i in range(100)]
+        patcher = mock.patch.object(partition, 'time')
+        self.time = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.time.time.return_value = 1000.0
+
+    def _coordinator(self, member_id):
+        return partition.AlarmPartitionCoordinator(self.backend, member_id,
+                                                   30, 20)
+
+    def test_new_member_waits(self):
+        coordinator = self._coordinator('evaluator-1')
+        coordinator.heartbeat()
+        self.assertEqual(coordinator.assigned_alarms(self.alarms), [])
+        self.time.time.return_value = 1020.0
+        self.assertEqual(coordinator.assigned_alarms(self.alarms),
+                         self.alarms)
+
+    def test_split(self):
+        coordinators = [self._coordinator('evaluator-%d' % i)
+                        for i in range(3)]
+        self.backend.get_members.return_value = [c.member_id
+                                                 for c in coordinators]
+        for c in coordinators:
+            c.heartbeat()
+        self.time.time.return_value = 1020.0
+        assigned = [c.assigned_alarms(self.alarms) for c in coordinators]
+        self.assertEqual(sorted(a.alarm_id for subset in assigned
+                                for a in subset),
+                         sorted(a.alarm_id for a in self.alarms))
+        for subset in assigned:
+            self.assertTrue(0 < len(subset) < len(self.alarms))
+
+    def test_no_double_evaluation_on_handoff(self):
+        old = self._coordinator('evaluator-1')
+        self.time.time.return_value = 1020.0
+        self.assertEqual(old.assigned_alarms(self.alarms), self.alarms)
+
+        # a new member joins, the old one sees it first
+        self.backend.get_members.return_value = ['evaluator-1',
+                                                 'evaluator-2']
+        new = self._coordinator('evaluator-2')
+        new.heartbeat()
+        old.heartbeat()
+        self.assertTrue(old.rebalancing)
+        kept = old.assigned_alarms(self.alarms)
+        self.assertEqual(kept,
+                         [a for a in self.alarms
+                          if old.ring.get_node(a.alarm_id) == 'evaluator-1'])
+        self.assertEqual(new.assigned_alarms(self.alarms), [])
+
+        # once the grace period is over, the alarms moved are evaluated
+        # by the new member
+        self.time.time.return_value = 1040.0
+        self.assertEqual(old.assigned_alarms(self.alarms), kept)
+        moved = new.assigned_alarms(self.alarms)
+        self.assertEqual(len(kept) + len(moved), len(self.alarms))
+
+    def test_successive_changes_hand_off_from_first_ring(self):
+        coordinator = self._coordinator('evaluator-1')
+        self.time.time.return_value = 1020.0
+        first_ring = coordinator.ring
+        self.backend.get_members.return_value = ['evaluator-2']
+        coordinator.heartbeat()
+        self.time.time.return_value = 1030.0
+        self.backend.get_members.return_value = ['evaluator-2',
+                                                 'evaluator-3']
+        coordinator.heartbeat()
+        self.assertIs(coordinator.previous_ring, first_ring)
+        self.assertEqual(coordinator.rebalanced_at, 1030.0)
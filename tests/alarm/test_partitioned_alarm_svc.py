@@ -0,0 +1,87 @@
+# -*- encoding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Tests for the PartitionedAlarmService of ceilometer/alarm/service.py
+"""
+import mock
+
+from oslo.config import cfg
+from stevedore import extension
+from stevedore.tests import manager as extension_tests
+
+from ceilometer.alarm import service
+from ceilometer.tests import base
+
+
+class TestPartitionedAlarmService(base.TestCase):
+    def setUp(self):
+        super(TestPartitionedAlarmService, self).setUp()
+        cfg.CONF.set_override('evaluation_backend', 'storage', group='alarm')
+        self.threshold_eval = mock.Mock()
+        self.extension_mgr = extension_tests.TestExtensionManager(
+            [
+                extension.Extension(
+                    'threshold_eval_storage',
+                    None,
+                    None,
+                    self.threshold_eval, ),
+            ])
+        patcher = mock.patch('ceilometer.alarm.rpc.'
+                             'RPCAlarmPartitionCoordination')
+        self.rpc = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.partitioned = service.PartitionedAlarmService()
+        self.partitioned.tg = mock.Mock()
+        self.partitioned.tg.add_thread.side_effect = (
+            lambda f, *args, **kwargs: f(*args, **kwargs))
+        self.partitioned.extension_manager = self.extension_mgr
+        self.coordinator = self.partitioned.coordinator
+
+    def test_start(self):
+        with mock.patch('ceilometer.openstack.common.rpc.'
+                        'create_connection') as create_connection:
+            self.partitioned.start()
+        conn = create_connection.return_value
+        conn.create_consumer.assert_any_call(
+            cfg.CONF.alarm.partition_rpc_topic, mock.ANY, fanout=True)
+        self.partitioned.tg.add_timer.assert_any_call(
+            60, self.partitioned._evaluate_all_alarms, 0,
+            self.threshold_eval)
+        self.partitioned.tg.add_timer.assert_any_call(
+            10, self.coordinator.heartbeat)
+
+    def test_presence(self):
+        self.partitioned.presence(None, {'member_id': 'other.42',
+                                         'leaving': False})
+        self.assertEqual(self.partitioned.membership.get_members(30),
+                         ['other.42'])
+        self.partitioned.presence(None, {'member_id': 'other.42',
+                                         'leaving': True})
+        self.assertEqual(self.partitioned.membership.get_members(30), [])
+
+    def test_evaluation_cycle_assigned_alarms(self):
+        alarms = [mock.Mock(alarm_id='alarm-%d' % i) for i in range(10)]
+        self.threshold_eval.list_alarms.return_value = alarms
+        with mock.patch.object(self.coordinator, 'assigned_alarms',
+                               return_value=alarms[:3]) as assigned:
+            self.partitioned._evaluate_all_alarms(self.threshold_eval)
+        self.assertEqual(sorted(assigned.call_args[0][0]),
+                         sorted(alarms))
+        self.threshold_eval.assign_alarms.assert_called_once_with(alarms[:3])
+        self.threshold_eval.evaluate.assert_called_once_with()
+
+    def test_stop_leaves_group(self):
+        self.partitioned.conn = mock.Mock()
+        self.partitioned.stop()
+        self.rpc.presence.assert_called_once_with(
+            self.coordinator.member_id, leaving=True)
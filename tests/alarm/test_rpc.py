@@ -91,3 +91,44 @@ class TestRPCAlarmNotifier(base.TestCase):
                              self.alarms[i].state)
             self.assertEqual(self.notified[i][1]["args"]["data"]["reason"],
                              "what? %d" % i)
+
+    def test_notify_alarm_batching(self):
+        cfg.CONF.set_override('notification_batching', True, group='alarm')
+        self.notifier.flush()
+        self.assertEqual(self.notified, [])
+        for a in self.alarms:
+            self.notifier.notify(a, 'ok', 'why not?')
+        self.assertEqual(self.notified, [])
+        self.notifier.flush()
+        self.notifier.flush()
+        self.assertEqual(len(self.notified), 1)
+        topic, msg = self.notified[0]
+        self.assertEqual(topic, cfg.CONF.alarm.notifier_rpc_topic)
+        self.assertEqual(msg['method'], 'notify_alarms')
+        alarms = msg['args']['data']['alarms']
+        self.assertEqual([n['alarm_id'] for n in alarms],
+                         [a.alarm_id for a in self.alarms])
+        self.assertEqual(alarms[1]['actions'],
+                         ['http://other_host/path'])
+
+
+class TestRPCAlarmPartitionCoordination(base.TestCase):
+    def faux_fanout_cast(self, context, topic, msg):
+        self.notified.append((topic, msg))
+
+    def setUp(self):
+        super(TestRPCAlarmPartitionCoordination, self).setUp()
+        self.notified = []
+        self.stubs.Set(rpc, 'fanout_cast', self.faux_fanout_cast)
+        self.coordination = rpc_alarm.RPCAlarmPartitionCoordination()
+
+    def test_presence(self):
+        self.coordination.presence('host.42')
+        self.coordination.presence('host.42', leaving=True)
+        self.assertEqual(len(self.notified), 2)
+        topic, msg = self.notified[0]
+        self.assertEqual(topic, cfg.CONF.alarm.partition_rpc_topic)
+        self.assertEqual(msg['method'], 'presence')
+        self.assertEqual(msg['args']['data'],
+                         {'member_id': 'host.42', 'leaving': False})
+        self.assertTrue(self.notified[1][1]['args']['data']['leaving'])
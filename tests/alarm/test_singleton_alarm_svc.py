@@ -20,6 +20,7 @@
 import mock
 import uuid
 
+from oslo.config import cfg
 from stevedore import extension
 from stevedore.tests import manager as extension_tests
 
@@ -40,25 +41,23 @@ class TestSingletonAlarmService(base.TestCase):
                     None,
                     self.threshold_eval, ),
             ])
-        self.api_client = mock.MagicMock()
         self.singleton = service.SingletonAlarmService()
         self.singleton.tg = mock.Mock()
+        self.singleton.tg.add_thread.side_effect = (
+            lambda f, *args, **kwargs: f(*args, **kwargs))
         self.singleton.extension_manager = self.extension_mgr
 
     def test_start(self):
-        with mock.patch('ceilometerclient.client.get_client',
-                        return_value=self.api_client):
-            self.singleton.start()
-            expected = [
-                mock.call(60,
-                          self.singleton._evaluate_all_alarms,
-                          0,
-                          self.threshold_eval,
-                          self.api_client),
-                mock.call(604800, mock.ANY),
-            ]
-            actual = self.singleton.tg.add_timer.call_args_list
-            self.assertEqual(actual, expected)
+        self.singleton.start()
+        expected = [
+            mock.call(60,
+                      self.singleton._evaluate_all_alarms,
+                      0,
+                      self.threshold_eval),
+            mock.call(604800, mock.ANY),
+        ]
+        actual = self.singleton.tg.add_timer.call_args_list
+        self.assertEqual(actual, expected)
 
     def test_evaluation_cycle(self):
         alarms = [
@@ -73,13 +72,56 @@ class TestSingletonAlarmService(base.TestCase):
                          period=60,
                          alarm_id=str(uuid.uuid4())),
         ]
-        self.api_client.alarms.list.return_value = alarms
-        with mock.patch('ceilometerclient.client.get_client',
-                        return_value=self.api_client):
-            self.singleton.start()
-            self.singleton._evaluate_all_alarms(
-                self.threshold_eval,
-                self.api_client
-            )
-            self.threshold_eval.assign_alarms.assert_called_once_with(alarms)
-            self.threshold_eval.evaluate.assert_called_once_with()
+        self.threshold_eval.list_alarms.return_value = alarms
+        self.singleton.start()
+        self.singleton._evaluate_all_alarms(self.threshold_eval)
+        self.threshold_eval.assign_alarms.assert_called_once_with(alarms)
+        self.threshold_eval.evaluate.assert_called_once_with()
+        self.assertFalse(self.singleton.evaluating)
+        self.assertIsNotNone(self.singleton.cycle_duration)
+        self.assertEqual(self.singleton.cycle_lag, 0.0)
+
+    def test_evaluation_cycle_skipped_when_running(self):
+        self.singleton.evaluating = True
+        self.singleton._evaluate_all_alarms(self.threshold_eval)
+        self.assertFalse(self.singleton.tg.add_thread.called)
+        self.assertFalse(self.threshold_eval.evaluate.called)
+        self.assertEqual(self.singleton.skipped_cycles, 1)
+
+    def test_evaluation_cycle_lag(self):
+        self.threshold_eval.evaluate.side_effect = Exception('boom')
+        with mock.patch.object(service, 'time') as fake_time:
+            fake_time.time.side_effect = [0.0, 75.0]
+            self.singleton._evaluate_all_alarms(self.threshold_eval)
+        self.assertFalse(self.singleton.evaluating)
+        self.assertEqual(self.singleton.cycle_duration, 75.0)
+        self.assertEqual(self.singleton.cycle_lag, 15.0)
+
+    def test_start_storage_backend(self):
+        cfg.CONF.set_override('evaluation_backend', 'storage', group='alarm')
+        storage_eval = mock.Mock()
+        self.extension_mgr.extensions.append(
+            extension.Extension('threshold_eval_storage', None, None,
+                                storage_eval))
+        self.singleton.start()
+        self.singleton.tg.add_timer.assert_any_call(
+            60, self.singleton._evaluate_all_alarms, 0, storage_eval)
+
+    def test_evaluation_cycle_storage_backend(self):
+        alarms = [mock.Mock()]
+        self.threshold_eval.list_alarms.return_value = alarms
+        self.singleton._evaluate_all_alarms(self.threshold_eval)
+        self.threshold_eval.assign_alarms.assert_called_once_with(alarms)
+        self.threshold_eval.evaluate.assert_called_once_with()
+
+    def test_evaluation_cycle_incremental(self):
+        alarms = [mock.Mock(enabled=True, alarm_id='a', counter_name='cpu')]
+        self.threshold_eval.list_alarms.return_value = alarms
+        self.singleton._evaluate_all_alarms(self.threshold_eval)
+        self.threshold_eval.list_alarms.return_value = [
+            mock.Mock(enabled=False, alarm_id='a', counter_name='cpu')]
+        self.singleton._evaluate_all_alarms(self.threshold_eval)
+        args, kwargs = self.threshold_eval.list_alarms.call_args
+        self.assertIsNotNone(kwargs['updated_since'])
+        self.assertEqual(self.threshold_eval.assign_alarms.call_args_list,
+                         [mock.call(alarms), mock.call([])])
@@ -0,0 +1,170 @@
+# -*- encoding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Tests for ceilometer/alarm/storage_evaluation.py
+"""
+import datetime
+import mock
+import uuid
+
+from oslo.config import cfg
+
+from ceilometer.alarm import storage_evaluation
+from ceilometer.storage import models
+from ceilometer.tests import base
+
+
+class TestStorageEvaluate(base.TestCase):
+    def setUp(self):
+        super(TestStorageEvaluate, self).setUp()
+        self.storage_conn = mock.Mock()
+        self.notifier = mock.MagicMock()
+        self.alarm = models.Alarm(name='instance_running_hot',
+                                  counter_name='cpu_util',
+                                  comparison_operator='gt',
+                                  threshold=80.0,
+                                  evaluation_periods=2,
+                                  statistic='avg',
+                                  user_id='foobar',
+                                  project_id='snafu',
+                                  period=60,
+                                  alarm_id=str(uuid.uuid4()),
+                                  matching_metadata={'resource_id':
+                                                     'my_instance'})
+        self.evaluator = storage_evaluation.Evaluator(self.notifier)
+        self.evaluator.assign_alarms([self.alarm])
+        patcher = mock.patch('ceilometer.storage.get_connection',
+                             return_value=self.storage_conn)
+        self.get_connection = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def _get_stat(value, groupby=None):
+        return models.Statistics(unit='%', min=value, max=value, avg=value,
+                                 sum=value, count=1, period=60,
+                                 period_start=None, period_end=None,
+                                 duration=0, duration_start=None,
+                                 duration_end=None, groupby=groupby)
+
+    def test_sample_filter(self):
+        f = self.evaluator._sample_filter('cpu_util', [
+            dict(field='resource_id', op='eq', value='my_instance'),
+            dict(field='metadata.user_metadata.AS', op='eq',
+                 value='my_group'),
+            dict(field='timestamp', op='le', value='2013-08-20T10:00:00'),
+            dict(field='timestamp', op='ge', value='2013-08-20T09:57:00'),
+        ])
+        self.assertEqual(f.meter, 'cpu_util')
+        self.assertEqual(f.resource, 'my_instance')
+        self.assertEqual(f.metaquery,
+                         {'metadata.user_metadata.AS': 'my_group'})
+        self.assertEqual(f.start, datetime.datetime(2013, 8, 20, 9, 57))
+        self.assertEqual(f.start_timestamp_op, 'ge')
+        self.assertEqual(f.end, datetime.datetime(2013, 8, 20, 10, 0))
+        self.assertEqual(f.end_timestamp_op, 'le')
+
+    def test_alarm_trip(self):
+        self.alarm.state = 'ok'
+        self.storage_conn.get_meter_statistics.return_value = iter(
+            [self._get_stat(90.0), self._get_stat(95.0)])
+        self.evaluator.evaluate()
+        self.assertEqual(self.alarm.state, 'alarm')
+        args, kwargs = self.storage_conn.get_meter_statistics.call_args
+        self.assertEqual(args[0].resource, 'my_instance')
+        self.assertEqual(kwargs, {'period': 60, 'groupby': None,
+                                  'aggregate': ['avg']})
+        updated = self.storage_conn.update_alarm.call_args[0][0]
+        self.assertEqual(updated.alarm_id, self.alarm.alarm_id)
+        self.assertEqual(updated.state, 'alarm')
+        self.assertIsNotNone(updated.state_timestamp)
+        self.assertEqual(updated.timestamp, updated.state_timestamp)
+        self.assertEqual(self.notifier.notify.call_count, 1)
+
+    def test_connection_reused(self):
+        self.storage_conn.get_meter_statistics.return_value = []
+        self.storage_conn.get_alarms.return_value = []
+        self.evaluator.evaluate()
+        self.evaluator.evaluate()
+        self.evaluator.list_alarms()
+        self.assertEqual(self.get_connection.call_count, 1)
+
+    def test_no_keystone_authentication(self):
+        self.storage_conn.get_meter_statistics.return_value = []
+        with mock.patch('ceilometer.keystone_client.get_client') as keystone:
+            self.evaluator.evaluate()
+            self.assertFalse(keystone.called)
+
+    def test_list_alarms(self):
+        self.storage_conn.get_alarms.return_value = iter([self.alarm])
+        self.assertEqual(self.evaluator.list_alarms(), [self.alarm])
+        self.storage_conn.get_alarms.assert_called_once_with(enabled=True)
+
+    def test_list_alarms_updated_since(self):
+        since = datetime.datetime(2013, 8, 20)
+        self.storage_conn.get_alarms.return_value = iter([self.alarm])
+        self.assertEqual(self.evaluator.list_alarms(updated_since=since),
+                         [self.alarm])
+        self.storage_conn.get_alarms.assert_called_once_with(
+            enabled=None, updated_since=since)
+
+    def _batched_alarms(self):
+        alarms = []
+        for resource_id in ['other_instance', 'my_instance']:
+            alarms.append(models.Alarm(name='instance_running_hot',
+                                       counter_name='cpu_util',
+                                       comparison_operator='gt',
+                                       threshold=80.0,
+                                       evaluation_periods=2,
+                                       statistic='avg',
+                                       user_id='foobar',
+                                       project_id='snafu',
+                                       period=60,
+                                       alarm_id=str(uuid.uuid4()),
+                                       matching_metadata={'resource_id':
+                                                          resource_id}))
+            alarms[-1].state = 'ok'
+        return alarms
+
+    def test_batched_statistics(self):
+        alarms = self._batched_alarms()
+        self.evaluator.assign_alarms(alarms)
+        grouped = [self._get_stat(90.0, {'resource_id': 'my_instance'})
+                   for i in range(2)]
+        self.storage_conn.get_meter_statistics.return_value = iter(grouped)
+        self.evaluator.evaluate()
+        self.assertEqual(alarms[0].state, 'insufficient data')
+        self.assertEqual(alarms[1].state, 'alarm')
+        self.assertEqual(self.storage_conn.get_meter_statistics.call_count, 1)
+        args, kwargs = self.storage_conn.get_meter_statistics.call_args
+        # only the resources of the alarms are queried
+        self.assertEqual(args[0].resource, ['my_instance', 'other_instance'])
+        self.assertEqual(kwargs, {'period': 60, 'groupby': ['resource_id'],
+                                  'aggregate': ['avg']})
+
+    def test_batching_disabled(self):
+        cfg.CONF.set_override('evaluation_batching', False, group='alarm')
+        self.evaluator.assign_alarms(self._batched_alarms())
+        self.storage_conn.get_meter_statistics.return_value = []
+        self.evaluator.evaluate()
+        self.assertEqual(self.storage_conn.get_meter_statistics.call_count, 2)
+        for args, kwargs in (
+                self.storage_conn.get_meter_statistics.call_args_list):
+            self.assertEqual(kwargs['groupby'], None)
+
+    def test_batched_statistics_failure(self):
+        alarms = self._batched_alarms()
+        self.evaluator.assign_alarms(alarms)
+        self.storage_conn.get_meter_statistics.side_effect = Exception('boom')
+        self.evaluator.evaluate()
+        for alarm in alarms:
+            self.assertEqual(alarm.state, 'insufficient data')
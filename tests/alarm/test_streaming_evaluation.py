@@ -0,0 +1,148 @@
+# -*- encoding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Tests for ceilometer/alarm/streaming_evaluation.py
+"""
+import datetime
+import mock
+import uuid
+
+from ceilometer.alarm import streaming_evaluation
+from ceilometer.storage import models
+from ceilometer.tests import base
+
+
+class TestStreamingEvaluate(base.TestCase):
+    def setUp(self):
+        super(TestStreamingEvaluate, self).setUp()
+        self.storage_conn = mock.Mock()
+        self.notifier = mock.MagicMock()
+        self.alarms = [
+            models.Alarm(name='instance_running_hot',
+                         counter_name='cpu_util',
+                         comparison_operator='gt',
+                         threshold=80.0,
+                         evaluation_periods=2,
+                         statistic='avg',
+                         user_id='foobar',
+                         project_id='snafu',
+                         period=60,
+                         state='ok',
+                         alarm_id=str(uuid.uuid4()),
+                         matching_metadata={'resource_id':
+                                            'my_instance'}),
+            models.Alarm(name='group_running_idle',
+                         counter_name='cpu_util',
+                         comparison_operator='le',
+                         threshold=10.0,
+                         evaluation_periods=1,
+                         statistic='max',
+                         user_id='foobar',
+                         project_id='snafu',
+                         period=300,
+                         state='ok',
+                         alarm_id=str(uuid.uuid4()),
+                         matching_metadata={'metadata.user_metadata.AS':
+                                            'my_group'}),
+        ]
+        self.evaluator = streaming_evaluation.Evaluator(self.notifier)
+        self.evaluator.assign_alarms(self.alarms)
+        patcher = mock.patch('ceilometer.storage.get_connection',
+                             return_value=self.storage_conn)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def _sample(volume, minute, resource_id='my_instance', group=None,
+                counter_name='cpu_util'):
+        return {'counter_name': counter_name,
+                'counter_volume': volume,
+                'counter_unit': '%',
+                'resource_id': resource_id,
+                'user_id': 'foobar',
+                'project_id': 'snafu',
+                'timestamp': '2013-08-20T10:%02d:30' % minute,
+                'resource_metadata': {'user_metadata': {'AS': group}}}
+
+    def test_index(self):
+        self.assertEqual(self.evaluator.index, {'cpu_util': self.alarms})
+
+    def test_alarm_trip(self):
+        self.evaluator.record_sample(self._sample(90.0, 0))
+        self.assertEqual(self.alarms[0].state, 'ok')
+        self.evaluator.record_sample(self._sample(95.0, 1))
+        self.assertEqual(self.alarms[0].state, 'alarm')
+        self.assertEqual(self.alarms[1].state, 'ok')
+        self.assertEqual(self.notifier.notify.call_count, 1)
+        updated = self.storage_conn.update_alarm.call_args[0][0]
+        self.assertEqual(updated.alarm_id, self.alarms[0].alarm_id)
+        self.assertEqual(updated.state, 'alarm')
+
+    def test_no_repeated_notification(self):
+        for minute in range(5):
+            self.evaluator.record_sample(self._sample(90.0, minute))
+        self.assertEqual(self.notifier.notify.call_count, 1)
+
+    def test_sliding_window(self):
+        self.evaluator.record_sample(self._sample(90.0, 0))
+        self.evaluator.record_sample(self._sample(10.0, 1))
+        self.evaluator.record_sample(self._sample(95.0, 2))
+        self.assertEqual(self.alarms[0].state, 'ok')
+        self.evaluator.record_sample(self._sample(70.0, 2))
+        self.evaluator.record_sample(self._sample(95.0, 3))
+        self.assertEqual(self.alarms[0].state, 'alarm')
+        window = self.evaluator.windows[self.alarms[0].alarm_id]
+        stats = window.statistics('%')
+        self.assertEqual([s.avg for s in stats], [82.5, 95.0])
+        self.assertEqual(stats[0].period_start,
+                         datetime.datetime(2013, 8, 20, 10, 2))
+
+    def test_late_sample_ignored(self):
+        self.evaluator.record_sample(self._sample(10.0, 5))
+        self.evaluator.record_sample(self._sample(10.0, 6))
+        self.evaluator.record_sample(self._sample(95.0, 1))
+        window = self.evaluator.windows[self.alarms[0].alarm_id]
+        self.assertEqual(len(window.buckets), 2)
+        self.assertEqual([s.max for s in window.statistics('%')],
+                         [10.0, 10.0])
+
+    def test_metadata_match(self):
+        self.evaluator.record_sample(self._sample(5.0, 0, 'other',
+                                                  group='other_group'))
+        self.assertEqual(self.alarms[1].state, 'ok')
+        self.evaluator.record_sample(self._sample(5.0, 0, 'other',
+                                                  group='my_group'))
+        self.assertEqual(self.alarms[1].state, 'alarm')
+        self.assertEqual(self.alarms[0].state, 'ok')
+
+    def test_other_meter_ignored(self):
+        self.evaluator.record_sample(self._sample(95.0, 0,
+                                                  counter_name='memory'))
+        self.assertEqual(self.evaluator.windows[
+            self.alarms[0].alarm_id].buckets, {})
+
+    def test_windows_kept_on_reassign(self):
+        self.evaluator.record_sample(self._sample(90.0, 0))
+        window = self.evaluator.windows[self.alarms[0].alarm_id]
+        self.evaluator.assign_alarms(self.alarms)
+        self.assertIs(self.evaluator.windows[self.alarms[0].alarm_id], window)
+        self.alarms[0].period = 120
+        self.evaluator.assign_alarms(self.alarms)
+        self.assertIsNot(self.evaluator.windows[self.alarms[0].alarm_id],
+                         window)
+
+    def test_disabled_alarm_not_indexed(self):
+        self.alarms[1].enabled = False
+        self.evaluator.assign_alarms(self.alarms)
+        self.assertEqual(self.evaluator.index, {'cpu_util': self.alarms[:1]})
+        self.assertNotIn(self.alarms[1].alarm_id, self.evaluator.windows)
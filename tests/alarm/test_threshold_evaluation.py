@@ -17,9 +17,13 @@
 # under the License.
 """Tests for ceilometer/alarm/threshold_evaluation.py
 """
+import datetime
+import eventlet
 import mock
 import uuid
 
+from oslo.config import cfg
+
 from ceilometer.alarm import threshold_evaluation
 from ceilometer.storage import models
 from ceilometer.tests import base
@@ -60,6 +64,13 @@ class TestEvaluate(base.TestCase):
         ]
         self.evaluator = threshold_evaluation.Evaluator(self.notifier)
         self.evaluator.assign_alarms(self.alarms)
+        self.keystone = mock.Mock()
+        self.keystone.auth_token = 'token'
+        self.keystone.url_for.return_value = 'http://localhost:8777'
+        patcher = mock.patch('ceilometer.keystone_client.get_client',
+                             return_value=self.keystone)
+        patcher.start()
+        self.addCleanup(patcher.stop)
 
     @staticmethod
     def _get_stat(attr, value):
@@ -149,6 +160,7 @@ class TestEvaluate(base.TestCase):
             expected = [mock.call(alarm, 'ok', reason)
                         for alarm, reason in zip(self.alarms, reasons)]
             self.assertEqual(self.notifier.notify.call_args_list, expected)
+            self.notifier.flush.assert_called_once_with()
 
     def test_simple_alarm_clear(self):
         self._set_all_alarms('alarm')
@@ -273,3 +285,132 @@ class TestEvaluate(base.TestCase):
             expected = [mock.call(alarm, 'insufficient data', reason)
                         for alarm, reason in zip(self.alarms, reasons)]
             self.assertEqual(self.notifier.notify.call_args_list, expected)
+
+    def test_alarms_evaluated_concurrently(self):
+        self._set_all_alarms('ok')
+        started = []
+
+        def slow_stats(counter_name, q, period):
+            started.append(period)
+            eventlet.sleep(0.01)
+            return []
+
+        with mock.patch('ceilometerclient.client.get_client',
+                        return_value=self.api_client):
+            self.api_client.statistics.list.side_effect = slow_stats
+            self.api_client.alarms.update.side_effect = (
+                lambda *args, **kwargs: self.assertEqual(len(started), 2))
+            self.evaluator.evaluate()
+            self._assert_all_alarms('insufficient data')
+
+    def test_authenticated_once_before_evaluation(self):
+        with mock.patch('ceilometerclient.client.get_client',
+                        return_value=self.api_client) as get_client:
+            self.api_client.statistics.list.side_effect = (
+                lambda *args, **kwargs: eventlet.sleep(0.01) or [])
+            self.evaluator.evaluate()
+            self.evaluator.evaluate()
+            self.assertEqual(get_client.call_count, 1)
+
+    def test_token_renewed_once_per_cycle(self):
+        token = mock.PropertyMock(return_value='token')
+        type(self.keystone).auth_token = token
+        with mock.patch('ceilometerclient.client.get_client',
+                        return_value=self.api_client):
+            self.api_client.statistics.list.return_value = []
+            self.evaluator.evaluate()
+            self.assertEqual(token.call_count, 1)
+            token.return_value = 'renewed'
+            self.evaluator.evaluate()
+            self.assertEqual(token.call_count, 2)
+            self.assertEqual(self.evaluator.api_token, 'renewed')
+
+    def test_client_uses_keystone_token(self):
+        with mock.patch('ceilometerclient.client.get_client',
+                        return_value=self.api_client) as get_client:
+            self.evaluator._client
+            get_client.assert_called_once_with(
+                2,
+                os_auth_token='token',
+                ceilometer_url='http://localhost:8777',
+                ca_file=None)
+
+    def test_client_rebuilt_on_token_renewal(self):
+        with mock.patch('ceilometerclient.client.get_client',
+                        return_value=self.api_client) as get_client:
+            self.evaluator._authenticate()
+            self.evaluator._authenticate()
+            self.assertEqual(get_client.call_count, 1)
+            self.keystone.auth_token = 'renewed'
+            self.evaluator._authenticate()
+            self.assertEqual(get_client.call_count, 2)
+            args, kwargs = get_client.call_args
+            self.assertEqual(kwargs['os_auth_token'], 'renewed')
+
+    def test_list_alarms_updated_since(self):
+        since = datetime.datetime(2013, 8, 20, 10, 0)
+        with mock.patch('ceilometerclient.client.get_client',
+                        return_value=self.api_client):
+            self.evaluator.list_alarms(updated_since=since)
+        self.api_client.alarms.list.assert_called_once_with(
+            q=[dict(field='timestamp', op='ge',
+                    value='2013-08-20T10:00:00')])
+
+    def test_evaluation_timeout(self):
+        cfg.CONF.set_override('evaluation_timeout', 0.01, group='alarm')
+        self._set_all_alarms('ok')
+
+        def stats(counter_name, q, period):
+            if period == self.alarms[0].period:
+                eventlet.sleep(1)
+            return []
+
+        with mock.patch('ceilometerclient.client.get_client',
+                        return_value=self.api_client):
+            self.api_client.statistics.list.side_effect = stats
+            self.evaluator.evaluate()
+            self.assertEqual(self.alarms[0].state, 'ok')
+            self.assertEqual(self.alarms[1].state, 'insufficient data')
+
+    def test_evaluation_error_isolation(self):
+        self._set_all_alarms('ok')
+        self.alarms[0].comparison_operator = 'bogus'
+        with mock.patch('ceilometerclient.client.get_client',
+                        return_value=self.api_client):
+            avgs = [self._get_stat('avg', self.alarms[0].threshold + v)
+                    for v in xrange(1, 6)]
+            maxs = [self._get_stat('max', self.alarms[1].threshold - v)
+                    for v in xrange(4)]
+            self.api_client.statistics.list.side_effect = [avgs, maxs]
+            self.evaluator.evaluate()
+            self.assertEqual(self.alarms[0].state, 'ok')
+            self.assertEqual(self.alarms[1].state, 'alarm')
+
+    def _batched_alarms(self):
+        alarms = []
+        for resource_id in ['my_instance', 'other_instance']:
+            alarms.append(models.Alarm(name='instance_running_hot',
+                                       counter_name='cpu_util',
+                                       comparison_operator='gt',
+                                       threshold=80.0,
+                                       evaluation_periods=2,
+                                       statistic='avg',
+                                       user_id='foobar',
+                                       project_id='snafu',
+                                       period=60,
+                                       alarm_id=str(uuid.uuid4()),
+                                       matching_metadata={'resource_id':
+                                                          resource_id}))
+            alarms[-1].state = 'ok'
+        return alarms
+
+    def test_not_batched_through_api(self):
+        alarms = self._batched_alarms()
+        self.evaluator.assign_alarms(alarms)
+        with mock.patch('ceilometerclient.client.get_client',
+                        return_value=self.api_client):
+            self.api_client.statistics.list.return_value = []
+            self.evaluator.evaluate()
+            self.assertEqual(self.api_client.statistics.list.call_count, 2)
+            for alarm in alarms:
+                self.assertEqual(alarm.state, 'insufficient data')
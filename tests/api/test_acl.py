@@ -0,0 +1,86 @@
+# -*- encoding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Tests for ceilometer/api/acl.py
+"""
+import os
+import tempfile
+
+import mock
+from oslo.config import cfg
+
+from ceilometer.api import acl
+from ceilometer.openstack.common import policy
+from ceilometer.tests import base
+
+
+class TestIsAdmin(base.TestCase):
+
+    def setUp(self):
+        super(TestIsAdmin, self).setUp()
+        fd, self.policy_file = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        self.addCleanup(os.remove, self.policy_file)
+        self._write_policy('role:admin', 0)
+        cfg.CONF.set_override('policy_file', self.policy_file)
+        for name, value in (('_ENFORCER', None), ('_ADMIN_RULES', None),
+                            ('_ADMIN_ROLES', {})):
+            patcher = mock.patch.object(acl, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(policy.Enforcer, 'enforce',
+                                    side_effect=policy.Enforcer.enforce,
+                                    autospec=True)
+        self.enforce = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        super(TestIsAdmin, self).tearDown()
+        cfg.CONF.reset()
+
+    def _write_policy(self, rule, mtime):
+        with open(self.policy_file, 'w') as f:
+            f.write('{"context_is_admin": "%s"}' % rule)
+        # the modifications are seen from the modification time
+        os.utime(self.policy_file, (mtime, mtime))
+
+    def test_is_admin(self):
+        self.assertTrue(acl.is_admin('Member,admin'))
+        self.assertFalse(acl.is_admin('Member'))
+        self.assertFalse(acl.is_admin(''))
+
+    def test_decision_cached(self):
+        for i in range(3):
+            self.assertTrue(acl.is_admin('admin'))
+            self.assertFalse(acl.is_admin('Member'))
+        self.assertEqual(self.enforce.call_count, 2)
+
+    def test_policy_modified(self):
+        self.assertTrue(acl.is_admin('admin'))
+        self.assertFalse(acl.is_admin('Member'))
+        self._write_policy('role:Member', 10)
+        self.assertFalse(acl.is_admin('admin'))
+        self.assertTrue(acl.is_admin('Member'))
+        self.assertEqual(self.enforce.call_count, 4)
+
+    def test_decisions_bounded(self):
+        with mock.patch.object(acl, '_ADMIN_ROLES_SIZE', 2):
+            for roles in ('a', 'b', 'c'):
+                acl.is_admin(roles)
+            self.assertEqual(acl._ADMIN_ROLES, {'c': False})
+
+    def test_get_limited_to_project(self):
+        self.assertIsNone(acl.get_limited_to_project(
+            {'X-Roles': 'admin', 'X-Project-Id': 'project'}))
+        self.assertEqual(acl.get_limited_to_project(
+            {'X-Roles': 'Member', 'X-Project-Id': 'project'}), 'project')
@@ -0,0 +1,153 @@
+# -*- encoding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Tests for ceilometer/api/ingestion.py
+"""
+import datetime
+
+import mock
+
+from ceilometer.api import ingestion
+from ceilometer.openstack.common import timeutils
+from ceilometer.tests import base
+
+
+class TestMakeSamples(base.TestCase):
+
+    DOCUMENT = {'counter_name': 'apples',
+                'counter_type': 'delta',
+                'counter_unit': 'apple',
+                'counter_volume': 3,
+                'resource_id': 'tree'}
+
+    def test_defaults(self):
+        timeutils.set_time_override(datetime.datetime(2013, 8, 20, 10))
+        self.addCleanup(timeutils.clear_time_override)
+        s = ingestion.make_samples([self.DOCUMENT], user_id='user',
+                                   project_id='project')[0]
+        self.assertEqual((s.name, s.type, s.unit, s.volume, s.resource_id),
+                         ('apples', 'delta', 'apple', 3, 'tree'))
+        self.assertEqual((s.user_id, s.project_id), ('user', 'project'))
+        self.assertEqual(s.timestamp, '2013-08-20T10:00:00')
+        self.assertEqual(s.resource_metadata, {})
+        self.assertEqual(s.source, 'openstack')
+
+    def test_timestamp_in_utc(self):
+        document = dict(self.DOCUMENT, timestamp='2013-08-20T12:00:00+02:00')
+        s = ingestion.make_samples([document])[0]
+        self.assertEqual(s.timestamp, '2013-08-20T10:00:00')
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, ingestion.make_samples, self.DOCUMENT)
+        self.assertRaises(ValueError, ingestion.make_samples, ['apples'])
+        for broken in ({'counter_volume': True},
+                       {'resource_id': 42},
+                       {'user_id': ['user']},
+                       {'counter_name': None}):
+            self.assertRaises(ValueError, ingestion.make_samples,
+                              [dict(self.DOCUMENT, **broken)])
+
+    def test_auth_project(self):
+        self.assertRaises(ValueError, ingestion.make_samples,
+                          [dict(self.DOCUMENT, project_id='other')],
+                          project_id='project', auth_project='project')
+        s = ingestion.make_samples([self.DOCUMENT], project_id='project',
+                                   auth_project='project')[0]
+        self.assertEqual(s.project_id, 'project')
+
+
+class TestRateLimiter(base.TestCase):
+
+    def setUp(self):
+        super(TestRateLimiter, self).setUp()
+        patcher = mock.patch('time.time', return_value=1000.0)
+        self.time = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_unlimited(self):
+        limiter = ingestion.RateLimiter(0)
+        self.assertTrue(limiter.consume('project', 10 ** 6))
+        self.assertEqual(len(limiter.buckets), 0)
+
+    def test_burst_and_refill(self):
+        limiter = ingestion.RateLimiter(10, 100)
+        self.assertTrue(limiter.consume('project', 60))
+        self.assertFalse(limiter.consume('project', 60))
+        self.assertTrue(limiter.consume('other', 60))
+        self.time.return_value += 2
+        self.assertTrue(limiter.consume('project', 60))
+        # refilled up to the burst only
+        self.time.return_value += 3600
+        self.assertFalse(limiter.consume('project', 101))
+
+    def test_burst_default(self):
+        limiter = ingestion.RateLimiter(10)
+        self.assertFalse(limiter.consume('project', 11))
+        self.assertTrue(limiter.consume('project', 10))
+
+    def test_refund(self):
+        limiter = ingestion.RateLimiter(10, 100)
+        self.assertTrue(limiter.consume('project', 60))
+        limiter.refund('project', 60)
+        self.assertTrue(limiter.consume('project', 100))
+        # refunded up to the burst only
+        limiter.refund('project', 200)
+        self.assertFalse(limiter.consume('project', 101))
+
+    def test_buckets_bounded(self):
+        limiter = ingestion.RateLimiter(10)
+        limiter.buckets.size = 2
+        for project in ('a', 'b', 'c'):
+            limiter.consume(project, 1)
+        self.assertNotIn('a', limiter.buckets)
+        self.assertIn('b', limiter.buckets)
+        self.assertIn('c', limiter.buckets)
+
+
+class TestIngester(base.TestCase):
+
+    def setUp(self):
+        super(TestIngester, self).setUp()
+        self.publisher = mock.MagicMock()
+        self.pipeline_manager = mock.Mock()
+        self.pipeline_manager.publisher.return_value = self.publisher
+        self.ingester = ingestion.Ingester(self.pipeline_manager)
+
+    def _published(self):
+        published = self.publisher.__enter__.return_value
+        return [c[0][0] for c in published.call_args_list]
+
+    def test_published_asynchronously(self):
+        self.assertTrue(self.ingester.put(['s1', 's2']))
+        self.assertTrue(self.ingester.put(['s3']))
+        self.assertEqual(self._published(), [])
+        self.ingester.flush()
+        self.assertEqual(self._published(), [['s1', 's2'], ['s3']])
+
+    def test_publication_failure(self):
+        published = self.publisher.__enter__.return_value
+        published.side_effect = [Exception('broken'), None]
+        self.ingester.put(['s1'])
+        self.ingester.put(['s2'])
+        self.ingester.flush()
+        self.assertEqual(self._published(), [['s1'], ['s2']])
+
+    def test_queue_full(self):
+        self.ingester.queue = ingestion.queue.Queue(1)
+        self.assertTrue(self.ingester.put(['s1']))
+        self.assertFalse(self.ingester.put(['s2']))
+        self.ingester.flush()
+        self.assertEqual(self._published(), [['s1']])
+
+    def test_flush_unused(self):
+        self.ingester.flush()
@@ -0,0 +1,187 @@
+# -*- encoding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Tests for ceilometer/api/statistics_cache.py
+"""
+import datetime
+
+import mock
+from oslo.config import cfg
+
+from ceilometer.api import statistics_cache
+from ceilometer.openstack.common import timeutils
+from ceilometer import storage
+from ceilometer.storage import models
+from ceilometer.tests import base
+
+
+class TestMemoryBackend(base.TestCase):
+
+    def tearDown(self):
+        super(TestMemoryBackend, self).tearDown()
+        cfg.CONF.reset()
+
+    def test_least_recently_used_evicted(self):
+        cfg.CONF.set_override('statistics_cache_size', 2, group='api')
+        backend = statistics_cache.MemoryBackend()
+        backend.set('a', 1, 60)
+        backend.set('b', 2, 60)
+        self.assertEqual(backend.get('a'), 1)
+        backend.set('c', 3, 60)
+        self.assertIsNone(backend.get('b'))
+        self.assertEqual(backend.get('a'), 1)
+        self.assertEqual(backend.get('c'), 3)
+
+    def test_expired(self):
+        backend = statistics_cache.MemoryBackend()
+        with mock.patch('time.time', return_value=1000):
+            backend.set('a', 1, 60)
+        with mock.patch('time.time', return_value=1059):
+            self.assertEqual(backend.get('a'), 1)
+        with mock.patch('time.time', return_value=1061):
+            self.assertIsNone(backend.get('a'))
+
+
+class TestStatisticsCache(base.TestCase):
+
+    START = datetime.datetime(2013, 8, 20, 10)
+
+    def setUp(self):
+        super(TestStatisticsCache, self).setUp()
+        cfg.CONF.set_override('statistics_cache_delay', 60, group='api')
+        self.conn = mock.Mock()
+        self.conn.get_meter_statistics.side_effect = self._statistics
+        self.cache = statistics_cache.StatisticsCache(
+            statistics_cache.MemoryBackend())
+        timeutils.set_time_override(self.START +
+                                    datetime.timedelta(minutes=35))
+        self.addCleanup(timeutils.clear_time_override)
+
+    def tearDown(self):
+        super(TestStatisticsCache, self).tearDown()
+        cfg.CONF.reset()
+
+    @staticmethod
+    def _statistics(sample_filter, period, groupby=None, aggregate=None):
+        # statistics for every period, of its starting minute as volume
+        start = sample_filter.start or datetime.datetime(2013, 8, 20, 10)
+        end = sample_filter.end or timeutils.utcnow()
+        increment = datetime.timedelta(seconds=period or 3600)
+        while start < end:
+            minute = float(start.minute)
+            yield models.Statistics(unit='%', min=minute, max=minute,
+                                    avg=minute, sum=minute, count=1,
+                                    period=period, period_start=start,
+                                    period_end=start + increment,
+                                    duration=0, duration_start=start,
+                                    duration_end=start)
+            start += increment
+
+    def _get(self, period=600, aggregate=None, **kwargs):
+        kwargs.setdefault('start', self.START)
+        f = storage.SampleFilter(meter='cpu_util', **kwargs)
+        return [s.period_start
+                for s in self.cache.get_meter_statistics(
+                    self.conn, f, period, aggregate=aggregate)]
+
+    def _computed_from(self):
+        return [c[0][0].start
+                for c in self.conn.get_meter_statistics.call_args_list]
+
+    def test_closed_periods_cached(self):
+        expected = [self.START + datetime.timedelta(minutes=m)
+                    for m in (0, 10, 20, 30)]
+        self.assertEqual(self._get(), expected)
+        self.assertEqual(self._get(), expected)
+        # the periods closed since more than a minute are not recomputed
+        self.assertEqual(self._computed_from(), [
+            self.START, self.START + datetime.timedelta(minutes=30)])
+        self.assertEqual(self.cache.hits, 3)
+        self.assertEqual(self.cache.misses, 3)
+
+    def test_closed_empty_periods_cached(self):
+        self.conn.get_meter_statistics.side_effect = None
+        self.conn.get_meter_statistics.return_value = []
+        self.assertEqual(self._get(), [])
+        self.assertEqual(self._get(), [])
+        self.assertEqual(self._computed_from(), [
+            self.START, self.START + datetime.timedelta(minutes=30)])
+
+    def test_end_bounds_closed_periods(self):
+        end = self.START + datetime.timedelta(minutes=15)
+        self._get(end=end)
+        self._get(end=end)
+        self.assertEqual(self._computed_from(), [
+            self.START, self.START + datetime.timedelta(minutes=10)])
+
+    def test_all_periods_cached(self):
+        end = self.START + datetime.timedelta(minutes=20)
+        self.assertEqual(len(self._get(end=end)), 2)
+        self.assertEqual(len(self._get(end=end)), 2)
+        self.assertEqual(self.conn.get_meter_statistics.call_count, 1)
+
+    def test_filters_in_key(self):
+        self._get(project='project1')
+        self._get(project='project2')
+        self._get(project='project1', metaquery={'metadata.a': 'b'})
+        self._get(project='project1', resource='r')
+        self.assertEqual(self._computed_from(), [self.START] * 4)
+
+    def test_aggregates_in_key(self):
+        self._get(aggregate=['max'])
+        self._get(aggregate=['max', 'p95'])
+        self._get(aggregate=['p95', 'max'])
+        self._get()
+        # the order of the aggregates does not matter
+        self.assertEqual(self._computed_from(), [
+            self.START, self.START,
+            self.START + datetime.timedelta(minutes=30), self.START])
+        self.assertEqual(self.conn.get_meter_statistics.call_args[1],
+                         {'groupby': None, 'aggregate': None})
+
+    def test_shared_period_boundaries(self):
+        self._get()
+        self._get(start=self.START + datetime.timedelta(minutes=10))
+        self.assertEqual(self._computed_from(), [
+            self.START, self.START + datetime.timedelta(minutes=30)])
+
+    def test_no_start_not_cached(self):
+        self._get(start=None)
+        self._get(start=None)
+        self.assertEqual(self._computed_from(), [None, None])
+        self.assertEqual(self.cache.hits + self.cache.misses, 0)
+
+    def test_start_excluded_not_cached(self):
+        self._get(start_timestamp_op='gt')
+        self._get(start_timestamp_op='gt')
+        self.assertEqual(self._computed_from(), [self.START] * 2)
+
+    def test_no_period_closed_range_cached(self):
+        end = self.START + datetime.timedelta(minutes=30)
+        self.assertEqual(len(self._get(period=None, end=end)), 1)
+        self.assertEqual(len(self._get(period=None, end=end)), 1)
+        self.assertEqual(self.conn.get_meter_statistics.call_count, 1)
+
+    def test_no_period_open_range_not_cached(self):
+        self._get(period=None)
+        self._get(period=None)
+        self.assertEqual(self.conn.get_meter_statistics.call_count, 2)
+
+    def test_get_cache_disabled(self):
+        self.assertIsNone(statistics_cache.get_cache(cfg.CONF))
+
+    def test_get_cache(self):
+        cfg.CONF.set_override('statistics_cache_backend', 'memory',
+                              group='api')
+        cache = statistics_cache.get_cache(cfg.CONF)
+        self.assertIsInstance(cache.backend, statistics_cache.MemoryBackend)
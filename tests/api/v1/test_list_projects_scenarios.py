@@ -97,10 +97,26 @@ class TestListProjects(tests_api.TestBase,
                                  "X-Project-Id": "project-id"})
         self.assertEqual(['project-id'], data['projects'])
 
+    def test_projects_paginated(self):
+        data = self.get('/projects', limit=1)
+        self.assertEqual(['project-id'], data['projects'])
+        data = self.get('/projects', limit=1, marker='project-id')
+        self.assertEqual(['project-id2'], data['projects'])
+
+    def test_projects_invalid_limit(self):
+        rv = self.get('/projects', limit='-1')
+        self.assertEqual(rv.status_code, 400)
+
     def test_with_source(self):
         data = self.get('/sources/test_list_users/projects')
         self.assertEqual(['project-id2'], data['projects'])
 
+    def test_with_other_source_non_admin(self):
+        data = self.get('/sources/test_list_projects/projects',
+                        headers={"X-Roles": "Member",
+                                 "X-Project-Id": "project-id2"})
+        self.assertEqual([], data['projects'])
+
     def test_with_source_non_admin(self):
         data = self.get('/sources/test_list_users/projects',
                         headers={"X-Roles": "Member",
@@ -101,6 +101,10 @@ class TestListUsers(tests_api.TestBase,
                                  "X-Project-Id": "project-id"})
         self.assertEqual(['user-id'], data['users'])
 
+    def test_users_paginated(self):
+        data = self.get('/users', limit=1, marker='user-id')
+        self.assertEqual(['user-id2'], data['users'])
+
     def test_with_source(self):
         data = self.get('/sources/test_list_users/users')
         self.assertEqual(['user-id'], data['users'])
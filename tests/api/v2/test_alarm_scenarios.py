@@ -19,6 +19,7 @@
 '''Tests alarm operation
 '''
 
+import datetime
 import logging
 import uuid
 import testscenarios
@@ -146,6 +147,24 @@ class TestAlarms(FunctionalTest,
         self.assertEqual(alarm.name, json['name'])
         self.assertEqual(alarm.repeat_actions, json['repeat_actions'])
 
+    def test_list_alarms_updated_since(self):
+        data = self.get_json('/alarms',
+                             q=[{'field': 'name',
+                                 'value': 'name1',
+                                 }])
+        alarm_id = data[0]['alarm_id']
+        before = datetime.datetime.utcnow()
+        self.put_json('/alarms/%s' % alarm_id,
+                      params={'enabled': False},
+                      headers=self.auth_headers)
+        data = self.get_json('/alarms',
+                             q=[{'field': 'timestamp',
+                                 'op': 'ge',
+                                 'value': before.isoformat(),
+                                 }])
+        self.assertEqual([a['alarm_id'] for a in data], [alarm_id])
+        self.assertEqual(data[0]['enabled'], False)
+
     def test_put_alarm_wrong_field(self):
         # Note: wsme will ignore unknown fields so will just not appear in
         # the Alarm.
@@ -21,6 +21,8 @@
 import json
 import os
 
+import eventlet
+from eventlet.green import httplib
 from oslo.config import cfg
 
 from ceilometer.api import app
@@ -65,6 +67,82 @@ class TestApp(base.TestCase):
         os.unlink(tmpfile)
 
 
+class TestAPIService(base.TestCase):
+
+    def setUp(self):
+        super(TestAPIService, self).setUp()
+        self.sock = eventlet.listen(('127.0.0.1', 0))
+        self.port = self.sock.getsockname()[1]
+        self.release = eventlet.event.Event()
+        self.srv = app.APIService(lambda: self._app, self.sock)
+        self.addCleanup(self.sock.close)
+
+    def tearDown(self):
+        super(TestAPIService, self).tearDown()
+        cfg.CONF.reset()
+
+    def _app(self, environ, start_response):
+        if environ['PATH_INFO'] == '/slow':
+            self.release.wait()
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [environ['PATH_INFO']]
+
+    def _get(self, path):
+        conn = httplib.HTTPConnection('127.0.0.1', self.port, timeout=5)
+        conn.request('GET', path)
+        response = conn.getresponse()
+        return response.status, response.read()
+
+    def test_serve(self):
+        self.srv.start()
+        self.addCleanup(self.srv.stop)
+        self.assertEqual(self._get('/v2/meters'), (200, '/v2/meters'))
+
+    def test_concurrent_requests(self):
+        self.srv.start()
+        self.addCleanup(self.srv.stop)
+        slow = [eventlet.spawn(self._get, '/slow') for i in range(5)]
+        # the slow requests do not hold the others back
+        self.assertEqual(self._get('/fast'), (200, '/fast'))
+        self.release.send()
+        self.assertEqual([gt.wait() for gt in slow], [(200, '/slow')] * 5)
+
+    def test_pool_size(self):
+        cfg.CONF.set_override('wsgi_pool_size', 3, group='api')
+        self.srv.start()
+        self.addCleanup(self.srv.stop)
+        self.assertEqual(self.srv.pool.size, 3)
+
+    def test_stop_completes_requests_in_progress(self):
+        self.srv.start()
+        slow = eventlet.spawn(self._get, '/slow')
+        eventlet.sleep(0.1)
+        stopping = eventlet.spawn(self.srv.stop)
+        eventlet.sleep(0.1)
+        self.assertFalse(stopping.dead)
+        self.release.send()
+        self.assertEqual(slow.wait(), (200, '/slow'))
+        stopping.wait()
+
+    def test_stop_timeout(self):
+        cfg.CONF.set_override('wsgi_shutdown_timeout', 0, group='api')
+        self.srv.start()
+        slow = eventlet.spawn(self._get, '/slow')
+        eventlet.sleep(0.1)
+        self.srv.stop()
+        self.release.send()
+        slow.wait()
+
+    def test_reload(self):
+        self.srv.start()
+        self.assertEqual(self._get('/before'), (200, '/before'))
+        self.srv.stop()
+        self.srv.reset()
+        self.srv.start()
+        self.addCleanup(self.srv.stop)
+        self.assertEqual(self._get('/after'), (200, '/after'))
+
+
 class TestApiMiddleware(FunctionalTest):
 
     # This doesn't really matter
@@ -0,0 +1,157 @@
+# -*- encoding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Test the listings and statistics in the compact formats."""
+
+import datetime
+import testscenarios
+
+import msgpack
+from oslo.config import cfg
+import webob
+
+from . import base
+from ceilometer.api import compact
+from ceilometer import sample
+from ceilometer.publisher import rpc
+from ceilometer.tests import db as tests_db
+
+load_tests = testscenarios.load_tests_apply_scenarios
+
+
+class TestCompactFormats(base.FunctionalTest,
+                         tests_db.MixinTestsWithBackendScenarios):
+
+    def setUp(self):
+        super(TestCompactFormats, self).setUp()
+        for i in range(5):
+            c = sample.Sample(
+                'instance',
+                'gauge',
+                'instance',
+                1 + i,
+                'user-id',
+                'project-id',
+                'resource-id-%d' % (i % 2),
+                timestamp=datetime.datetime(2012, 7, 2, 10, 40 + i),
+                resource_metadata={'display_name': 'test-server',
+                                   'size': i,
+                                   },
+                source='test_source',
+            )
+            msg = rpc.meter_message_from_counter(
+                c,
+                cfg.CONF.publisher_rpc.metering_secret,
+            )
+            self.conn.record_metering_data(msg)
+
+    def _get(self, path, content_type, streamed=True, **kwargs):
+        cfg.CONF.set_override('stream_listings', streamed, group='api')
+        response = self.app.get(self.PATH_PREFIX + path,
+                                headers={'Accept': content_type},
+                                **kwargs)
+        self.assertEqual(response.content_type, content_type)
+        return response
+
+    def _get_msgpack(self, path, **kwargs):
+        response = self._get(path, compact.MSGPACK, **kwargs)
+        return msgpack.unpackb(response.body)
+
+    def _get_columns(self, path, **kwargs):
+        response = self._get(path, compact.COLUMNS, **kwargs)
+        return self._unpack(response.body)
+
+    @staticmethod
+    def _unpack(body):
+        unpacker = msgpack.Unpacker()
+        unpacker.feed(body)
+        return list(unpacker)
+
+    @staticmethod
+    def _rows(blocks):
+        rows = []
+        for block in blocks:
+            fields = sorted(block)
+            rows.extend(dict(zip(fields, values))
+                        for values in zip(*[block[f] for f in fields]))
+        return rows
+
+    def test_json_default(self):
+        response = self.app.get(self.PATH_PREFIX + '/meters/instance')
+        self.assertEqual(response.content_type, 'application/json')
+
+    def test_samples_msgpack(self):
+        data = self._get_msgpack('/meters/instance')
+        self.assertEqual(data, self.get_json('/meters/instance'))
+
+    def test_samples_msgpack_arguments(self):
+        data = self._get_msgpack('/meters/instance', params={'limit': 2})
+        self.assertEqual(len(data), 2)
+        response = self._get('/meters/instance', 'application/xml',
+                             params={'limit': 2})
+        self.assertEqual(response.body.count('<counter_name>'), 2)
+
+    def test_samples_columns(self):
+        blocks = self._get_columns('/meters/instance')
+        self.assertEqual(len(blocks), 1)
+        self.assertEqual(blocks[0]['counter_volume'],
+                         [5.0, 4.0, 3.0, 2.0, 1.0])
+        self.assertEqual(self._rows(blocks),
+                         self.get_json('/meters/instance'))
+
+    def test_samples_columns_blocks(self):
+        cfg.CONF.set_override('columns_block_size', 2, group='api')
+        for streamed in (True, False):
+            blocks = self._get_columns('/meters/instance', streamed=streamed)
+            self.assertEqual([len(b['counter_volume']) for b in blocks],
+                             [2, 2, 1])
+            self.assertEqual(self._rows(blocks),
+                             self.get_json('/meters/instance'))
+
+    def test_samples_columns_streamed(self):
+        request = webob.Request.blank(self.PATH_PREFIX + '/meters/instance',
+                                      accept=compact.COLUMNS)
+        status, headers, app_iter = request.call_application(self.app.app)
+        self.assertEqual(status, '200 OK')
+        self.assertNotIn('Content-Length', dict(headers))
+        self.assertEqual(self._rows(self._unpack(''.join(app_iter))),
+                         self.get_json('/meters/instance'))
+
+    def test_samples_columns_none(self):
+        self.assertEqual(self._get_columns('/meters/unknown'), [])
+
+    def test_resources(self):
+        expected = self.get_json('/resources')
+        self.assertEqual(self._get_msgpack('/resources'), expected)
+        self.assertEqual(self._rows(self._get_columns('/resources')),
+                         expected)
+
+    def test_statistics(self):
+        path = '/meters/instance/statistics'
+        expected = self.get_json(path)
+        self.assertEqual(self._get_msgpack(path), expected)
+        self.assertEqual(self._rows(self._get_columns(path)), expected)
+
+    def test_error_in_json(self):
+        response = self.app.get(self.PATH_PREFIX + '/meters/instance',
+                                params={'limit': -1},
+                                headers={'Accept': compact.MSGPACK},
+                                expect_errors=True)
+        self.assertEqual(response.content_type, 'application/json')
+        self.assertTrue(response.json['error_message'])
+
+    def test_alarms_not_acceptable(self):
+        response = self.app.get(self.PATH_PREFIX + '/alarms',
+                                headers={'Accept': compact.MSGPACK},
+                                expect_errors=True)
+        self.assertEqual(response.status_int, 406)
@@ -23,7 +23,9 @@ import logging
 import testscenarios
 
 from oslo.config import cfg
+import sqlalchemy
 
+from ceilometer.openstack.common.db.sqlalchemy import session
 from ceilometer.publisher import rpc
 from ceilometer import sample
 from ceilometer.tests import db as tests_db
@@ -461,3 +463,59 @@ class TestListResources(FunctionalTest,
         self.assertTrue((self.PATH_PREFIX + '/meters/instance?'
                          'q.field=resource_id&q.value=resource-id')
                         in links[1]['href'])
+
+
+class TestListResourcesQueries(FunctionalTest):
+
+    database_connection = 'sqlite://'
+
+    def _record_resources(self, count):
+        for i in range(count):
+            for name in ('instance', 'cpu'):
+                c = sample.Sample(
+                    name,
+                    'gauge',
+                    '',
+                    1,
+                    'user-id',
+                    'project-id',
+                    'resource-id-%d' % i,
+                    timestamp=datetime.datetime(2012, 7, 2, 10, 40 + i),
+                    resource_metadata={'display_name': 'test-server'},
+                    source='test_source',
+                )
+                msg = rpc.meter_message_from_counter(
+                    c,
+                    cfg.CONF.publisher_rpc.metering_secret,
+                )
+                self.conn.record_metering_data(msg)
+
+    def _count_queries(self, path):
+        statements = []
+        # SQLAlchemy 0.7 has no way to remove a listener: it is left
+        # registered, counting only during the request
+        counting = [True]
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            if counting:
+                statements.append(statement)
+
+        sqlalchemy.event.listen(session.get_engine(), 'before_cursor_execute',
+                                before_cursor_execute)
+        try:
+            data = self.get_json(path)
+        finally:
+            del counting[:]
+        return data, len(statements)
+
+    def test_queries_independent_of_resources(self):
+        self._record_resources(2)
+        data, queries = self._count_queries('/resources')
+        self.assertEqual(len(data), 2)
+        self._record_resources(10)
+        data, more_queries = self._count_queries('/resources')
+        self.assertEqual(len(data), 10)
+        self.assertEqual(more_queries, queries)
+        self.assertEqual(
+            sorted(link['rel'] for link in data[0]['links']),
+            ['cpu', 'instance', 'self'])
@@ -0,0 +1,169 @@
+# -*- encoding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Test posting batches of samples of any meters.
+"""
+
+import testscenarios
+
+from oslo.config import cfg
+
+from .base import FunctionalTest
+from ceilometer.api import hooks
+from ceilometer.openstack.common import rpc
+from ceilometer.tests import db as tests_db
+
+load_tests = testscenarios.load_tests_apply_scenarios
+
+
+class TestPostBatch(FunctionalTest,
+                    tests_db.MixinTestsWithBackendScenarios):
+
+    PROJECT = '35b17138-b364-4e6a-a131-8f3099c5be68'
+
+    def faux_cast(self, context, topic, msg):
+        self.published.append((topic, msg))
+
+    def setUp(self):
+        super(TestPostBatch, self).setUp()
+        self.published = []
+        self.stubs.Set(rpc, 'cast', self.faux_cast)
+        # publish the samples queued by the test while the cast is faked
+        self.addCleanup(lambda: self._ingester().flush())
+
+    def tearDown(self):
+        super(TestPostBatch, self).tearDown()
+        cfg.CONF.reset()
+
+    def _sample(self, name='apples', volume=1, **kwargs):
+        s = {'counter_name': name,
+             'counter_type': 'gauge',
+             'counter_unit': 'instance',
+             'counter_volume': volume,
+             'resource_id': 'bd9431c1-8d69-4ad3-803a-8d4a6b89fd36',
+             'project_id': self.PROJECT,
+             'user_id': 'efd87807-12d2-4b38-9c70-5f5c2ac427ff',
+             'resource_metadata': {'name1': 'value1'}}
+        s.update(kwargs)
+        return s
+
+    def _ingester(self):
+        # the pecan application, under the middlewares
+        app = self.app.app
+        while not hasattr(app, 'hooks'):
+            app = getattr(app, 'application', None) or app.app
+        for hook in app.hooks:
+            if isinstance(hook, hooks.IngestionHook):
+                return hook.ingester
+
+    def _published_samples(self):
+        self._ingester().flush()
+        return [m for topic, msg in self.published
+                for m in msg['args']['data']]
+
+    def test_multiple_meters(self):
+        samples = [self._sample('apples', 1),
+                   self._sample('pears', 2, timestamp='2013-08-20T10:00:00',
+                                source='orchard')]
+        response = self.post_json('/samples', samples)
+        self.assertEqual(response.status_int, 202)
+        self.assertEqual(len(response.json), 2)
+        published = self._published_samples()
+        self.assertEqual([m['message_id'] for m in published], response.json)
+        self.assertEqual([(m['counter_name'], m['counter_volume'])
+                          for m in published],
+                         [('apples', 1), ('pears', 2)])
+        self.assertEqual(published[0]['source'], 'openstack')
+        self.assertEqual(published[1]['source'], 'orchard')
+        self.assertEqual(published[1]['timestamp'], '2013-08-20T10:00:00')
+        self.assertEqual(published[0]['resource_metadata'],
+                         {'name1': 'value1'})
+
+    def test_invalid_samples(self):
+        for broken in ({'counter_volume': None},
+                       {'counter_volume': 'high'},
+                       {'counter_type': 'level'},
+                       {'resource_metadata': 'name1'},
+                       {'timestamp': 'yesterday'}):
+            response = self.post_json('/samples',
+                                      [self._sample(),
+                                       self._sample(**broken)],
+                                      expect_errors=True)
+            self.assertEqual(response.status_int, 400)
+            self.assertIn('sample 1', response.json['error_message'])
+        self.assertEqual(self._published_samples(), [])
+
+    def test_not_a_list(self):
+        response = self.post_json('/samples', self._sample(),
+                                  expect_errors=True)
+        self.assertEqual(response.status_int, 400)
+
+    def test_other_project(self):
+        response = self.post_json('/samples', [self._sample()],
+                                  expect_errors=True,
+                                  headers={'X-Roles': 'Member',
+                                           'X-Project-Id': 'other-project'})
+        self.assertEqual(response.status_int, 400)
+
+    def test_project_from_headers(self):
+        sample = self._sample()
+        del sample['project_id']
+        self.post_json('/samples', [sample],
+                       headers={'X-Roles': 'Member',
+                                'X-Project-Id': self.PROJECT})
+        self.assertEqual(self._published_samples()[0]['project_id'],
+                         self.PROJECT)
+
+    def test_batch_too_large(self):
+        cfg.CONF.set_override('ingestion_batch_size', 2, group='api')
+        response = self.post_json('/samples', [self._sample()] * 3,
+                                  expect_errors=True)
+        self.assertEqual(response.status_int, 413)
+
+    def test_rate_limited(self):
+        limiter = self._ingester().limiter
+        limiter.rate = 0.001
+        limiter.burst = 3
+        headers = {'X-Roles': 'admin', 'X-Project-Id': self.PROJECT}
+        self.post_json('/samples', [self._sample()] * 2, headers=headers)
+        response = self.post_json('/samples', [self._sample()] * 2,
+                                  headers=headers, expect_errors=True)
+        self.assertEqual(response.status_int, 429)
+        # the other projects have their own limit
+        self.post_json('/samples', [self._sample()] * 2,
+                       headers={'X-Roles': 'admin',
+                                'X-Project-Id': 'other-project'})
+        self.assertEqual(len(self._published_samples()), 4)
+
+    def test_queue_full(self):
+        cfg.CONF.set_override('ingestion_queue_size', 1, group='api')
+        self.app = self._make_app()
+        self.post_json('/samples', [self._sample()])
+        response = self.post_json('/samples', [self._sample()],
+                                  expect_errors=True)
+        self.assertEqual(response.status_int, 503)
+        self.assertEqual(len(self._published_samples()), 1)
+
+    def test_queue_full_not_rate_limited(self):
+        cfg.CONF.set_override('ingestion_queue_size', 1, group='api')
+        self.app = self._make_app()
+        limiter = self._ingester().limiter
+        limiter.rate = 0.001
+        limiter.burst = 2
+        headers = {'X-Roles': 'admin', 'X-Project-Id': self.PROJECT}
+        self.post_json('/samples', [self._sample()], headers=headers)
+        response = self.post_json('/samples', [self._sample()],
+                                  headers=headers, expect_errors=True)
+        self.assertEqual(response.status_int, 503)
+        # the refused sample gave its token back
+        self.assertTrue(limiter.consume(self.PROJECT, 1))
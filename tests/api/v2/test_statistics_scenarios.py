@@ -23,6 +23,7 @@ import testscenarios
 from oslo.config import cfg
 
 from . import base
+from ceilometer.openstack.common import timeutils
 from ceilometer import sample
 from ceilometer.publisher import rpc
 from ceilometer.tests import db as tests_db
@@ -130,6 +131,46 @@ class TestMaxProjectVolume(base.FunctionalTest,
         self.assertEqual(data[0]['max'], 6)
         self.assertEqual(data[0]['count'], 1)
 
+    def test_groupby_resource(self):
+        data = self.get_json(self.PATH, q=[{'field': 'project_id',
+                                            'value': 'project1',
+                                            }],
+                             groupby=['resource_id'])
+        self.assertEqual(len(data), 3)
+        maxs = dict((d['groupby']['resource_id'], d['max']) for d in data)
+        self.assertEqual(maxs, {'resource-id-0': 5,
+                                'resource-id-1': 6,
+                                'resource-id-2': 7})
+
+    def test_groupby_source(self):
+        data = self.get_json(self.PATH, groupby=['source'])
+        self.assertEqual([(d['groupby'], d['count']) for d in data],
+                         [({'source': 'source1'}, 3)])
+
+    def test_groupby_metadata(self):
+        data = self.get_json(self.PATH, groupby=['metadata.display_name'])
+        self.assertEqual([(d['groupby'], d['count']) for d in data],
+                         [({'metadata.display_name': 'test-volume'}, 3)])
+
+    def test_groupby_invalid_field(self):
+        resp = self.get_json(self.PATH, expect_errors=True,
+                             groupby=['counter_volume'])
+        self.assertEqual(resp.status_code, 400)
+
+    def test_aggregate(self):
+        data = self.get_json(self.PATH, aggregate=['max', 'stddev', 'p50'])
+        self.assertEqual(data[0]['max'], 7)
+        self.assertEqual(data[0]['count'], 3)
+        self.assertIsNone(data[0].get('min'))
+        self.assertIsNone(data[0].get('sum'))
+        self.assertAlmostEqual(data[0]['stddev'], (2 / 3.0) ** 0.5)
+        self.assertEqual(data[0]['percentiles'], {'p50': 6})
+
+    def test_aggregate_invalid(self):
+        resp = self.get_json(self.PATH, expect_errors=True,
+                             aggregate=['median'])
+        self.assertEqual(resp.status_code, 400)
+
 
 class TestMaxResourceVolume(base.FunctionalTest,
                             tests_db.MixinTestsWithBackendScenarios):
@@ -478,3 +519,64 @@ class TestSumResourceVolume(base.FunctionalTest,
                                             }])
         self.assertEqual(data[0]['sum'], 6)
         self.assertEqual(data[0]['count'], 1)
+
+
+class TestStatisticsCache(base.FunctionalTest,
+                          tests_db.MixinTestsWithBackendScenarios):
+
+    PATH = '/meters/volume.size/statistics'
+
+    def setUp(self):
+        super(TestStatisticsCache, self).setUp()
+        cfg.CONF.set_override('statistics_cache_backend', 'memory',
+                              group='api')
+        cfg.CONF.set_override('statistics_cache_delay', 0, group='api')
+        self.app = self._make_app()
+        timeutils.set_time_override(datetime.datetime(2012, 9, 25, 12, 45))
+        self.addCleanup(timeutils.clear_time_override)
+        for i in range(3):
+            self._record(5 + i, datetime.datetime(2012, 9, 25, 10 + i, 30))
+
+    def _record(self, volume, timestamp):
+        c = sample.Sample(
+            'volume.size',
+            'gauge',
+            'GiB',
+            volume,
+            'user-id',
+            'project1',
+            'resource-id',
+            timestamp=timestamp,
+            resource_metadata={},
+            source='source1',
+        )
+        msg = rpc.meter_message_from_counter(
+            c,
+            cfg.CONF.publisher_rpc.metering_secret,
+        )
+        self.conn.record_metering_data(msg)
+
+    def _counts(self):
+        data = self.get_json(self.PATH,
+                             period=3600,
+                             q=[{'field': 'timestamp',
+                                 'op': 'ge',
+                                 'value': '2012-09-25T10:00:00',
+                                 },
+                                {'field': 'timestamp',
+                                 'op': 'lt',
+                                 'value': '2012-09-25T13:00:00',
+                                 }])
+        return [(d['period_start'], d['count']) for d in data]
+
+    def test_open_period_recomputed(self):
+        self.assertEqual(self._counts(), [('2012-09-25T10:00:00', 1),
+                                          ('2012-09-25T11:00:00', 1),
+                                          ('2012-09-25T12:00:00', 1)])
+        # a sample recorded late in a closed period goes unnoticed until
+        # its statistics expire from the cache
+        self._record(8, datetime.datetime(2012, 9, 25, 10, 40))
+        self._record(9, datetime.datetime(2012, 9, 25, 12, 40))
+        self.assertEqual(self._counts(), [('2012-09-25T10:00:00', 1),
+                                          ('2012-09-25T11:00:00', 1),
+                                          ('2012-09-25T12:00:00', 2)])
@@ -0,0 +1,116 @@
+# -*- encoding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Test the streaming of the sample and resource listings."""
+
+import datetime
+import json
+import testscenarios
+
+from oslo.config import cfg
+import webob
+
+from . import base
+from ceilometer import sample
+from ceilometer.publisher import rpc
+from ceilometer.tests import db as tests_db
+
+load_tests = testscenarios.load_tests_apply_scenarios
+
+
+class TestStreamListings(base.FunctionalTest,
+                         tests_db.MixinTestsWithBackendScenarios):
+
+    def setUp(self):
+        super(TestStreamListings, self).setUp()
+        for i in range(5):
+            c = sample.Sample(
+                'instance',
+                'gauge',
+                'instance',
+                1 + i,
+                'user-id',
+                'project-id',
+                'resource-id-%d' % (i % 2),
+                timestamp=datetime.datetime(2012, 7, 2, 10, 40 + i),
+                resource_metadata={'display_name': 'test-server',
+                                   'size': i,
+                                   'nested': {'key': 'value'},
+                                   },
+                source='test_source',
+            )
+            msg = rpc.meter_message_from_counter(
+                c,
+                cfg.CONF.publisher_rpc.metering_secret,
+            )
+            self.conn.record_metering_data(msg)
+
+    def _get(self, path, streamed, **kwargs):
+        cfg.CONF.set_override('stream_listings', streamed, group='api')
+        response = self.app.get(self.PATH_PREFIX + path, **kwargs)
+        self.assertEqual(response.content_type, 'application/json')
+        return response
+
+    def _compare(self, path, **kwargs):
+        streamed = self._get(path, True, **kwargs)
+        built = self._get(path, False, **kwargs)
+        self.assertEqual(streamed.json, built.json)
+        return streamed.json
+
+    def test_samples(self):
+        data = self._compare('/meters/instance')
+        self.assertEqual(len(data), 5)
+        self.assertEqual(data[0]['resource_metadata'],
+                         {'display_name': 'test-server',
+                          'size': '4'})
+
+    def test_samples_filtered(self):
+        data = self._compare('/meters/instance',
+                             params={'q.field': 'resource_id',
+                                     'q.value': 'resource-id-1',
+                                     'limit': 1})
+        self.assertEqual(len(data), 1)
+
+    def test_samples_none(self):
+        data = self._get('/meters/unknown', True).json
+        self.assertEqual(data, [])
+
+    def test_samples_chunks(self):
+        cfg.CONF.set_override('stream_chunk_size', 1, group='api')
+        request = webob.Request.blank(self.PATH_PREFIX + '/meters/instance')
+        status, headers, app_iter = request.call_application(self.app.app)
+        self.assertEqual(status, '200 OK')
+        self.assertNotIn('Content-Length', dict(headers))
+        chunks = list(app_iter)
+        # a chunk per sample
+        self.assertEqual(len(chunks), 5)
+        self.assertEqual(json.loads(''.join(chunks)),
+                         self._get('/meters/instance', False).json)
+
+    def test_resources(self):
+        data = self._compare('/resources')
+        self.assertEqual(len(data), 2)
+
+    def test_xml_not_streamed(self):
+        response = self.app.get(self.PATH_PREFIX + '/meters/instance',
+                                headers={'Accept': 'application/xml'})
+        self.assertEqual(response.content_type, 'application/xml')
+        self.assertEqual(len(response.xml), 5)
+
+    def test_error_not_streamed(self):
+        response = self.app.get(self.PATH_PREFIX + '/meters/instance',
+                                params={'limit': -1},
+                                expect_errors=True)
+        self.assertEqual(response.content_type, 'application/json')
+        self.assertIsNotNone(response.content_length)
+        self.assertTrue(response.json['error_message'])
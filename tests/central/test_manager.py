@@ -18,8 +18,11 @@
 """Tests for ceilometer/central/manager.py
 """
 
+import eventlet
 import mock
 from keystoneclient.v2_0 import client as ksclient
+from oslo.config import cfg
+from stevedore import extension
 
 from ceilometer.central import manager
 from ceilometer.tests import base
@@ -45,3 +48,148 @@ class TestRunTasks(agentbase.BaseAgentManagerTestCase):
 
     def tearDown(self):
         super(TestRunTasks, self).tearDown()
+
+    def test_interval_task_partitioned(self):
+        coordinator = mock.Mock()
+        coordinator.extract_my_subset.return_value = []
+        self.mgr.partition_coordinator = coordinator
+        polling_tasks = self.mgr.setup_polling_tasks()
+        self.mgr.interval_task(polling_tasks[60])
+        pub = self.mgr.pipeline_manager.pipelines[0].publishers[0]
+        self.assertEqual(len(pub.counters), 0)
+        args, kwargs = coordinator.extract_my_subset.call_args
+        self.assertEqual(args[0], [self.Pollster.test_data])
+
+    def test_initialize_service_hook_partitioned(self):
+        self.mgr.partition_coordinator = mock.Mock()
+        service = mock.MagicMock()
+        self.mgr.initialize_service_hook(service)
+        service.tg.add_timer.assert_any_call(
+            10, self.mgr.partition_coordinator.heartbeat)
+
+
+class TestCentralAgentService(base.TestCase):
+
+    def setUp(self):
+        super(TestCentralAgentService, self).setUp()
+        self.mgr = mock.Mock()
+        self.service = manager.CentralAgentService(
+            'host', 'ceilometer.agent.central', self.mgr)
+
+    def test_stop_leaves_partitioning_group(self):
+        self.service.stop()
+        self.mgr.partition_coordinator.leave.assert_called_once_with()
+
+    def test_stop_leave_failure(self):
+        self.mgr.partition_coordinator.leave.side_effect = IOError('boom')
+        self.service.stop()
+        self.mgr.partition_coordinator.leave.assert_called_once_with()
+
+    def test_stop_not_partitioned(self):
+        self.mgr.partition_coordinator = None
+        self.service.stop()
+
+
+class TestPollingTask(base.TestCase):
+
+    class Pollster(object):
+        def __init__(self, name, samples=None, cache_key=None,
+                     sleep=0, error=None, log=None):
+            self.name = name
+            self.samples = samples or [mock.Mock(resource_id=name)]
+            if cache_key:
+                self.CACHE_KEY = cache_key
+            self.sleep = sleep
+            self.error = error
+            self.log = log if log is not None else []
+
+        def get_samples(self, manager, cache):
+            self.log.append(('start', self.name))
+            eventlet.sleep(self.sleep)
+            self.log.append(('end', self.name))
+            if self.error:
+                raise self.error
+            return self.samples
+
+    def setUp(self):
+        super(TestPollingTask, self).setUp()
+        self.published = []
+        self.agent = mock.Mock(partition_coordinator=None)
+        self.task = manager.PollingTask.__new__(manager.PollingTask)
+        self.task.manager = self.agent
+        self.task.pollsters = set()
+        self.task.publish_context = mock.MagicMock()
+        self.task.publish_context.__enter__.return_value = \
+            self.published.extend
+
+    def _add(self, pollster):
+        self.task.pollsters.add(
+            extension.Extension(pollster.name, None, None, pollster))
+        return pollster
+
+    def test_group_sharing_cache_key_in_sequence(self):
+        log = []
+        self._add(self.Pollster('b', cache_key='images', sleep=0.01,
+                                log=log))
+        self._add(self.Pollster('a', cache_key='images', sleep=0.01,
+                                log=log))
+        self.task.poll_and_publish()
+        self.assertEqual(log, [('start', 'a'), ('end', 'a'),
+                               ('start', 'b'), ('end', 'b')])
+        self.assertEqual(len(self.published), 2)
+
+    def test_groups_polled_concurrently(self):
+        log = []
+        self._add(self.Pollster('a', sleep=0.01, log=log))
+        self._add(self.Pollster('b', sleep=0.01, log=log))
+        self.task.poll_and_publish()
+        self.assertEqual(sorted(log[:2]), [('start', 'a'), ('start', 'b')])
+        self.assertEqual(len(self.published), 2)
+
+    def test_polling_workers_bound(self):
+        cfg.CONF.set_override('polling_workers', 1, group='central')
+        log = []
+        self._add(self.Pollster('a', sleep=0.01, log=log))
+        self._add(self.Pollster('b', sleep=0.01, log=log))
+        self.task.poll_and_publish()
+        self.assertEqual(log[1][0], 'end')
+
+    def test_publish_as_soon_as_polled(self):
+        fast = self._add(self.Pollster('fast'))
+        slow = self._add(self.Pollster('slow', sleep=0.05))
+        self.task.poll_and_publish()
+        self.assertEqual(self.published, fast.samples + slow.samples)
+
+    def test_pollster_timeout(self):
+        cfg.CONF.set_override('pollster_timeout', 0.01, group='central')
+        self._add(self.Pollster('hung', cache_key='x', sleep=1))
+        after = self._add(self.Pollster('next', cache_key='x'))
+        other = self._add(self.Pollster('other'))
+        self.task.poll_and_publish()
+        self.assertEqual(sorted(self.published),
+                         sorted(after.samples + other.samples))
+
+    def test_pollster_error_isolation(self):
+        self._add(self.Pollster('broken', cache_key='x',
+                                error=Exception('boom')))
+        after = self._add(self.Pollster('next', cache_key='x'))
+        self.task.poll_and_publish()
+        self.assertEqual(self.published, after.samples)
+
+    def test_partitioned(self):
+        coordinator = mock.Mock()
+        coordinator.extract_my_subset.return_value = []
+        self.agent.partition_coordinator = coordinator
+        self._add(self.Pollster('a'))
+        self.task.poll_and_publish()
+        self.assertEqual(self.published, [])
+        self.assertEqual(coordinator.extract_my_subset.call_count, 1)
+
+    def test_partitioned_by_pollster(self):
+        coordinator = mock.Mock()
+        self.agent.partition_coordinator = coordinator
+        pollster = self._add(self.Pollster('a'))
+        pollster.PARTITIONED = True
+        self.task.poll_and_publish()
+        self.assertEqual(self.published, pollster.samples)
+        self.assertFalse(coordinator.extract_my_subset.called)
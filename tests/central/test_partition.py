@@ -0,0 +1,133 @@
+# -*- encoding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Tests for ceilometer/central/partition.py
+"""
+
+import os
+import time
+
+import mock
+from oslo.config import cfg
+
+from ceilometer.central import partition
+from ceilometer.tests import base
+
+
+class TestFileMembership(base.TestCase):
+
+    def setUp(self):
+        super(TestFileMembership, self).setUp()
+        self.backend = partition.FileMembership(
+            'file://' + os.path.join(self.tempdir.path, 'group'))
+
+    def test_heartbeat(self):
+        self.backend.heartbeat('agent-1')
+        self.backend.heartbeat('agent-2')
+        self.assertEqual(sorted(self.backend.get_members(30)),
+                         ['agent-1', 'agent-2'])
+
+    def test_expired_member(self):
+        self.backend.heartbeat('agent-1')
+        self.backend.heartbeat('agent-2')
+        old = time.time() - 60
+        os.utime(os.path.join(self.backend.path, 'agent-2'), (old, old))
+        self.assertEqual(self.backend.get_members(30), ['agent-1'])
+
+    def test_leave(self):
+        self.backend.heartbeat('agent-1')
+        self.backend.leave('agent-1')
+        self.backend.leave('agent-1')
+        self.assertEqual(self.backend.get_members(30), [])
+
+
+class TestPartitionCoordinator(base.TestCase):
+
+    def setUp(self):
+        super(TestPartitionCoordinator, self).setUp()
+        self.backend = partition.FileMembership(
+            'file://' + os.path.join(self.tempdir.path, 'group'))
+        self.resources = ['resource-%d' % i for i in range(100)]
+
+    def _coordinator(self, member_id):
+        return partition.PartitionCoordinator(self.backend, member_id, 30)
+
+    def test_alone(self):
+        coordinator = self._coordinator('agent-1')
+        coordinator.heartbeat()
+        self.assertEqual(coordinator.extract_my_subset(self.resources),
+                         self.resources)
+
+    def test_split(self):
+        coordinators = [self._coordinator('agent-%d' % i) for i in range(3)]
+        for c in coordinators:
+            c.heartbeat()
+        for c in coordinators:
+            c.heartbeat()
+        subsets = [c.extract_my_subset(self.resources) for c in coordinators]
+        for subset in subsets:
+            self.assertTrue(subset)
+        self.assertEqual(sorted(sum(subsets, [])), sorted(self.resources))
+
+    def test_rebalance_on_leave(self):
+        c1 = self._coordinator('agent-1')
+        c2 = self._coordinator('agent-2')
+        c1.heartbeat()
+        c2.heartbeat()
+        c1.heartbeat()
+        self.assertNotEqual(c1.extract_my_subset(self.resources),
+                            self.resources)
+        c2.leave()
+        c1.heartbeat()
+        self.assertEqual(c1.extract_my_subset(self.resources),
+                         self.resources)
+
+    def test_extract_my_subset_key(self):
+        coordinator = self._coordinator('agent-1')
+        resources = [{'id': r} for r in self.resources]
+        self.assertEqual(
+            coordinator.extract_my_subset(resources, key=lambda r: r['id']),
+            resources)
+
+    def test_iter_my_resources(self):
+        coordinator = self._coordinator('agent-1')
+        self.stubs.Set(coordinator, 'belongs', lambda r: r.endswith('1'))
+        manager = mock.Mock(partition_coordinator=coordinator)
+        resources = [{'id': r} for r in self.resources]
+        mine = partition.iter_my_resources(manager, iter(resources),
+                                           key=lambda r: r['id'])
+        self.assertEqual([r['id'] for r in mine],
+                         [r for r in self.resources if r.endswith('1')])
+
+    def test_iter_my_resources_not_partitioned(self):
+        manager = mock.Mock(partition_coordinator=None)
+        self.assertEqual(
+            list(partition.iter_my_resources(manager, self.resources)),
+            self.resources)
+
+    def test_backend_error(self):
+        coordinator = self._coordinator('agent-1')
+        self.stubs.Set(self.backend, 'get_members', None)
+        coordinator.heartbeat()
+        self.assertEqual(coordinator.members, ['agent-1'])
+
+    def test_get_coordinator_disabled(self):
+        self.assertEqual(partition.get_coordinator(cfg.CONF), None)
+
+    def test_get_coordinator(self):
+        url = 'file://' + os.path.join(self.tempdir.path, 'other')
+        cfg.CONF.set_override('partitioning_url', url, group='central')
+        coordinator = partition.get_coordinator(cfg.CONF)
+        self.assertTrue(isinstance(coordinator.backend,
+                                   partition.FileMembership))
+        self.assertTrue(coordinator.member_id.startswith(cfg.CONF.host))
@@ -0,0 +1,82 @@
+# -*- encoding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Tests for ceilometer/collector/dispatcher/alarm.py
+"""
+import mock
+
+from oslo.config import cfg
+
+from ceilometer.collector.dispatcher import alarm
+from ceilometer.publisher import rpc
+from ceilometer.tests import base as tests_base
+
+
+class TestDispatcherAlarm(tests_base.TestCase):
+
+    def setUp(self):
+        super(TestDispatcherAlarm, self).setUp()
+        self.dispatcher = alarm.AlarmDispatcher(cfg.CONF)
+        self.dispatcher.evaluator = mock.Mock()
+        self.dispatcher.evaluator.list_alarms.return_value = []
+        self.dispatcher.cache.list_alarms = (
+            self.dispatcher.evaluator.list_alarms)
+        self.ctx = None
+
+    def _msg(self):
+        msg = {'counter_name': 'test',
+               'resource_id': self.id(),
+               'counter_volume': 1,
+               }
+        msg['message_signature'] = rpc.compute_signature(
+            msg,
+            cfg.CONF.publisher_rpc.metering_secret,
+        )
+        return msg
+
+    def test_valid_message(self):
+        msg = self._msg()
+        self.dispatcher.record_metering_data(self.ctx, [msg])
+        self.dispatcher.evaluator.record_sample.assert_called_once_with(msg)
+
+    def test_invalid_message(self):
+        msg = self._msg()
+        msg['message_signature'] = 'invalid-signature'
+        self.dispatcher.record_metering_data(self.ctx, msg)
+        self.assertFalse(self.dispatcher.evaluator.record_sample.called)
+
+    def test_alarms_refresh(self):
+        cfg.CONF.set_override('refresh_interval', 60,
+                              group='dispatcher_alarm')
+        with mock.patch.object(alarm, 'time') as fake_time:
+            fake_time.time.return_value = 100.0
+            self.dispatcher.record_metering_data(self.ctx, self._msg())
+            fake_time.time.return_value = 130.0
+            self.dispatcher.record_metering_data(self.ctx, self._msg())
+            self.assertEqual(
+                self.dispatcher.evaluator.assign_alarms.call_count, 1)
+            fake_time.time.return_value = 160.0
+            self.dispatcher.record_metering_data(self.ctx, self._msg())
+            self.assertEqual(
+                self.dispatcher.evaluator.assign_alarms.call_count, 2)
+
+    def test_alarms_refresh_failure(self):
+        self.dispatcher.evaluator.list_alarms.side_effect = Exception('boom')
+        self.dispatcher.record_metering_data(self.ctx, self._msg())
+        self.assertEqual(self.dispatcher.evaluator.record_sample.call_count,
+                         1)
+
+    def test_notifications_flushed(self):
+        self.dispatcher.record_metering_data(self.ctx, [self._msg(),
+                                                        self._msg()])
+        self.dispatcher.evaluator.notifier.flush.assert_called_once_with()
@@ -91,6 +91,8 @@ class TestDispatcherDB(tests_base.TestCase):
         self.mox.ReplayAll()
 
         self.dispatcher.record_metering_data(self.ctx, msg)
+        self.assertTrue(rpc.verify_signature(
+            msg, cfg.CONF.publisher_rpc.metering_secret))
 
     def test_timestamp_tzinfo_conversion(self):
         msg = {'counter_name': 'test',
@@ -16,12 +16,16 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import datetime
+
 import mock
+from oslo.config import cfg
 
 from ceilometer.tests import base
 from ceilometer.image import glance
 from ceilometer.central import manager
 from ceilometer.openstack.common import context
+from ceilometer.openstack.common import timeutils
 
 
 IMAGE_LIST = [
@@ -143,7 +147,7 @@ class TestImagePollster(base.TestCase):
     def test_iter_images_cached(self):
         # Tests whether the iter_images method returns the values from
         # the cache
-        cache = {'images': []}
+        cache = {'images': glance._ImageCatalog()}
         images = list(glance.ImagePollster().
                       _iter_images(self.manager.keystone, cache))
         self.assertEqual(images, [])
@@ -173,3 +177,127 @@ class TestImagePollster(base.TestCase):
                                                               {}))
         self.assertEqual(set([s.name for s in samples]),
                          set(['image.size']))
+
+
+class TestImageListing(base.TestCase):
+
+    @mock.patch('ceilometer.pipeline.setup_pipeline', mock.MagicMock())
+    def setUp(self):
+        super(TestImageListing, self).setUp()
+        self.manager = TestManager()
+        self.client = mock.Mock()
+        self.client.images.list.return_value = IMAGE_LIST
+        self.stubs.Set(glance._Base, 'get_glance_client',
+                       self.fake_get_glance_client)
+        self.pollster = glance.ImagePollster()
+
+    def fake_get_glance_client(self, ksclient):
+        return self.client
+
+    @staticmethod
+    def _image(**kwargs):
+        attrs = dict(IMAGE_LIST[0].__dict__)
+        attrs.update(kwargs)
+        return type('Image', (object,), attrs)
+
+    def _list_images(self):
+        return list(self.pollster._iter_images(self.manager.keystone, {}))
+
+    def test_page_size(self):
+        cfg.CONF.set_override('glance_page_size', 50)
+        self._list_images()
+        for args, kwargs in self.client.images.list.call_args_list:
+            self.assertEqual(kwargs['page_size'], 50)
+
+    def test_default_page_size(self):
+        self._list_images()
+        args, kwargs = self.client.images.list.call_args
+        self.assertFalse('page_size' in kwargs)
+
+    def test_changes_since(self):
+        images = self._list_images()
+        self.assertEqual(len(images), 3)
+        new_image = self._image(id=u'new-image')
+        deleted_image = self._image(id=IMAGE_LIST[1].id, deleted=True,
+                                    status=u'deleted')
+        self.client.images.list.reset_mock()
+        self.client.images.list.return_value = [new_image, deleted_image]
+        images = self._list_images()
+        self.assertEqual(set(i.id for i in images),
+                         set([IMAGE_LIST[0].id, IMAGE_LIST[2].id,
+                              u'new-image']))
+        for args, kwargs in self.client.images.list.call_args_list:
+            self.assertTrue('changes-since' in kwargs['filters'])
+
+    def test_full_listing_interval(self):
+        self._list_images()
+        self.pollster._catalog.full_listing_at = (
+            timeutils.utcnow() - datetime.timedelta(hours=2))
+        self.client.images.list.reset_mock()
+        self.client.images.list.return_value = IMAGE_LIST[:1]
+        images = self._list_images()
+        self.assertEqual([i.id for i in images], [IMAGE_LIST[0].id])
+        for args, kwargs in self.client.images.list.call_args_list:
+            self.assertFalse('changes-since' in kwargs['filters'])
+
+    def test_change_tracking_disabled(self):
+        cfg.CONF.set_override('glance_full_listing_interval', 0)
+        self._list_images()
+        self.client.images.list.reset_mock()
+        self._list_images()
+        for args, kwargs in self.client.images.list.call_args_list:
+            self.assertFalse('changes-since' in kwargs['filters'])
+
+    def test_listed_once_per_cycle(self):
+        cache = {}
+        images = list(self.pollster.get_samples(self.manager, cache))
+        sizes = list(glance.ImageSizePollster().get_samples(
+            self.manager, cache))
+        self.assertEqual(len(images), 3)
+        self.assertEqual(len(sizes), 3)
+        self.assertEqual(self.client.images.list.call_count, 2)
+        self.assertTrue(images[0].resource_metadata is
+                        sizes[0].resource_metadata)
+
+    def test_full_listing_streamed(self):
+        def pages(filters, **kwargs):
+            yield IMAGE_LIST[0]
+            raise AssertionError('second page requested')
+
+        self.client.images.list.side_effect = pages
+        images = self.pollster._iter_images(self.manager.keystone, {})
+        self.assertEqual(next(images).id, IMAGE_LIST[0].id)
+
+    def test_partitioned(self):
+        self.manager.partition_coordinator = mock.Mock()
+        self.manager.partition_coordinator.belongs.side_effect = (
+            lambda image_id: image_id == IMAGE_LIST[1].id)
+        cache = {}
+        samples = list(self.pollster.get_samples(self.manager, cache))
+        self.assertEqual([s.resource_id for s in samples], [IMAGE_LIST[1].id])
+        # all the images are kept, the metadata extracted for those polled
+        self.assertEqual(len(cache['images'].images), 3)
+        self.assertEqual(cache['images'].metadata.keys(), [IMAGE_LIST[1].id])
+
+    def test_state_not_shared(self):
+        self._list_images()
+        other = glance.ImagePollster()
+        self.assertEqual(other._catalog.images, {})
+        self.assertIsNone(other._catalog.changes_since)
+
+    def test_metadata_reused(self):
+        pollster = self.pollster
+        first = list(pollster.get_samples(self.manager, {}))
+        second = list(pollster.get_samples(self.manager, {}))
+        for s1, s2 in zip(sorted(first, key=lambda s: s.resource_id),
+                          sorted(second, key=lambda s: s.resource_id)):
+            self.assertTrue(s1.resource_metadata is s2.resource_metadata)
+
+    def test_metadata_updated(self):
+        pollster = self.pollster
+        list(pollster.get_samples(self.manager, {}))
+        self.client.images.list.return_value = [
+            self._image(updated_at=u'2013-09-18T16:29:46', name=u'renamed')]
+        samples = list(pollster.get_samples(self.manager, {}))
+        renamed = [s for s in samples if s.resource_id == IMAGE_LIST[0].id]
+        self.assertEqual(renamed[0].resource_metadata['name'], u'renamed')
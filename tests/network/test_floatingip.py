@@ -64,6 +64,13 @@ class TestFloatingIPPollster(base.TestCase):
     #     else:
     #         assert False, 'Should have seen an error'
 
+    def test_get_samples_partitioned(self):
+        self.manager.partition_coordinator = mock.Mock()
+        self.manager.partition_coordinator.belongs.side_effect = (
+            lambda ip_id: ip_id == 2)
+        samples = list(self.pollster.get_samples(self.manager, {}))
+        self.assertEqual([s.resource_id for s in samples], [2])
+
     def test_get_samples_not_empty(self):
         samples = list(self.pollster.get_samples(self.manager, {}))
         self.assertEqual(len(samples), 3)
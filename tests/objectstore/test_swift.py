@@ -19,7 +19,9 @@
 
 import collections
 
+import eventlet
 import mock
+from oslo.config import cfg
 import testscenarios
 
 from ceilometer.central import manager
@@ -65,7 +67,7 @@ class TestSwiftPollster(base.TestCase):
     def fake_ks_service_catalog_url_for(*args, **kwargs):
         raise exceptions.EndpointNotFound("Fake keystone exception")
 
-    def fake_iter_accounts(self, ksclient, cache):
+    def fake_iter_accounts(self, ksclient, cache, partition_coordinator=None):
         for i in ACCOUNTS:
             yield i
 
@@ -98,6 +100,8 @@ class TestSwiftPollster(base.TestCase):
                        ksclient)
         self.stubs.Set(self.factory, '_neaten_url',
                        mock.Mock())
+        self.stubs.Set(swift_client, 'http_connection',
+                       mock.Mock(return_value=(mock.Mock(), mock.Mock())))
         Tenant = collections.namedtuple('Tenant', 'id')
         cache = {
             self.pollster.CACHE_KEY_TENANT: [Tenant(ACCOUNTS[0][0])],
@@ -106,6 +110,92 @@ class TestSwiftPollster(base.TestCase):
         self.assertTrue(self.pollster.CACHE_KEY_HEAD in cache)
         self.assertEqual(data[0][0], ACCOUNTS[0][0])
 
+    def test_iter_accounts_partitioned(self):
+        Tenant = collections.namedtuple('Tenant', 'id')
+        ksclient = mock.Mock()
+        ksclient.tenants.list.return_value = [Tenant(a[0])
+                                              for a in ACCOUNTS]
+        coordinator = mock.Mock()
+        coordinator.extract_my_subset.side_effect = (
+            lambda resources, key: [r for r in resources
+                                    if key(r) == ACCOUNTS[1][0]])
+        self.stubs.Set(swift_client, 'head_account', mock.Mock())
+        self.stubs.Set(swift_client, 'http_connection',
+                       mock.Mock(return_value=(mock.Mock(), mock.Mock())))
+        self.stubs.Set(self.factory, '_neaten_url', mock.Mock())
+        cache = {}
+        data = list(self.pollster._iter_accounts(ksclient, cache,
+                                                 coordinator))
+        self.assertEqual(cache[self.pollster.CACHE_KEY_TENANT],
+                         [Tenant(ACCOUNTS[1][0])])
+        self.assertEqual([d[0] for d in data], [ACCOUNTS[1][0]])
+
+    def _get_account_info(self, head_account, tenants):
+        Tenant = collections.namedtuple('Tenant', 'id')
+        ksclient = mock.Mock()
+        ksclient.service_catalog.url_for.return_value = 'http://swift:8080'
+        self.stubs.Set(swift_client, 'head_account', head_account)
+        cache = {self.pollster.CACHE_KEY_TENANT: [Tenant(t)
+                                                  for t in tenants]}
+        return list(self.pollster._get_account_info(ksclient, cache))
+
+    def test_get_account_info_reuses_connections(self):
+        cfg.CONF.set_override('swift_head_workers', 2)
+        http_connection = mock.Mock(wraps=swift_client.http_connection)
+        self.stubs.Set(swift_client, 'http_connection', http_connection)
+        conns = set()
+
+        def head_account(url, token, http_conn):
+            conns.add(http_conn[1])
+            self.assertTrue(url.endswith(http_conn[0].path))
+            return {'x-account-object-count': 1}
+
+        tenants = ['tenant-%03d' % i for i in range(20)]
+        data = self._get_account_info(head_account, tenants)
+        self.assertEqual([d[0] for d in data], tenants)
+        self.assertTrue(len(conns) <= 2)
+        self.assertEqual(http_connection.call_count, len(conns))
+
+    def test_get_account_info_closes_connections(self):
+        cfg.CONF.set_override('swift_head_workers', 2)
+        conns = []
+
+        def http_connection(url):
+            conns.append(mock.Mock())
+            return mock.Mock(path=url), conns[-1]
+
+        self.stubs.Set(swift_client, 'http_connection', http_connection)
+        data = self._get_account_info(
+            lambda url, token, http_conn: {'x-account-object-count': 1},
+            ['tenant-%03d' % i for i in range(5)])
+        self.assertEqual(len(data), 5)
+        self.assertTrue(conns)
+        for conn in conns:
+            conn.close.assert_called_once_with()
+
+    def test_get_account_info_error_isolation(self):
+        def head_account(url, token, http_conn):
+            if url.endswith('tenant-001'):
+                raise swift_client.ClientException('Account HEAD failed')
+            return {'x-account-object-count': 1}
+
+        data = self._get_account_info(head_account,
+                                      ['tenant-000', 'tenant-001',
+                                       'tenant-002'])
+        self.assertEqual([d[0] for d in data], ['tenant-000', 'tenant-002'])
+
+    def test_get_account_info_timeout(self):
+        cfg.CONF.set_override('swift_head_timeout', 0.01)
+
+        def head_account(url, token, http_conn):
+            if url.endswith('tenant-000'):
+                eventlet.sleep(1)
+            return {'x-account-object-count': 1}
+
+        data = self._get_account_info(head_account,
+                                      ['tenant-000', 'tenant-001'])
+        self.assertEqual([d[0] for d in data], ['tenant-001'])
+
     def test_neaten_url(self):
         test_endpoint = 'http://127.0.0.1:8080'
         test_tenant_id = 'a7fd1695fa154486a647e44aa99a1b9b'
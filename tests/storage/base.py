@@ -179,6 +179,14 @@ class UserTest(DBTestBase):
         users = self.conn.get_users(source='test-1')
         assert list(users) == ['user-id']
 
+    def test_get_users_paginated(self):
+        users = self.conn.get_users(limit=3)
+        self.assertEqual(list(users), ['user-id', 'user-id-2', 'user-id-3'])
+        users = self.conn.get_users(limit=2, marker='user-id-3')
+        self.assertEqual(list(users), ['user-id-4', 'user-id-5'])
+        users = self.conn.get_users(marker='user-id-8')
+        self.assertEqual(list(users), ['user-id-alternate'])
+
 
 class ProjectTest(DBTestBase):
 
@@ -194,6 +202,22 @@ class ProjectTest(DBTestBase):
         expected = ['project-id']
         assert list(projects) == expected
 
+    def test_get_projects_paginated(self):
+        projects = self.conn.get_projects(limit=2)
+        self.assertEqual(list(projects), ['project-id', 'project-id-2'])
+        projects = self.conn.get_projects(limit=2, marker='project-id-6')
+        self.assertEqual(list(projects), ['project-id-7', 'project-id-8'])
+        projects = self.conn.get_projects(source='test-1',
+                                          marker='project-id')
+        self.assertEqual(list(projects), [])
+
+    def test_has_project(self):
+        self.assertTrue(self.conn.has_project('project-id-2'))
+        self.assertFalse(self.conn.has_project('unknown-project'))
+        self.assertTrue(self.conn.has_project('project-id', source='test-1'))
+        self.assertFalse(self.conn.has_project('project-id-2',
+                                               source='test-1'))
+
 
 class ResourceTest(DBTestBase):
 
@@ -712,6 +736,19 @@ class StatisticsTest(DBTestBase):
         assert results.sum == 27
         assert results.avg == 9
 
+    def test_by_resource_list_groupby(self):
+        f = storage.SampleFilter(
+            user=['user-id', 'user-5'],
+            resource=['resource-6', 'resource-unknown'],
+            meter='volume.size',
+        )
+        results = list(self.conn.get_meter_statistics(
+            f, groupby=['resource_id']))
+        self.assertEqual([r.groupby for r in results],
+                         [{'resource_id': 'resource-6'}])
+        self.assertEqual(results[0].count, 3)
+        self.assertEqual(results[0].sum, 27)
+
     def test_no_period_in_query(self):
         f = storage.SampleFilter(
             user='user-5',
@@ -861,6 +898,167 @@ class StatisticsTest(DBTestBase):
         assert results.sum == 18
         assert results.avg == 6
 
+    def test_groupby_resource(self):
+        f = storage.SampleFilter(
+            meter='volume.size',
+        )
+        results = list(self.conn.get_meter_statistics(
+            f, groupby=['resource_id']))
+        self.assertEqual(len(results), 2)
+        results = dict((r.groupby['resource_id'], r) for r in results)
+        self.assertEqual(results['resource-id'].count, 3)
+        self.assertEqual(results['resource-id'].sum, 18)
+        self.assertEqual(results['resource-6'].count, 3)
+        self.assertEqual(results['resource-6'].max, 10)
+        self.assertEqual(results['resource-6'].avg, 9)
+
+    def test_groupby_user_project(self):
+        f = storage.SampleFilter(
+            meter='volume.size',
+        )
+        results = list(self.conn.get_meter_statistics(
+            f, groupby=['user_id', 'project_id']))
+        self.assertEqual(sorted(r.groupby.items() for r in results),
+                         [[('project_id', 'project1'),
+                           ('user_id', 'user-id')],
+                          [('project_id', 'project2'),
+                           ('user_id', 'user-5')]])
+
+    def test_groupby_period(self):
+        f = storage.SampleFilter(
+            meter='volume.size',
+            start='2012-09-25T10:28:00',
+        )
+        results = list(self.conn.get_meter_statistics(
+            f, period=7200, groupby=['resource_id']))
+        self.assertEqual(len(results), 4)
+        counts = dict(((r.period_start, r.groupby['resource_id']), r.count)
+                      for r in results)
+        self.assertEqual(counts, {
+            (datetime.datetime(2012, 9, 25, 10, 28), 'resource-id'): 2,
+            (datetime.datetime(2012, 9, 25, 10, 28), 'resource-6'): 2,
+            (datetime.datetime(2012, 9, 25, 12, 28), 'resource-id'): 1,
+            (datetime.datetime(2012, 9, 25, 12, 28), 'resource-6'): 1,
+        })
+
+    def test_no_groupby(self):
+        f = storage.SampleFilter(
+            meter='volume.size',
+        )
+        results = list(self.conn.get_meter_statistics(f))
+        self.assertEqual(len(results), 1)
+        self.assertIsNone(results[0].groupby)
+
+    def _record_cpu_samples(self):
+        for i, (source, flavor) in enumerate([('source1', 'm1.tiny'),
+                                              ('source1', 'm1.small'),
+                                              ('source2', 'm1.small'),
+                                              ('source2', None)]):
+            metadata = {'display_name': 'test-server',
+                        'instance_type': {'name': flavor}}
+            if flavor is None:
+                del metadata['instance_type']
+            c = sample.Sample(
+                'cpu_util',
+                'gauge',
+                '%',
+                10 * (i + 1),
+                'user-id',
+                'project1',
+                'resource-id',
+                timestamp=datetime.datetime(2012, 9, 25, 10, 30 + i),
+                resource_metadata=metadata,
+                source=source,
+            )
+            msg = rpc.meter_message_from_counter(
+                c,
+                secret='not-so-secret',
+            )
+            self.conn.record_metering_data(msg)
+
+    def test_groupby_source(self):
+        self._record_cpu_samples()
+        f = storage.SampleFilter(
+            meter='cpu_util',
+        )
+        results = list(self.conn.get_meter_statistics(
+            f, groupby=['source']))
+        sums = dict((r.groupby['source'], r.sum) for r in results)
+        self.assertEqual(sums, {'source1': 30, 'source2': 70})
+
+    def test_groupby_metadata(self):
+        self._record_cpu_samples()
+        f = storage.SampleFilter(
+            meter='cpu_util',
+        )
+        try:
+            results = list(self.conn.get_meter_statistics(
+                f, groupby=['source', 'metadata.instance_type.name']))
+        except NotImplementedError:
+            # the metadata is not indexed by all the drivers
+            return
+        sums = dict(((r.groupby['source'],
+                      r.groupby['metadata.instance_type.name']), r.sum)
+                    for r in results)
+        self.assertEqual(sums, {('source1', 'm1.tiny'): 10,
+                                ('source1', 'm1.small'): 20,
+                                ('source2', 'm1.small'): 30,
+                                ('source2', None): 40})
+
+    def test_aggregate_selected(self):
+        f = storage.SampleFilter(
+            user='user-5',
+            meter='volume.size',
+        )
+        results = list(self.conn.get_meter_statistics(
+            f, aggregate=['max']))[0]
+        self.assertEqual(results.max, 10)
+        self.assertEqual(results.count, 3)
+        self.assertEqual(results.unit, 'GiB')
+        self.assertIsNone(results.min)
+        self.assertIsNone(results.avg)
+        self.assertIsNone(results.sum)
+        self.assertIsNone(results.stddev)
+        self.assertIsNone(results.percentiles)
+
+    def test_aggregate_stddev(self):
+        f = storage.SampleFilter(
+            user='user-5',
+            meter='volume.size',
+        )
+        results = list(self.conn.get_meter_statistics(
+            f, aggregate=['avg', 'stddev']))[0]
+        self.assertEqual(results.avg, 9)
+        self.assertAlmostEqual(results.stddev, (2 / 3.0) ** 0.5)
+        self.assertIsNone(results.sum)
+
+    def test_aggregate_percentiles_groupby(self):
+        f = storage.SampleFilter(
+            meter='volume.size',
+        )
+        results = list(self.conn.get_meter_statistics(
+            f, groupby=['project_id'], aggregate=['p50', 'p90']))
+        percentiles = dict((r.groupby['project_id'], r.percentiles)
+                           for r in results)
+        self.assertEqual(percentiles['project1']['p50'], 6)
+        self.assertAlmostEqual(percentiles['project1']['p90'], 6.8)
+        self.assertEqual(percentiles['project2']['p50'], 9)
+        self.assertIsNone(results[0].max)
+
+    def test_aggregate_percentiles_period(self):
+        f = storage.SampleFilter(
+            user='user-id',
+            meter='volume.size',
+            start='2012-09-25T10:28:00',
+        )
+        results = list(self.conn.get_meter_statistics(
+            f, period=7200, aggregate=['p50']))
+        self.assertEqual([r.period_start for r in results],
+                         [datetime.datetime(2012, 9, 25, 10, 28),
+                          datetime.datetime(2012, 9, 25, 12, 28)])
+        self.assertEqual([r.percentiles for r in results],
+                         [{'p50': 5.5}, {'p50': 7}])
+
 
 class CounterDataTypeTest(DBTestBase):
 
@@ -1020,6 +1218,22 @@ class AlarmTest(AlarmTestBase):
         all = list(self.conn.get_alarms())
         self.assertEqual(len(all), 1)
 
+    def test_get_alarms_updated_since(self):
+        self.add_some_alarms()
+        for alarm in self.conn.get_alarms():
+            alarm.timestamp = datetime.datetime(2013, 8, 1)
+            self.conn.update_alarm(alarm)
+        orange = list(self.conn.get_alarms(name='orange-alert'))[0]
+        orange.enabled = False
+        orange.timestamp = datetime.datetime(2013, 8, 2)
+        self.conn.update_alarm(orange)
+        updated = list(self.conn.get_alarms(
+            enabled=None, updated_since=datetime.datetime(2013, 8, 2)))
+        self.assertEqual([a.name for a in updated], ['orange-alert'])
+        updated = list(self.conn.get_alarms(
+            updated_since=datetime.datetime(2013, 8, 2)))
+        self.assertEqual(updated, [])
+
     def test_delete(self):
         self.add_some_alarms()
         victim = list(self.conn.get_alarms(name='orange-alert'))[0]
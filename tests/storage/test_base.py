@@ -59,3 +59,32 @@ class BaseTest(test_base.TestCase):
 
         sort_keys_resource = base._handle_sort_key('resource', 'project_id')
         self.assertEqual(sort_keys_resource, ['project_id', 'user_id'])
+
+    def test_parse_aggregates(self):
+        self.assertEqual(base.parse_aggregates(),
+                         (set(base.DEFAULT_AGGREGATES), []))
+        self.assertEqual(base.parse_aggregates(['max', 'p99', 'p5', 'p99']),
+                         (set(['max']), [5, 99]))
+        self.assertRaises(ValueError, base.parse_aggregates, ['p100'])
+        self.assertRaises(ValueError, base.parse_aggregates, ['median'])
+
+    def test_stddev(self):
+        self.assertAlmostEqual(base.stddev(3, 6.0, 14.0), (2 / 3.0) ** 0.5)
+        self.assertEqual(base.stddev(2, 0.2, 0.02), 0)
+
+    def test_percentile_exact(self):
+        estimator = base.PercentileEstimator(50)
+        self.assertIsNone(estimator.value())
+        for v in (4, 1, 3, 2):
+            estimator.add(v)
+        self.assertEqual(estimator.value(), 2.5)
+
+    def test_percentile_estimated(self):
+        percentiles = base.Percentiles([50, 95])
+        # a shuffled series of 10000 values, from 0 to 9999
+        for i in xrange(10000):
+            percentiles.add(i * 7919 % 10000)
+        values = percentiles.values()
+        self.assertEqual(sorted(values), ['p50', 'p95'])
+        self.assertTrue(abs(values['p50'] - 4999.5) < 100)
+        self.assertTrue(abs(values['p95'] - 9499.05) < 100)
@@ -0,0 +1,91 @@
+# -*- encoding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Tests for ceilometer/keystone_client.py
+"""
+
+import mock
+from keystoneclient import exceptions
+from keystoneclient.v2_0 import client as ksclient
+
+from ceilometer import keystone_client
+from ceilometer.tests import base
+
+
+class TestKeystoneClient(base.TestCase):
+
+    def setUp(self):
+        super(TestKeystoneClient, self).setUp()
+        self.ks = mock.Mock()
+        self.ks.auth_token = 'token'
+        self.ks.auth_ref.will_expire_soon.return_value = False
+        self.ks.service_catalog.url_for.return_value = 'http://glance'
+        self.ks_class = mock.Mock(return_value=self.ks)
+        self.stubs.Set(ksclient, 'Client', self.ks_class)
+        self.client = keystone_client.Client()
+
+    def test_lazy_authentication(self):
+        self.assertEqual(self.ks_class.call_count, 0)
+        self.assertEqual(self.client.auth_token, 'token')
+        self.assertEqual(self.ks_class.call_count, 1)
+
+    def test_token_reused(self):
+        for i in range(3):
+            self.assertEqual(self.client.auth_token, 'token')
+        self.assertEqual(self.ks_class.call_count, 1)
+        self.assertEqual(self.client.auth_count, 1)
+        self.assertTrue(self.client.auth_latency is not None)
+
+    def test_token_renewed_near_expiry(self):
+        self.client.auth_token
+        self.ks.auth_ref.will_expire_soon.return_value = True
+        self.client.auth_token
+        self.assertEqual(self.ks_class.call_count, 2)
+        self.ks.auth_ref.will_expire_soon.assert_called_with(300)
+
+    def test_authenticated_without_auth_ref(self):
+        self.ks.auth_ref = None
+        self.client.auth_token
+        self.client.auth_token
+        self.assertEqual(self.ks_class.call_count, 2)
+
+    def test_url_for_memoized(self):
+        for i in range(3):
+            url = self.client.service_catalog.url_for(service_type='image',
+                                                      endpoint_type='public')
+            self.assertEqual(url, 'http://glance')
+        self.assertEqual(self.ks.service_catalog.url_for.call_count, 1)
+        self.client.url_for(service_type='object-store',
+                            endpoint_type='public')
+        self.assertEqual(self.ks.service_catalog.url_for.call_count, 2)
+
+    def test_url_for_reset_on_renewal(self):
+        self.client.url_for(service_type='image')
+        self.ks.auth_ref.will_expire_soon.return_value = True
+        self.client.url_for(service_type='image')
+        self.assertEqual(self.ks.service_catalog.url_for.call_count, 2)
+
+    def test_delegation(self):
+        self.ks.tenants.list.return_value = ['tenant']
+        self.assertEqual(self.client.tenants.list(), ['tenant'])
+
+    def test_authentication_failure(self):
+        self.ks_class.side_effect = exceptions.Unauthorized('boom')
+        self.assertRaises(exceptions.Unauthorized,
+                          getattr, self.client, 'auth_token')
+        self.assertEqual(self.client.auth_failures, 1)
+        self.assertEqual(self.client.auth_count, 0)
+
+    def test_get_client_shared(self):
+        self.assertTrue(keystone_client.get_client() is
+                        keystone_client.get_client())
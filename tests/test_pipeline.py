@@ -27,6 +27,7 @@ from ceilometer.publisher import test as test_publisher
 from ceilometer import transformer
 from ceilometer.transformer import accumulator
 from ceilometer.transformer import conversions
+from ceilometer.transformer import delta
 from ceilometer.openstack.common import timeutils
 from ceilometer import pipeline
 from ceilometer.tests import base
@@ -50,6 +51,7 @@ class TestPipeline(base.TestCase):
             'cache': accumulator.TransformerAccumulator,
             'unit_conversion': conversions.ScalingTransformer,
             'rate_of_change': conversions.RateOfChangeTransformer,
+            'delta': delta.DeltaTransformer,
         }
 
         if name in class_name_ext:
@@ -972,3 +974,91 @@ class TestPipeline(base.TestCase):
         self.assertEqual(len(publisher.counters), 0)
         pipe.flush(None)
         self.assertEqual(len(publisher.counters), 0)
+
+    def _do_test_delta(self, mode, volumes, metadata=None, heartbeat=3600,
+                       offset=1):
+        self.pipeline_cfg[0]['transformers'] = [
+            {
+                'name': 'delta',
+                'parameters': {'mode': mode,
+                               'heartbeat': heartbeat},
+            },
+        ]
+        self.pipeline_cfg[0]['counters'] = ['cpu']
+        now = timeutils.utcnow()
+        metadata = metadata or [{'cpu_number': 4}] * len(volumes)
+        counters = [
+            sample.Sample(
+                name='cpu',
+                type=sample.TYPE_CUMULATIVE,
+                volume=volume,
+                unit='ns',
+                user_id='test_user',
+                project_id='test_proj',
+                resource_id='test_resource',
+                timestamp=(now + datetime.timedelta(
+                    minutes=offset * i)).isoformat(),
+                resource_metadata=md,
+            )
+            for i, (volume, md) in enumerate(zip(volumes, metadata))
+        ]
+
+        pipeline_manager = pipeline.PipelineManager(self.pipeline_cfg,
+                                                    self.transformer_manager)
+        pipe = pipeline_manager.pipelines[0]
+
+        for counter in counters:
+            pipe.publish_samples(None, [counter])
+        pipe.flush(None)
+        return pipe.publishers[0].counters
+
+    def test_delta_suppress_unchanged(self):
+        published = self._do_test_delta('suppress', [10, 10, 10, 20])
+        self.assertEqual([c.volume for c in published], [10, 20])
+        self.assertEqual(published[0].type, sample.TYPE_CUMULATIVE)
+
+    def test_delta_suppress_metadata_change(self):
+        published = self._do_test_delta('suppress', [10, 10],
+                                        metadata=[{'state': 'active'},
+                                                  {'state': 'paused'}])
+        self.assertEqual(len(published), 2)
+        self.assertEqual(published[1].resource_metadata,
+                         {'state': 'paused'})
+
+    def test_delta_suppress_heartbeat(self):
+        published = self._do_test_delta('suppress', [10, 10, 10, 10, 10],
+                                        heartbeat=120)
+        self.assertEqual(len(published), 3)
+
+    def test_delta_suppress_no_heartbeat(self):
+        published = self._do_test_delta('suppress', [10] * 5,
+                                        heartbeat=0, offset=600)
+        self.assertEqual(len(published), 1)
+
+    def test_delta_mode(self):
+        published = self._do_test_delta('delta', [10, 15, 15, 40])
+        self.assertEqual([c.volume for c in published], [5, 25])
+        for c in published:
+            self.assertEqual(c.type, sample.TYPE_DELTA)
+            self.assertEqual(c.name, 'cpu')
+
+    def test_delta_mode_cumulative_reset(self):
+        published = self._do_test_delta('delta', [40, 10])
+        self.assertEqual([c.volume for c in published], [10])
+
+    def test_delta_mode_heartbeat(self):
+        published = self._do_test_delta('delta', [10, 10, 10],
+                                        heartbeat=60)
+        self.assertEqual([c.volume for c in published], [0, 0])
+
+    def test_delta_invalid_mode(self):
+        self.pipeline_cfg[0]['transformers'] = [
+            {
+                'name': 'delta',
+                'parameters': {'mode': 'foobar'},
+            },
+        ]
+        self.assertRaises(ValueError,
+                          pipeline.PipelineManager,
+                          self.pipeline_cfg,
+                          self.transformer_manager)
@@ -53,3 +53,44 @@ class TestUtils(tests_base.TestCase):
                                  ('b', 'B'),
                                  ('nested:a', 'A'),
                                  ('nested:b', 'B')])
+
+    def test_hash_ring(self):
+        nodes = ['node1', 'node2', 'node3']
+        ring = utils.HashRing(nodes)
+        keys = ['key%d' % i for i in range(300)]
+        assignment = dict((k, ring.get_node(k)) for k in keys)
+        self.assertEqual(set(assignment.values()), set(nodes))
+        self.assertEqual(assignment, dict((k, ring.get_node(k))
+                                          for k in keys))
+
+    def test_hash_ring_node_removed(self):
+        keys = ['key%d' % i for i in range(300)]
+        ring = utils.HashRing(['node1', 'node2', 'node3'])
+        before = dict((k, ring.get_node(k)) for k in keys)
+        ring = utils.HashRing(['node1', 'node2'])
+        for k in keys:
+            if before[k] != 'node3':
+                self.assertEqual(ring.get_node(k), before[k])
+
+    def test_hash_ring_empty(self):
+        self.assertEqual(utils.HashRing([]).get_node('key'), None)
+
+    def test_lru_cache(self):
+        cache = utils.LRUCache(2)
+        cache['a'] = 1
+        cache['b'] = 2
+        self.assertEqual(cache.get('a'), 1)
+        cache['c'] = 3
+        self.assertNotIn('b', cache)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.pop('a'), 1)
+        self.assertIsNone(cache.get('a'))
+
+    def test_lru_cache_bulk_eviction(self):
+        cache = utils.LRUCache(20)
+        for i in range(21):
+            cache[i] = i
+        self.assertEqual(len(cache), 18)
+        self.assertEqual([i for i in range(21) if i in cache],
+                         range(3, 21))
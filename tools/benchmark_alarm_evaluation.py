@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Compare the cycle time of the API and storage threshold evaluators.
+
+The alarms and their samples are created in the given database (an
+in-memory SQLite one by default), then evaluation cycles are timed with
+the evaluator querying an API served in process, and with the evaluator
+querying the storage directly. The usual ceilometer options, such as
+--config-file, can be given to find the pipeline and policy files.
+"""
+
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import collections
+import datetime
+import sys
+import time
+import uuid
+
+from eventlet import wsgi
+from oslo.config import cfg
+
+from ceilometer.alarm import storage_evaluation
+from ceilometer.alarm import threshold_evaluation
+from ceilometer.api import app
+from ceilometer.openstack.common import timeutils
+from ceilometer.publisher import rpc
+from ceilometer import sample
+from ceilometer import storage
+from ceilometer.storage import models
+from ceilometerclient import client as ceiloclient
+
+
+class NullLogger(object):
+    def write(self, *args):
+        pass
+
+
+def make_data(conn, alarms, samples):
+    now = timeutils.utcnow()
+    for i in xrange(alarms):
+        resource_id = 'resource-%d' % i
+        for j in xrange(samples):
+            s = sample.Sample(
+                name='cpu_util',
+                type=sample.TYPE_GAUGE,
+                unit='%',
+                volume=float((i + j) % 100),
+                user_id='user',
+                project_id='project',
+                resource_id=resource_id,
+                timestamp=now - datetime.timedelta(minutes=j),
+                resource_metadata={},
+                source='benchmark',
+            )
+            conn.record_metering_data(rpc.meter_message_from_counter(
+                s, cfg.CONF.publisher_rpc.metering_secret))
+        conn.update_alarm(models.Alarm(name='alarm-%d' % i,
+                                       counter_name='cpu_util',
+                                       comparison_operator='gt',
+                                       threshold=50.0,
+                                       statistic='avg',
+                                       user_id='user',
+                                       project_id='project',
+                                       evaluation_periods=samples,
+                                       period=60,
+                                       alarm_id=str(uuid.uuid4()),
+                                       matching_metadata={'resource_id':
+                                                          resource_id}))
+
+
+def reset_states(conn):
+    for alarm in list(conn.get_alarms()):
+        alarm.state = models.Alarm.ALARM_INSUFFICIENT_DATA
+        conn.update_alarm(alarm)
+
+
+def time_cycles(label, evaluator, list_alarms, cycles):
+    for cycle in xrange(cycles):
+        start = time.time()
+        alarms = list(list_alarms())
+        evaluator.assign_alarms(alarms)
+        evaluator.evaluate()
+        duration = time.time() - start
+        states = collections.Counter(alarm.state for alarm in alarms)
+        print '%-8s cycle %d: %d alarms in %.2fs (%s)' % (
+            label, cycle + 1, len(alarms), duration,
+            ', '.join('%d %s' % (n, state)
+                      for state, n in sorted(states.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='benchmark the threshold alarm evaluators',
+    )
+    parser.add_argument(
+        '--alarms',
+        default=10000,
+        type=int,
+        help='the number of alarms, each on its own resource',
+    )
+    parser.add_argument(
+        '--samples',
+        default=3,
+        type=int,
+        help='the number of samples per resource',
+    )
+    parser.add_argument(
+        '--cycles',
+        default=2,
+        type=int,
+        help='the number of evaluation cycles timed per evaluator',
+    )
+    parser.add_argument(
+        '--connection',
+        default='sqlite://',
+        help='the database holding the alarms and samples',
+    )
+    parser.add_argument(
+        '--no-batching',
+        action='store_true',
+        help='query the statistics of each alarm on its own',
+    )
+    # the other arguments, like --config-file, are for ceilometer
+    args, remaining = parser.parse_known_args()
+
+    cfg.CONF(remaining, project='ceilometer')
+    cfg.CONF.set_override('connection', args.connection, group='database')
+    cfg.CONF.set_override('auth_strategy', 'noauth')
+    cfg.CONF.set_override('enable_v1_api', False)
+    cfg.CONF.set_override('evaluation_batching', not args.no_batching,
+                          group='alarm')
+
+    conn = storage.get_connection(cfg.CONF)
+    conn.upgrade()
+    print 'Creating %d alarms with %d samples each' % (args.alarms,
+                                                      args.samples)
+    make_data(conn, args.alarms, args.samples)
+
+    # serve the API from a green thread of this process
+    sock = eventlet.listen(('127.0.0.1', 0))
+    eventlet.spawn_n(wsgi.server, sock, app.VersionSelectorApplication(),
+                     log=NullLogger())
+    api_client = ceiloclient.get_client(
+        2,
+        os_auth_token=lambda: 'benchmark',
+        ceilometer_url='http://127.0.0.1:%d' % sock.getsockname()[1])
+
+    # the first cycle of each evaluator records the same state transitions
+    reset_states(conn)
+    api_evaluator = threshold_evaluation.Evaluator()
+    api_evaluator.api_client = api_client
+    time_cycles('api', api_evaluator, api_client.alarms.list, args.cycles)
+
+    reset_states(conn)
+    storage_evaluator = storage_evaluation.Evaluator()
+    time_cycles('storage', storage_evaluator, storage_evaluator.list_alarms,
+                args.cycles)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Compare the listings of samples in the formats of the API.
+
+The samples are created in the given database by the --create option
+(one million by default), then the listing of all of them is requested
+from the API, called in process, once in each mode: the JSON response
+streamed and built by WSME, the MessagePack document and the MessagePack
+columns. Each listing is done by its own process, reporting the size of
+the response, the growth of its peak memory usage, the time to the first
+byte, the total time and the time the client takes to decode it. The
+usual ceilometer options, such as --config-file, can be given to find the
+pipeline and policy files.
+"""
+
+import argparse
+import datetime
+import json
+import resource
+import subprocess
+import sys
+import time
+
+import msgpack
+from oslo.config import cfg
+import webob
+
+from ceilometer.api import app
+from ceilometer.api import compact
+from ceilometer.openstack.common import timeutils
+from ceilometer.publisher import rpc
+from ceilometer import sample
+from ceilometer import storage
+
+
+def make_data(conn, samples):
+    now = timeutils.utcnow()
+    for i in xrange(samples):
+        s = sample.Sample(
+            name='cpu_util',
+            type=sample.TYPE_GAUGE,
+            unit='%',
+            volume=float(i % 100),
+            user_id='user',
+            project_id='project',
+            resource_id='resource-%d' % (i % 1000),
+            timestamp=now - datetime.timedelta(seconds=i),
+            resource_metadata={'display_name': 'server-%d' % (i % 1000),
+                               'flavor': 'm1.small'},
+            source='benchmark',
+        )
+        conn.record_metering_data(rpc.meter_message_from_counter(
+            s, cfg.CONF.publisher_rpc.metering_secret))
+
+
+def peak_memory():
+    # in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def decode_json(body):
+    return len(json.loads(body))
+
+
+def decode_msgpack(body):
+    return len(msgpack.unpackb(body))
+
+
+def decode_columns(body):
+    unpacker = msgpack.Unpacker()
+    unpacker.feed(body)
+    return sum(len(block['timestamp']) for block in unpacker)
+
+
+# streamed listing, accepted content type and decoder of each mode
+MODES = {
+    'stream': (True, 'application/json', decode_json),
+    'wsme': (False, 'application/json', decode_json),
+    'msgpack': (False, compact.MSGPACK, decode_msgpack),
+    'columns': (True, compact.COLUMNS, decode_columns),
+}
+
+
+def list_samples(mode):
+    streamed, content_type, decode = MODES[mode]
+    cfg.CONF.set_override('stream_listings', streamed, group='api')
+    api = app.VersionSelectorApplication()
+    request = webob.Request.blank('/v2/meters/cpu_util',
+                                  accept=content_type)
+    memory = peak_memory()
+    start = time.time()
+    status, headers, app_iter = request.call_application(api)
+    first_byte = None
+    chunks = []
+    for chunk in app_iter:
+        if first_byte is None:
+            first_byte = time.time() - start
+        chunks.append(chunk)
+    duration = time.time() - start
+    memory = (peak_memory() - memory) / 1024
+    body = ''.join(chunks)
+    start = time.time()
+    samples = decode(body)
+    decoding = time.time() - start
+    print '%-8s %s, %d samples in %d bytes: peak memory +%d MB, first ' \
+        'byte after %.2fs, total %.2fs (%d samples/s), decoded in ' \
+        '%.2fs' % (mode, status, samples, len(body), memory,
+                   first_byte or 0, duration, samples / duration, decoding)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='benchmark the sample listings in the API formats',
+    )
+    parser.add_argument(
+        '--create',
+        default=0,
+        type=int,
+        metavar='SAMPLES',
+        help='the number of samples to create before listing them',
+    )
+    parser.add_argument(
+        '--connection',
+        default='sqlite:////tmp/ceilometer-benchmark.sqlite',
+        help='the database holding the samples',
+    )
+    parser.add_argument(
+        '--mode',
+        choices=sorted(MODES),
+        help='list the samples in this process, in the given mode only',
+    )
+    # the other arguments, like --config-file, are for ceilometer
+    args, remaining = parser.parse_known_args()
+
+    cfg.CONF(remaining, project='ceilometer')
+    cfg.CONF.set_override('connection', args.connection, group='database')
+    cfg.CONF.set_override('auth_strategy', 'noauth')
+    cfg.CONF.set_override('enable_v1_api', False)
+
+    if args.mode:
+        list_samples(args.mode)
+        return 0
+
+    if args.create:
+        conn = storage.get_connection(cfg.CONF)
+        conn.upgrade()
+        print 'Creating %d samples' % args.create
+        make_data(conn, args.create)
+
+    # each listing in its own process, for their peak memory usage
+    for mode in ('stream', 'wsme', 'msgpack', 'columns'):
+        subprocess.check_call([sys.executable, __file__,
+                               '--connection', args.connection,
+                               '--mode', mode] + remaining)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Measure the request throughput of a running ceilometer API.
+
+Each simulated client is a green thread sending its requests one after
+the other on its own connection, kept alive unless --no-keep-alive is
+given. Run it against ceilometer-api started with different [api]
+workers and wsgi_pool_size options to compare their throughput.
+"""
+
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import sys
+import time
+import urlparse
+
+from eventlet.green import httplib
+
+
+def client(url, token, requests, keep_alive, latencies, errors):
+    parsed = urlparse.urlparse(url)
+    path = parsed.path or '/'
+    if parsed.query:
+        path += '?' + parsed.query
+    headers = {'Accept': 'application/json'}
+    if token:
+        headers['X-Auth-Token'] = token
+    if not keep_alive:
+        headers['Connection'] = 'close'
+    conn = None
+    for i in xrange(requests):
+        if conn is None:
+            conn = httplib.HTTPConnection(parsed.hostname, parsed.port)
+        start = time.time()
+        try:
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+        except Exception:
+            errors.append(None)
+            conn.close()
+            conn = None
+            continue
+        latencies.append(time.time() - start)
+        if response.status >= 400:
+            errors.append(response.status)
+        if not keep_alive or response.getheader('connection') == 'close':
+            conn.close()
+            conn = None
+    if conn is not None:
+        conn.close()
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='measure the request throughput of the ceilometer API',
+    )
+    parser.add_argument(
+        '--url',
+        default='http://127.0.0.1:8777/v2/meters',
+        help='the URL requested',
+    )
+    parser.add_argument(
+        '--token',
+        help='the keystone token sent, if the API requires one',
+    )
+    parser.add_argument(
+        '--concurrency',
+        default=[1, 10, 50],
+        type=int,
+        nargs='+',
+        help='the numbers of concurrent clients to try',
+    )
+    parser.add_argument(
+        '--requests',
+        default=20,
+        type=int,
+        help='the number of requests sent by each client',
+    )
+    parser.add_argument(
+        '--no-keep-alive',
+        action='store_true',
+        help='open a new connection for each request',
+    )
+    args = parser.parse_args()
+
+    for concurrency in args.concurrency:
+        latencies = []
+        errors = []
+        pool = eventlet.GreenPool(concurrency)
+        start = time.time()
+        for i in xrange(concurrency):
+            pool.spawn_n(client, args.url, args.token, args.requests,
+                         not args.no_keep_alive, latencies, errors)
+        pool.waitall()
+        duration = time.time() - start
+        latencies.sort()
+        if latencies:
+            print ('%4d clients: %6.1f requests/s, latency median %.3fs, '
+                   '95%% %.3fs, max %.3fs, %d errors' % (
+                       concurrency, len(latencies) / duration,
+                       percentile(latencies, 0.5),
+                       percentile(latencies, 0.95),
+                       latencies[-1], len(errors)))
+        else:
+            print '%4d clients: all %d requests failed' % (concurrency,
+                                                           len(errors))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())